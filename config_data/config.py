@@ -1,14 +1,47 @@
 import os
 from dotenv import load_dotenv, find_dotenv
 
-if not find_dotenv():
-    exit('Переменные окружения не загружены т.к отсутствует файл .env')
-else:
-    load_dotenv()
+load_dotenv(find_dotenv())
 
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 API_KEY = os.getenv('API_KEY')
 API_HOST = os.getenv('API_HOST')
+API_KEYS = [key.strip() for key in (os.getenv('API_KEYS') or API_KEY or '').split(',') if key.strip()]
+API_HOSTS = [host.strip() for host in (os.getenv('API_HOSTS') or API_HOST or '').split(',') if host.strip()]
+API_DAILY_LIMIT = int(os.getenv('API_DAILY_LIMIT', 200))
+API_INTERACTIVE_RESERVE = int(os.getenv('API_INTERACTIVE_RESERVE', 40))
+API_CACHE_THRESHOLD = int(os.getenv('API_CACHE_THRESHOLD', 20))
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', 10))
+API_HEDGING = os.getenv('API_HEDGING', '1') == '1'
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+WORKERS = int(os.getenv('WORKERS', 1))
+SHUTDOWN_DEADLINE = float(os.getenv('SHUTDOWN_DEADLINE', 25))
+RECORD_PATH = os.getenv('RECORD_PATH')
+
+DATABASE_URL = os.getenv('DATABASE_URL') or 'sqlite:///db.sqlite'
+DATABASE_MAX_CONNECTIONS = int(os.getenv('DATABASE_MAX_CONNECTIONS', 20))
+DATABASE_STALE_TIMEOUT = float(os.getenv('DATABASE_STALE_TIMEOUT', 300))
+
+INLINE_DEBOUNCE = float(os.getenv('INLINE_DEBOUNCE', 0.4))
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', 300))
+INLINE_RESULTS = int(os.getenv('INLINE_RESULTS', 20))
+
+HISTORY_MAX_REQUESTS = int(os.getenv('HISTORY_MAX_REQUESTS', 200))
+HISTORY_MAX_AGE_DAYS = int(os.getenv('HISTORY_MAX_AGE_DAYS', 365))
+HISTORY_ARCHIVE_DIR = os.getenv('HISTORY_ARCHIVE_DIR', 'archive')
+RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', 24))
+
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH', 'catalog.snap')
+CATALOG_SNAPSHOT_INTERVAL_HOURS = float(os.getenv('CATALOG_SNAPSHOT_INTERVAL_HOURS', 6))
+CATALOG_SYNC_INTERVAL_HOURS = float(os.getenv('CATALOG_SYNC_INTERVAL_HOURS', 1))
+CATALOG_SYNC_MAX_PAGES = int(os.getenv('CATALOG_SYNC_MAX_PAGES', 10))
+CATALOG_SYNC_PAUSE = float(os.getenv('CATALOG_SYNC_PAUSE', 2))
+CATALOG_SYNC_INITIAL_DAYS = int(os.getenv('CATALOG_SYNC_INITIAL_DAYS', 30))
+CATALOG_REFRESH_INTERVAL_MINUTES = float(os.getenv('CATALOG_REFRESH_INTERVAL_MINUTES', 10))
+
+POSTER_CACHE_DIR = os.getenv('POSTER_CACHE_DIR', 'posters')
+POSTER_CACHE_MAX_MB = int(os.getenv('POSTER_CACHE_MAX_MB', 200))
+POSTER_WAIT = float(os.getenv('POSTER_WAIT', 2))
 
 DEFAULT_COMMANDS = (
     ('start', 'Запустить бота'),
@@ -16,5 +49,20 @@ DEFAULT_COMMANDS = (
     ('random', 'Вывести случайный фильм'),
     ('byname', 'Поиск фильма по названию'),
     ('byfilters', 'Поиск фильма с фильтрами'),
-    ('history', 'История поисковых запросов')
+    ('history', 'История поисковых запросов'),
+    ('similar', 'Фильмы, похожие на последний найденный'),
+    ('export', 'Выгрузить всю историю запросов')
 )
+
+
+def check() -> None:
+    """
+    Exits with a message if the settings required to run the bot are missing.
+
+    Returns:
+        None
+    """
+    if not BOT_TOKEN or not API_KEYS or not API_HOSTS:
+        exit('Переменные окружения не загружены: создайте файл .env по шаблону .env.template')
+    if DATABASE_URL.endswith('/:memory:'):
+        exit('База в памяти (sqlite:///:memory:) подходит только для тестов: бот работает в нескольких потоках')
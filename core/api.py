@@ -1,7 +1,26 @@
-from core.mappers import dict_to_movie, dict_to_movie_byname
-from core.models import Movie, MovieCountPages
+import time
+from concurrent.futures import Executor
+from datetime import date
+from typing import Any, Callable, Optional
+
+from core.balancer import KeyPool, REJECTED_STATUSES
+from core.breaker import CircuitBreaker, hedged_call
+from core.cache import ResponseCache
+from core.mappers import dict_to_movie, dict_to_movie_byname, dict_to_updated_at
+from core.models import Movie, MovieCountPages, MovieUpdates
+from core.quota import Priority
 import requests
 
+POSSIBLE_VALUES_MAX_AGE = 24 * 3600
+
+
+class ApiUnavailable(Exception):
+    """Raised when the movie database API can't answer the request."""
+
+
+class QuotaExceeded(ApiUnavailable):
+    """Raised when the daily quota is exhausted and there is no cached answer."""
+
 
 class MoviesApi:
     """A class used to interact with a movie database API.
@@ -10,13 +29,25 @@ class MoviesApi:
 
         Attributes
         ----------
-        key : str
-            The API key used to authenticate requests to the movie database API.
-        host : str
-            The host address of the movie database API.
+        pool : KeyPool
+            The API keys used to authenticate requests and the hosts of the movie database API.
+        cache : ResponseCache, optional
+            The cache of the responses used when the quota runs low or the API is unavailable.
+        breaker : CircuitBreaker, optional
+            The circuit breaker stopping the requests while the API fails or is too slow.
+        hedge_executor : Executor, optional
+            The executor running the hedged requests of the idempotent endpoints.
+        timeout : float
+            The timeout of a request in seconds.
+        priority : Priority
+            The priority of the requests made by this client.
+        transport : Callable[..., requests.Response]
+            The function making the HTTP GET requests, ``requests.get`` by default.
 
         Methods
         -------
+        with_priority(priority: Priority) -> MoviesApi
+            Returns a client sharing the quota and the cache but making requests with another priority.
         byid(id_: int) -> Movie
             Fetches a movie by its ID from the movie database API.
         random() -> Movie
@@ -33,29 +64,60 @@ class MoviesApi:
         page: int
         ) -> MovieCountPages
             Fetches movies by applying multiple filters and returns a paginated response.
+        updates(since: date, until: date, page: int, amount: int) -> MovieUpdates
+            Fetches the movies changed within the period, the least recently changed first.
         """
-    def __init__(self, key: str, host: str):
+    def __init__(self,
+                 pool: KeyPool,
+                 cache: Optional[ResponseCache] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 hedge_executor: Optional[Executor] = None,
+                 timeout: float = 10,
+                 priority: Priority = Priority.INTERACTIVE,
+                 transport: Callable[..., requests.Response] = requests.get):
         """
         Parameters
         ----------
-        key : str
-            The API key used to authenticate requests to the movie database API.
-        host : str
-            The host address of the movie database API.
+        pool : KeyPool
+            The API keys used to authenticate requests and the hosts of the movie database API.
+        cache : ResponseCache, optional
+            The cache of the responses used when the quota runs low or the API is unavailable.
+        breaker : CircuitBreaker, optional
+            The circuit breaker stopping the requests while the API fails or is too slow.
+        hedge_executor : Executor, optional
+            The executor running the hedged requests of the idempotent endpoints.
+            If not specified, the requests are not hedged.
+        timeout : float
+            The timeout of a request in seconds.
+        priority : Priority
+            The priority of the requests made by this client.
+        transport : Callable[..., requests.Response]
+            The function making the HTTP GET requests with the signature of ``requests.get``,
+            e.g. the one recording the responses.
         """
-        self.key = key
-        self.host = host
+        self.pool = pool
+        self.cache = cache
+        self.breaker = breaker
+        self.hedge_executor = hedge_executor
+        self.timeout = timeout
+        self.priority = priority
+        self.transport = transport
 
-    @property
-    def headers(self) -> dict:
-        """Generates the headers to be used in the API requests.
+    def with_priority(self, priority: Priority) -> 'MoviesApi':
+        """Returns a client sharing the quota and the cache but making requests with another priority.
+
+        Parameters
+        ----------
+        priority : Priority
+            The priority of the requests.
 
         Returns
         -------
-        dict
-            The headers dictionary.
+        MoviesApi
+            The client with the given priority.
         """
-        return {'X-API-KEY': self.key}
+        return MoviesApi(self.pool, self.cache, self.breaker, self.hedge_executor, self.timeout, priority,
+                         self.transport)
 
     def byid(self, id_: int) -> Movie:
         """Fetches a movie by its ID from the movie database API.
@@ -70,9 +132,7 @@ class MoviesApi:
         Movie
             The movie object.
         """
-        url = f'https://{self.host}/v1.3/movie/{id_}'
-        response = requests.get(url, headers=self.headers)
-        return dict_to_movie(response.json())
+        return dict_to_movie(self.__get('byid', f'/v1.3/movie/{id_}', hedged=True))
 
     def random(self) -> Movie:
         """Fetches a random movie from the movie database API.
@@ -82,9 +142,7 @@ class MoviesApi:
         Movie
             The movie object.
         """
-        url = f'https://{self.host}/v1.3/movie/random'
-        response = requests.get(url, headers=self.headers)
-        return dict_to_movie(response.json())
+        return dict_to_movie(self.__get('random', '/v1.3/movie/random', cacheable=False))
 
     def byname(self, page: int, amount: int, query: str) -> MovieCountPages:
         """Searches for movies by name and returns a paginated response.
@@ -103,13 +161,11 @@ class MoviesApi:
         MovieCountPages
             The paginated response containing the movies.
         """
-        url = f'https://{self.host}/v1.2/movie/search'
-        response = requests.get(url, params={
+        movies = self.__get('byname', '/v1.2/movie/search', {
             'page': page,
             'limit': amount,
             'query': query
-        }, headers=self.headers)
-        movies = response.json()
+        }, hedged=True)
 
         return MovieCountPages(
             current_page=movies['page'],
@@ -147,16 +203,14 @@ class MoviesApi:
         MovieCountPages
             The paginated response containing the movies.
         """
-        url = f'https://{self.host}/v1.3/movie'
-        response = requests.get(url, params={
+        movies = self.__get('byfilters', '/v1.3/movie', {
             'page': page,
             'limit': amount,
             'type': type_,
             'genres.name': genre,
             'rating.kp': f'{rating_kp[0]}-{rating_kp[1]}',
             'year': f'{year[0]}-{year[1]}'
-        }, headers=self.headers)
-        movies = response.json()
+        })
 
         return MovieCountPages(
             current_page=movies['page'],
@@ -165,6 +219,45 @@ class MoviesApi:
             movies=[dict_to_movie(movie) for movie in movies['docs']]
         )
 
+    def updates(self, since: date, until: date, page: int, amount: int) -> MovieUpdates:
+        """Fetches the movies changed within the period, the least recently changed first.
+
+        The period is filtered by the days, both ends included. The pages are not cached,
+        as they change with every change of the movie database.
+
+        Parameters
+        ----------
+        since : date
+            The first day of the period.
+        until : date
+            The last day of the period.
+        page : int
+            The page number.
+        amount : int
+            The number of movies per page.
+
+        Returns
+        -------
+        MovieUpdates
+            The page of the changed movies.
+        """
+        movies = self.__get('updates', '/v1.3/movie', {
+            'page': page,
+            'limit': amount,
+            'updatedAt': f'{since:%d.%m.%Y}-{until:%d.%m.%Y}',
+            'sortField': 'updatedAt',
+            'sortType': 1
+        }, cacheable=False)
+
+        updated_at = [dict_to_updated_at(movie) for movie in movies['docs']]
+        return MovieUpdates(
+            current_page=movies['page'],
+            total_pages=movies['pages'],
+            total_movies=movies['total'],
+            movies=[dict_to_movie(movie) for movie in movies['docs']],
+            updated_at=max(filter(None, updated_at), default=None)
+        )
+
     def get_types(self) -> list[str]:
         """
         This method retrieves all possible movie types from the API.
@@ -193,8 +286,118 @@ class MoviesApi:
         Returns:
             list[str]: A list of strings representing all possible values for the given field.
         """
-        url = f'https://{self.host}/v1/movie/possible-values-by-field'
-        response = requests.get(url, params={
+        response = self.__get('possible-values', '/v1/movie/possible-values-by-field', {
             'field': field,
-        }, headers=self.headers)
-        return [g['name'] for g in response.json()]
+        }, fresh_for=POSSIBLE_VALUES_MAX_AGE)
+        return [g['name'] for g in response]
+
+    def __get(self,
+              endpoint: str,
+              path: str,
+              params: Optional[dict] = None,
+              cacheable: bool = True,
+              hedged: bool = False,
+              fresh_for: Optional[float] = None) -> Any:
+        """
+        This private method makes a GET request to the API within the quota and the circuit breaker.
+
+        When the quota runs low, the cached response is returned instead of making
+        the request, and when it is exhausted, the cached response is the only option.
+        While the circuit is open or if the request fails, the cached response is returned
+        if there is one. Idempotent requests may be hedged: if the response takes longer
+        than the usual 95th percentile, a duplicate request is sent and the first response wins.
+        The responses of the rarely changing data are answered from the cache while they are fresh.
+
+        Args:
+            endpoint (str): The name of the endpoint the usage is counted for.
+            path (str): The path of the request.
+            params (dict, optional): The query parameters of the request.
+            cacheable (bool): Whether the response may be cached and answered from the cache.
+            hedged (bool): Whether the request is idempotent and may be hedged.
+            fresh_for (float, optional): The time in seconds the cached response is used without the API.
+
+        Returns:
+            Any: The decoded JSON response.
+
+        Raises:
+            QuotaExceeded: If the quota is exhausted and the response is not cached.
+            ApiUnavailable: If the API is unavailable and the response is not cached.
+        """
+        key = (path, tuple(sorted((params or {}).items())))
+        cached = self.cache.get(key) if cacheable and self.cache is not None else None
+        if cached is not None and self.pool.prefers_cache(self.priority):
+            return cached
+        if cached is not None and fresh_for is not None and self.cache.get(key, max_age=fresh_for) is not None:
+            return cached
+
+        try:
+            if self.breaker is not None and not self.breaker.allow():
+                raise ApiUnavailable(f'The circuit is open, {endpoint} is not requested')
+            try:
+                if hedged and self.hedge_executor is not None and not self.pool.prefers_cache(self.priority):
+                    delay = self.breaker.p95(default=1.0) if self.breaker is not None else 1.0
+                    result = hedged_call(self.hedge_executor, lambda: self.__request(endpoint, path, params), delay)
+                else:
+                    result = self.__request(endpoint, path, params)
+            finally:
+                if self.breaker is not None:
+                    self.breaker.release()
+        except ApiUnavailable:
+            if cached is None:
+                raise
+            return cached
+
+        if cacheable and self.cache is not None:
+            self.cache.put(key, result)
+        return result
+
+    def __request(self, endpoint: str, path: str, params: Optional[dict]) -> Any:
+        """
+        This private method sends a GET request to the API with a key and a host from the pool.
+
+        If the API rejects the key, the request is repeated with another one.
+
+        Args:
+            endpoint (str): The name of the endpoint the usage is counted for.
+            path (str): The path of the request.
+            params (dict, optional): The query parameters of the request.
+
+        Returns:
+            Any: The decoded JSON response.
+
+        Raises:
+            QuotaExceeded: If no key has the budget for the request.
+            ApiUnavailable: If no key is available, the request fails or the API responds with an error.
+        """
+        response = None
+        for _ in range(len(self.pool.keys)):
+            acquired = self.pool.acquire(endpoint, self.priority)
+            if acquired is None:
+                if not self.pool.in_rotation():
+                    raise ApiUnavailable(f'No API key is available for {endpoint}, all keys are cooling down')
+                raise QuotaExceeded(f'The daily quota is exhausted for {endpoint}')
+
+            api_key, host = acquired
+            started = time.monotonic()
+            try:
+                response = self.transport(f'https://{host}{path}',
+                                          params=params,
+                                          headers=api_key.headers,
+                                          timeout=self.timeout)
+            except requests.RequestException as error:
+                latency = time.monotonic() - started
+                self.pool.report(api_key, host, latency, None)
+                if self.breaker is not None:
+                    self.breaker.record(latency, ok=False)
+                raise ApiUnavailable(f'The request to {endpoint} failed: {error}') from error
+            latency = time.monotonic() - started
+            self.pool.report(api_key, host, latency, response.status_code)
+            if self.breaker is not None:
+                self.breaker.record(latency, ok=response.status_code < 500)
+            if response.status_code not in REJECTED_STATUSES:
+                break
+        if response is None:
+            raise ApiUnavailable(f'No API key is configured for {endpoint}')
+        if not response.ok:
+            raise ApiUnavailable(f'The request to {endpoint} failed with status {response.status_code}')
+        return response.json()
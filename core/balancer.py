@@ -0,0 +1,247 @@
+import random
+import time
+from threading import Lock
+from typing import Optional
+
+from core.quota import QuotaGovernor, Priority, key_fingerprint
+
+REJECTED_STATUSES = (401, 403, 429)
+
+
+class ApiKey:
+    """A class to represent an API key with its quota and observed performance.
+
+        ...
+
+        Attributes
+        ----------
+        key : str
+            The API key.
+        id : str
+            The fingerprint of the key used in the reports.
+        governor : QuotaGovernor, optional
+            The governor keeping the usage of the key within the daily quota.
+        latency : float
+            The exponentially weighted average latency of the requests in seconds.
+        calls : int
+            The number of requests made with the key by this process.
+        errors : int
+            The number of failed requests made with the key by this process.
+        cooldown_until : float
+            The monotonic time until which the key is out of rotation.
+        """
+    def __init__(self, key: str, governor: Optional[QuotaGovernor] = None):
+        """
+        Parameters
+        ----------
+        key : str
+            The API key.
+        governor : QuotaGovernor, optional
+            The governor keeping the usage of the key within the daily quota.
+        """
+        self.key = key
+        self.id = key_fingerprint(key)
+        self.governor = governor
+        self.latency = 0.5
+        self.calls = 0
+        self.errors = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def headers(self) -> dict:
+        """Generates the headers to be used in the API requests made with the key.
+
+        Returns
+        -------
+        dict
+            The headers dictionary.
+        """
+        return {'X-API-KEY': self.key}
+
+    def quota_share(self) -> float:
+        """Returns the share of the daily quota left.
+
+        Returns
+        -------
+        float
+            The remaining share from 0 to 1, 1 if the usage is not limited.
+        """
+        if self.governor is None:
+            return 1.0
+        return self.governor.remaining() / max(1, self.governor.daily_limit)
+
+
+class KeyPool:
+    """A class used to spread the API requests between several keys and hosts.
+
+    A key is picked at random with the weight proportional to its remaining
+    quota share and inversely proportional to its observed latency, and a host
+    with the weight inversely proportional to its latency. A key rejected by the
+    API (401, 403, 429) is taken out of rotation for the cooldown, and so is a host
+    the connection to which failed.
+
+        ...
+
+        Attributes
+        ----------
+        keys : list[ApiKey]
+            The API keys.
+        hosts : list[str]
+            The host addresses of the movie database API.
+        key_cooldown : float
+            The time in seconds a rejected key is out of rotation.
+        host_cooldown : float
+            The time in seconds a failed host is out of rotation.
+
+        Methods
+        -------
+        acquire(endpoint: str, priority: Priority) -> Optional[tuple[ApiKey, str]]
+            Picks a key with the budget for the request and a host.
+        report(api_key: ApiKey, host: str, latency: float, status: Optional[int]) -> None
+            Records the outcome of a request.
+        prefers_cache(priority: Priority) -> bool
+            Checks whether all keys prefer the cached answers.
+        in_rotation() -> int
+            Returns the number of keys not cooling down.
+        remaining() -> int
+            Returns the remaining budget of all keys.
+        usage() -> dict[str, dict[str, float]]
+            Returns the per-key usage report.
+        """
+    def __init__(self, keys: list[ApiKey], hosts: list[str], key_cooldown: float = 600, host_cooldown: float = 30):
+        """
+        Parameters
+        ----------
+        keys : list[ApiKey]
+            The API keys.
+        hosts : list[str]
+            The host addresses of the movie database API.
+        key_cooldown : float
+            The time in seconds a rejected key is out of rotation.
+        host_cooldown : float
+            The time in seconds a failed host is out of rotation.
+        """
+        self.keys = keys
+        self.hosts = hosts
+        self.key_cooldown = key_cooldown
+        self.host_cooldown = host_cooldown
+        self.__host_latency = {host: 0.5 for host in hosts}
+        self.__host_cooldown_until = {host: 0.0 for host in hosts}
+        self.__lock = Lock()
+
+    def acquire(self, endpoint: str, priority: Priority) -> Optional[tuple[ApiKey, str]]:
+        """Picks a key with the budget for the request and a host, counting the call in the key's quota.
+
+        Parameters
+        ----------
+        endpoint : str
+            The name of the endpoint.
+        priority : Priority
+            The priority of the request.
+
+        Returns
+        -------
+        Optional[tuple[ApiKey, str]]
+            The key and the host, or None if no key has the budget for the request.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            keys = [api_key for api_key in self.keys if api_key.cooldown_until <= now]
+            hosts = [host for host in self.hosts if self.__host_cooldown_until[host] <= now] or self.hosts
+            host_weights = [1 / max(self.__host_latency[host], 0.01) for host in hosts]
+        weights = [max(api_key.quota_share(), 0.01) / max(api_key.latency, 0.01) for api_key in keys]
+        while keys:
+            index = random.choices(range(len(keys)), weights)[0]
+            api_key = keys.pop(index)
+            weights.pop(index)
+            if api_key.governor is None or api_key.governor.acquire(endpoint, priority):
+                return api_key, random.choices(hosts, host_weights)[0]
+        return None
+
+    def report(self, api_key: ApiKey, host: str, latency: float, status: Optional[int]) -> None:
+        """Records the outcome of a request.
+
+        Parameters
+        ----------
+        api_key : ApiKey
+            The key the request was made with.
+        host : str
+            The host the request was sent to.
+        latency : float
+            The time the request took in seconds.
+        status : int, optional
+            The HTTP status of the response, None if the connection failed.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            api_key.calls += 1
+            if status is None:
+                api_key.errors += 1
+                self.__host_cooldown_until[host] = now + self.host_cooldown
+                return
+            api_key.latency = 0.8 * api_key.latency + 0.2 * latency
+            self.__host_latency[host] = 0.8 * self.__host_latency[host] + 0.2 * latency
+            if status >= 400:
+                api_key.errors += 1
+            if status in REJECTED_STATUSES:
+                api_key.cooldown_until = now + self.key_cooldown
+
+    def prefers_cache(self, priority: Priority) -> bool:
+        """Checks whether all keys in rotation prefer the cached answers.
+
+        Parameters
+        ----------
+        priority : Priority
+            The priority of the request.
+
+        Returns
+        -------
+        bool
+            True if no key in rotation has the budget above its threshold.
+        """
+        now = time.monotonic()
+        return all(api_key.governor is not None and api_key.governor.prefers_cache(priority)
+                   for api_key in self.keys if api_key.cooldown_until <= now)
+
+    def in_rotation(self) -> int:
+        """Returns the number of keys not cooling down.
+
+        Returns
+        -------
+        int
+            The number of keys the requests may be made with, whatever their budget.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            return sum(api_key.cooldown_until <= now for api_key in self.keys)
+
+    def remaining(self) -> int:
+        """Returns the remaining budget of all keys.
+
+        Returns
+        -------
+        int
+            The number of requests left today with all limited keys.
+        """
+        return sum(api_key.governor.remaining() for api_key in self.keys if api_key.governor is not None)
+
+    def usage(self) -> dict[str, dict[str, float]]:
+        """Returns the per-key usage report.
+
+        Returns
+        -------
+        dict[str, dict[str, float]]
+            The calls, errors, latency, remaining quota and cooldown left of every key,
+            keyed by the key fingerprint.
+        """
+        now = time.monotonic()
+        return {
+            api_key.id: {
+                'calls': api_key.calls,
+                'errors': api_key.errors,
+                'latency': api_key.latency,
+                'remaining': api_key.governor.remaining() if api_key.governor is not None else -1,
+                'cooldown': max(0.0, api_key.cooldown_until - now),
+            }
+            for api_key in self.keys
+        }
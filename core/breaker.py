@@ -0,0 +1,205 @@
+import time
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, TimeoutError, wait
+from enum import IntEnum
+from threading import Lock, get_ident
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class BreakerState(IntEnum):
+    """
+    A class to represent the state of the circuit breaker.
+
+    ...
+
+    Attributes
+    ----------
+    CLOSED :
+        the requests are made as usual
+    OPEN :
+        the requests fail fast without reaching the API
+    HALF_OPEN :
+        a single probe request is allowed to check whether the API recovered
+    """
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+class CircuitBreaker:
+    """A class used to stop calling the API while it fails or is too slow.
+
+    The outcomes of the recent requests are kept in a sliding window. The circuit
+    opens when the share of failed requests or the 95th percentile of the latency
+    in the window exceeds the threshold. After ``open_for`` seconds a single probe
+    request is let through: its success closes the circuit, its failure opens it again.
+    A probe ended without an outcome, e.g. when no request was made, is released so
+    that the next request becomes the probe.
+
+        ...
+
+        Attributes
+        ----------
+        error_rate : float
+            The share of failed requests in the window opening the circuit.
+        latency_threshold : float
+            The 95th percentile of the latency in seconds opening the circuit.
+        min_calls : int
+            The minimum number of requests in the window to judge the API.
+        open_for : float
+            The time in seconds the circuit stays open before the probe.
+
+        Methods
+        -------
+        allow() -> bool
+            Checks whether a request may be made.
+        record(latency: float, ok: bool) -> None
+            Records the outcome of a request.
+        release() -> None
+            Gives up the probe allowed to the calling thread if its outcome was not recorded.
+        p95(default: float) -> float
+            Returns the 95th percentile of the latency in the window.
+        """
+    def __init__(self,
+                 window: int = 50,
+                 error_rate: float = 0.5,
+                 latency_threshold: float = 5.0,
+                 min_calls: int = 10,
+                 open_for: float = 30):
+        """
+        Parameters
+        ----------
+        window : int
+            The number of recent requests taken into account.
+        error_rate : float
+            The share of failed requests in the window opening the circuit.
+        latency_threshold : float
+            The 95th percentile of the latency in seconds opening the circuit.
+        min_calls : int
+            The minimum number of requests in the window to judge the API.
+        open_for : float
+            The time in seconds the circuit stays open before the probe.
+        """
+        self.error_rate = error_rate
+        self.latency_threshold = latency_threshold
+        self.min_calls = min_calls
+        self.open_for = open_for
+        self.state = BreakerState.CLOSED
+        self.__outcomes: deque[tuple[float, bool]] = deque(maxlen=window)
+        self.__opened_at = 0.0
+        self.__prober: Optional[int] = None
+        self.__lock = Lock()
+
+    def allow(self) -> bool:
+        """Checks whether a request may be made.
+
+        Returns
+        -------
+        bool
+            True if the circuit is closed or the request is the probe of the half-open circuit.
+        """
+        with self.__lock:
+            if self.state == BreakerState.OPEN and time.monotonic() - self.__opened_at >= self.open_for:
+                self.state = BreakerState.HALF_OPEN
+                self.__prober = None
+            if self.state == BreakerState.HALF_OPEN:
+                if self.__prober is not None:
+                    return False
+                self.__prober = get_ident()
+                return True
+            return self.state == BreakerState.CLOSED
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Records the outcome of a request.
+
+        Parameters
+        ----------
+        latency : float
+            The time the request took in seconds.
+        ok : bool
+            Whether the API answered the request.
+        """
+        with self.__lock:
+            if self.state == BreakerState.HALF_OPEN:
+                self.__prober = None
+                if ok and latency < self.latency_threshold:
+                    self.state = BreakerState.CLOSED
+                    self.__outcomes.clear()
+                else:
+                    self.__open()
+                return
+            self.__outcomes.append((latency, ok))
+            if self.state == BreakerState.CLOSED and len(self.__outcomes) >= self.min_calls:
+                errors = sum(not outcome_ok for _, outcome_ok in self.__outcomes)
+                if errors / len(self.__outcomes) >= self.error_rate or self.__p95() >= self.latency_threshold:
+                    self.__open()
+
+    def release(self) -> None:
+        """Gives up the probe allowed to the calling thread if its outcome was not recorded.
+
+        Must be called once the request allowed by ``allow`` is over, whatever its result.
+        """
+        with self.__lock:
+            if self.state == BreakerState.HALF_OPEN and self.__prober == get_ident():
+                self.__prober = None
+
+    def p95(self, default: float) -> float:
+        """Returns the 95th percentile of the latency in the window.
+
+        Parameters
+        ----------
+        default : float
+            The value returned while the window has too few requests.
+
+        Returns
+        -------
+        float
+            The latency in seconds.
+        """
+        with self.__lock:
+            if len(self.__outcomes) < self.min_calls:
+                return default
+            return self.__p95()
+
+    def __p95(self) -> float:
+        """Calculates the 95th percentile of the latency. Must be called with the lock held."""
+        latencies = sorted(latency for latency, _ in self.__outcomes)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def __open(self) -> None:
+        """Opens the circuit. Must be called with the lock held."""
+        self.state = BreakerState.OPEN
+        self.__opened_at = time.monotonic()
+
+
+def hedged_call(executor: Executor, func: Callable[[], T], delay: float) -> T:
+    """Calls the function and, if it takes longer than the delay, calls it once more, taking the first result.
+
+    The slower call is not cancelled, its result is discarded. If the first finished call
+    fails, the result of the other one is waited for.
+
+    Args:
+        executor (Executor): The executor running the calls.
+        func (Callable[[], T]): The idempotent function to call.
+        delay (float): The time in seconds to wait before the duplicate call.
+
+    Returns:
+        T: The result of the first successful call.
+
+    Raises:
+        Exception: The exception of the second failed call if both calls failed.
+    """
+    first = executor.submit(func)
+    try:
+        return first.result(timeout=delay)
+    except TimeoutError:
+        pass
+    second = executor.submit(func)
+    done, pending = wait((first, second), return_when=FIRST_COMPLETED)
+    winner = done.pop()
+    if winner.exception() is None:
+        return winner.result()
+    loser = pending.pop() if pending else done.pop()
+    return loser.result()
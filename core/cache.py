@@ -0,0 +1,196 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+from core.models import Movie
+
+
+class ResponseCache:
+    """A class used to keep the latest API responses to answer without the API.
+
+    The cache is a bounded LRU of the decoded JSON responses keyed by the
+    request URL and parameters.
+
+        ...
+
+        Attributes
+        ----------
+        maxsize : int
+            The maximum number of cached responses.
+
+        Methods
+        -------
+        get(key: Hashable, max_age: Optional[float]) -> Optional[Any]
+            Returns the cached response or None.
+        put(key: Hashable, response: Any) -> None
+            Caches the response.
+        """
+    def __init__(self, maxsize: int = 256):
+        """
+        Parameters
+        ----------
+        maxsize : int
+            The maximum number of cached responses.
+        """
+        self.maxsize = maxsize
+        self.__responses: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key: Hashable, max_age: Optional[float] = None) -> Optional[Any]:
+        """Returns the cached response.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the request.
+        max_age : float, optional
+            The maximum age of the response in seconds, any age if not specified.
+
+        Returns
+        -------
+        Optional[Any]
+            The decoded JSON response or None if it is not cached or is older.
+        """
+        with self.__lock:
+            cached = self.__responses.get(key)
+            if cached is None:
+                return None
+            cached_at, response = cached
+            if max_age is not None and time.monotonic() - cached_at > max_age:
+                return None
+            self.__responses.move_to_end(key)
+            return response
+
+    def put(self, key: Hashable, response: Any) -> None:
+        """Caches the response, evicting the least recently used one if the cache is full.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the request.
+        response : Any
+            The decoded JSON response.
+        """
+        with self.__lock:
+            self.__responses[key] = (time.monotonic(), response)
+            self.__responses.move_to_end(key)
+            while len(self.__responses) > self.maxsize:
+                self.__responses.popitem(last=False)
+
+
+class PrefixCache:
+    """A class used to keep the search results to answer the queries being typed.
+
+    The results are kept per normalized query for ``ttl`` seconds in a bounded LRU.
+    If the results of a shorter prefix of the query were complete, that is the API
+    found no more movies than it returned, the results of the query are filtered
+    from them locally, so typing the rest of the title costs no API requests.
+
+        ...
+
+        Attributes
+        ----------
+        maxsize : int
+            The maximum number of cached queries.
+        ttl : float
+            The time in seconds the results are kept.
+        min_length : int
+            The length of the shortest prefix looked up.
+
+        Methods
+        -------
+        normalize(query: str) -> str
+            Normalizes the query.
+        get(query: str) -> Optional[list[Movie]]
+            Returns the cached results of the query or None.
+        put(query: str, movies: list[Movie], complete: bool) -> None
+            Caches the results of the query.
+        """
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, min_length: int = 2):
+        """
+        Parameters
+        ----------
+        maxsize : int
+            The maximum number of cached queries.
+        ttl : float
+            The time in seconds the results are kept.
+        min_length : int
+            The length of the shortest prefix looked up.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.min_length = min_length
+        self.__results: OrderedDict[str, tuple[float, list[Movie], bool]] = OrderedDict()
+        self.__lock = Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalizes the query, so the queries differing in case and spaces share the results.
+
+        Parameters
+        ----------
+        query : str
+            The query typed by the user.
+
+        Returns
+        -------
+        str
+            The query in lower case with the spaces collapsed.
+        """
+        return ' '.join(query.lower().split())
+
+    def get(self, query: str) -> Optional[list[Movie]]:
+        """Returns the cached results of the query or filters them from the complete results of its prefix.
+
+        Parameters
+        ----------
+        query : str
+            The normalized query.
+
+        Returns
+        -------
+        Optional[list[Movie]]
+            The movies or None if neither the query nor its prefixes are cached.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            for length in range(len(query), self.min_length - 1, -1):
+                prefix = query[:length]
+                cached = self.__results.get(prefix)
+                if cached is None:
+                    continue
+                cached_at, movies, complete = cached
+                if now - cached_at > self.ttl:
+                    del self.__results[prefix]
+                    continue
+                if length == len(query):
+                    self.__results.move_to_end(prefix)
+                    return movies
+                if complete:
+                    self.__results.move_to_end(prefix)
+                    return [movie for movie in movies if query in self.__titles(movie)]
+            return None
+
+    def put(self, query: str, movies: list[Movie], complete: bool) -> None:
+        """Caches the results of the query, evicting the least recently used ones if the cache is full.
+
+        Parameters
+        ----------
+        query : str
+            The normalized query.
+        movies : list[Movie]
+            The movies found.
+        complete : bool
+            Whether the API found no more movies than returned.
+        """
+        with self.__lock:
+            self.__results[query] = (time.monotonic(), movies, complete)
+            self.__results.move_to_end(query)
+            while len(self.__results) > self.maxsize:
+                self.__results.popitem(last=False)
+
+    @classmethod
+    def __titles(cls, movie: Movie) -> str:
+        """Returns the normalized titles of the movie to match the queries against."""
+        return cls.normalize(f'{movie.original_title} {movie.alternative_title or ""}')
@@ -1,3 +1,6 @@
+from datetime import datetime, timezone
+from typing import Optional
+
 from core.models import Movie
 
 
@@ -6,7 +9,7 @@ def dict_to_movie(raw_movie: dict) -> Movie:
 
     This function extracts various movie details from the input dictionary,
     including the title, alternative title, id, year, ratings from Kinopoisk and IMDb,
-    genres, description, and poster URL.
+    genres, description, poster URL and type.
     It then creates and returns a Movie object with these details.
     Args:
         raw_movie: dict
@@ -27,6 +30,7 @@ def dict_to_movie(raw_movie: dict) -> Movie:
     genres = [g['name'] for g in raw_movie['genres']]
     description = raw_movie['description']
     poster_url = raw_movie['poster'] and raw_movie['poster']['previewUrl']
+    type_ = raw_movie.get('type')
 
     return Movie(
         original_title=title,
@@ -37,7 +41,8 @@ def dict_to_movie(raw_movie: dict) -> Movie:
         rating_imdb=rating_imdb,
         genres=genres,
         description=description,
-        poster_url=poster_url
+        poster_url=poster_url,
+        type=type_
     )
 
 
@@ -46,7 +51,7 @@ def dict_to_movie_byname(raw_movie: dict) -> Movie:
 
     This function extracts various movie details from the input dictionary,
     including the title, alternative title, id, year, ratings from Kinopoisk
-    and sets the IMDb rating to 0, genres, description, and poster URL.
+    and sets the IMDb rating to 0, genres, description, poster URL and type.
     It then creates and returns a Movie object with these details.
 
     Args:
@@ -67,6 +72,7 @@ def dict_to_movie_byname(raw_movie: dict) -> Movie:
     genres = raw_movie['genres']
     description = raw_movie['description']
     poster_url = raw_movie['poster']
+    type_ = raw_movie.get('type')
 
     return Movie(
         original_title=title,
@@ -77,6 +83,28 @@ def dict_to_movie_byname(raw_movie: dict) -> Movie:
         rating_imdb=0,
         genres=genres,
         description=description,
-        poster_url=poster_url
+        poster_url=poster_url,
+        type=type_
     )
 
+
+def dict_to_updated_at(raw_movie: dict) -> Optional[datetime]:
+    """Returns the time the movie was last changed in the movie database
+
+    Args:
+        raw_movie: dict
+            Raw movie information from the api
+
+    Returns:
+    -------
+    datetime, optional
+        The time in UTC without the time zone, None if the movie has no valid 'updatedAt'.
+
+    """
+    try:
+        updated_at = datetime.fromisoformat(raw_movie['updatedAt'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if updated_at.tzinfo is not None:
+        updated_at = updated_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return updated_at
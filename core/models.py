@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
 
 
@@ -29,6 +30,8 @@ class Movie:
         a string representing the URL of the movie poster
     alternative_title : str, optional
         a string representing the alternative title of the movie
+    type : str, optional
+        a string representing the type of the movie, e.g. "movie" or "tv-series"
 
     Methods
     -------
@@ -44,6 +47,7 @@ class Movie:
     description: Optional[str]
     poster_url: Optional[str]
     alternative_title: Optional[str]
+    type: Optional[str] = None
 
     @property
     def url(self):
@@ -82,4 +86,28 @@ class MovieCountPages:
     movies: list[Movie]
 
 
+@dataclass
+class MovieUpdates:
+    """
+    A class to respresent a page of the movies changed within a period, the least recently changed first.
 
+    ...
+
+    Attributes
+    ----------
+    current_page : int
+        an integer representing the current page number
+    total_pages : int
+        an integer representing the total number of pages
+    total_movies : int
+        an integer representing the total number of movies on all pages
+    movies : List[Movie]
+        a list containing the 'Movie' objects corresponding to that page
+    updated_at : datetime, optional
+        the latest time a movie of the page was changed, None if the page has no times
+    """
+    current_page: int
+    total_pages: int
+    total_movies: int
+    movies: list[Movie]
+    updated_at: Optional[datetime]
@@ -0,0 +1,158 @@
+from dataclasses import dataclass, field
+from math import ceil
+from typing import Callable
+
+from core.models import Movie, MovieCountPages
+
+
+@dataclass
+class MoviesWindow:
+    """
+    A class to represent a locally held window of search results.
+
+    The movie API is queried with large pages (``size`` movies at once) and the
+    user's small pages of ``amount`` movies are sliced out of the held window.
+    The window size is rounded down to a multiple of ``amount``, so a user page
+    never straddles two upstream pages and at most one upstream page is held.
+
+    The instance only keeps plain data, so it can be stored in the bot state
+    storage, which deep copies the data on every access.
+
+    ...
+
+    Attributes
+    ----------
+    amount : int
+        an integer representing the number of movies on a user page
+    size : int
+        an integer representing the number of movies on an upstream page
+    upstream_page : int
+        an integer representing the number of the currently held upstream page
+        (0 if nothing is fetched yet)
+    total_movies : int
+        an integer representing the total number of movies reported by the API
+    movies : List[Movie]
+        a list containing the movies of the currently held upstream page
+    position : int
+        an integer representing the index of the next movie of the held page for ``next``
+    shown_pages : int
+        an integer representing the number of the user pages returned by ``next``
+
+    Methods
+    -------
+    def page(page: int, fetch: Callable[[int, int], MovieCountPages]) -> MovieCountPages:
+        returns the user page with the given number, fetching the upstream page if needed
+    def next(fetch: Callable[[int, int], MovieCountPages], exclude: Callable[[Movie], bool]) -> MovieCountPages:
+        returns the next user page of the movies not excluded
+    """
+    amount: int
+    size: int = 50
+    upstream_page: int = 0
+    total_movies: int = 0
+    movies: list[Movie] = field(default_factory=list)
+    position: int = 0
+    shown_pages: int = 0
+
+    def __post_init__(self):
+        self.size = max(self.amount, self.size - self.size % self.amount)
+
+    @property
+    def total_pages(self) -> int:
+        """Property Method for the number of user pages
+
+        Returns
+        -------
+        int
+            the number of pages of ``amount`` movies
+        """
+        return ceil(self.total_movies / self.amount)
+
+    def page(self, page: int, fetch: Callable[[int, int], MovieCountPages]) -> MovieCountPages:
+        """Returns the user page with the given number.
+
+        Parameters
+        ----------
+        page : int
+            The user page number, starting from 1.
+        fetch : Callable[[int, int], MovieCountPages]
+            A function accepting the upstream page number and page size
+            and returning the upstream page.
+
+        Returns
+        -------
+        MovieCountPages
+            The user page in terms of ``amount``-sized pages.
+        """
+        offset = (page - 1) * self.amount
+        upstream_page = offset // self.size + 1
+        if upstream_page != self.upstream_page:
+            response = fetch(upstream_page, self.size)
+            self.upstream_page = upstream_page
+            self.total_movies = response.total_movies
+            self.movies = response.movies
+
+        start = offset % self.size
+        return MovieCountPages(
+            current_page=page,
+            total_pages=self.total_pages,
+            total_movies=self.total_movies,
+            movies=self.movies[start:start + self.amount]
+        )
+
+    def next(self,
+             fetch: Callable[[int, int], MovieCountPages],
+             exclude: Callable[[Movie], bool],
+             max_fetches: int = 3) -> MovieCountPages:
+        """Returns the next user page of the movies not excluded.
+
+        The excluded movies are skipped and the next upstream pages are fetched until
+        the user page is full, the results end or ``max_fetches`` pages are fetched,
+        so the page may be shorter than ``amount`` or empty while more pages remain.
+        The window is read either with ``page`` or with ``next``, not with both.
+
+        Parameters
+        ----------
+        fetch : Callable[[int, int], MovieCountPages]
+            A function accepting the upstream page number and page size
+            and returning the upstream page.
+        exclude : Callable[[Movie], bool]
+            A function telling whether the movie is skipped.
+        max_fetches : int
+            The maximum number of the upstream pages fetched for the page.
+
+        Returns
+        -------
+        MovieCountPages
+            The user page, the total number of pages is estimated from the movies left.
+        """
+        movies = []
+        fetches = 0
+        while len(movies) < self.amount:
+            if self.position >= len(self.movies):
+                if (self.upstream_page and self.__consumed() >= self.total_movies) or fetches >= max_fetches:
+                    break
+                response = fetch(self.upstream_page + 1, self.size)
+                fetches += 1
+                self.upstream_page += 1
+                self.total_movies = response.total_movies
+                self.movies = response.movies
+                self.position = 0
+                if not self.movies:
+                    break
+            movie = self.movies[self.position]
+            self.position += 1
+            if not exclude(movie):
+                movies.append(movie)
+
+        self.shown_pages += 1
+        left = max(0, self.total_movies - self.__consumed())
+        return MovieCountPages(
+            current_page=self.shown_pages,
+            total_pages=self.shown_pages + ceil(left / self.amount) if self.total_movies else 0,
+            total_movies=self.total_movies,
+            movies=movies
+        )
+
+    def __consumed(self) -> int:
+        """Returns the number of the movies read by ``next``."""
+        return max(0, self.upstream_page - 1) * self.size + self.position
@@ -0,0 +1,373 @@
+import hashlib
+import io
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Iterable, Optional, Union
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow the posters are kept as downloaded, only the JPEG ones.
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+NO_POSTER = 'https://upload.wikimedia.org/wikipedia/commons/a/a1/Out_Of_Poster.jpg'
+BROKEN_STATUSES = (404, 410)  # The other errors may be transient, they are retried on the next access.
+JPEG_START, JPEG_END = b'\xff\xd8', b'\xff\xd9'
+
+
+@dataclass
+class Poster:
+    """
+    A class to represent a poster ready to be sent.
+
+    ...
+
+    Attributes
+    ----------
+    url : str
+        the URL of the image, the poster or the placeholder
+    photo : Union[str, io.BytesIO]
+        the Telegram file ID, the cached JPEG or the URL itself to let Telegram download it
+    """
+    url: str
+    photo: Union[str, io.BytesIO]
+
+
+class PosterCache:
+    """A class used to send the posters from the local disk instead of the remote URLs.
+
+    Every poster is downloaded once in the background, scaled down to fit ``max_size``,
+    re-encoded to JPEG and stored under the SHA-256 of its content. The files are
+    evicted least recently used first once they take more than ``max_bytes``. The
+    directory is scanned again after every download, so the limit holds for all the
+    processes sharing it and the files used by the other processes count as recently
+    used. A file is checked against its digest before it is sent, a damaged one is
+    downloaded again.
+
+    Once a poster has been uploaded, Telegram's file ID is remembered and sent instead.
+    A URL answering with 404 or 410 or with something that is not an image is remembered
+    as broken, and the placeholder is sent for it without trying it again.
+
+    The state of the URLs is kept by the ``load`` and ``save`` functions, so it
+    survives the restarts and is shared by the processes.
+
+        ...
+
+        Attributes
+        ----------
+        directory : str
+            The directory of the cached files.
+        max_bytes : int
+            The maximum total size of the cached files.
+        max_size : tuple[int, int]
+            The maximum width and height of the stored posters.
+        wait : float
+            The time in seconds to wait for a poster not downloaded yet before sending its URL.
+        placeholder : str
+            The URL of the image sent instead of the missing and broken posters.
+        transport : Callable[..., requests.Response]
+            The function downloading the posters.
+
+        Methods
+        -------
+        prefetch(urls: Iterable[Optional[str]]) -> None
+            Starts the downloads of the posters not cached yet.
+        get(url: Optional[str], wait: Optional[float]) -> Poster
+            Returns the poster to send.
+        remember(poster: Poster, file_id: str) -> None
+            Remembers the Telegram file ID of the uploaded poster.
+        """
+    def __init__(self,
+                 directory: str,
+                 max_bytes: int,
+                 load: Callable[[str], Optional[tuple[Optional[str], Optional[str]]]],
+                 save: Callable[[str, Optional[str], Optional[str]], None],
+                 max_size: tuple[int, int] = (600, 900),
+                 quality: int = 85,
+                 wait: float = 2,
+                 timeout: float = 10,
+                 executor: Optional[Executor] = None,
+                 placeholder: str = NO_POSTER,
+                 transport: Callable[..., requests.Response] = requests.get):
+        """
+        Parameters
+        ----------
+        directory : str
+            The directory of the cached files, created if missing.
+        max_bytes : int
+            The maximum total size of the cached files.
+        load : Callable[[str], Optional[tuple[Optional[str], Optional[str]]]]
+            Returns the digest and the file ID saved for the URL, None if the URL is unknown.
+            The digest is None if the URL is broken.
+        save : Callable[[str, Optional[str], Optional[str]], None]
+            Saves the digest and the file ID of the URL.
+        max_size : tuple[int, int]
+            The maximum width and height of the stored posters.
+        quality : int
+            The JPEG quality of the stored posters.
+        wait : float
+            The time in seconds to wait for a poster not downloaded yet before sending its URL.
+        timeout : float
+            The timeout of the downloads in seconds.
+        executor : Executor, optional
+            The executor of the downloads, a pool of 4 threads if not specified.
+        placeholder : str
+            The URL of the image sent instead of the missing and broken posters.
+        transport : Callable[..., requests.Response]
+            The function downloading the posters with the signature of ``requests.get``.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.quality = quality
+        self.wait = wait
+        self.timeout = timeout
+        self.placeholder = placeholder
+        self.transport = transport
+        self.__load = load
+        self.__save = save
+        self.__executor = executor or ThreadPoolExecutor(4, 'posters')
+        self.__urls: dict[str, tuple[Optional[str], Optional[str]]] = {}
+        self.__downloads: dict[str, Future] = {}
+        self.__lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.__files: OrderedDict[str, int] = self.__scan()
+
+    @property
+    def size(self) -> int:
+        """The total size of the cached files in bytes."""
+        with self.__lock:
+            return sum(self.__files.values())
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__files)
+
+    def prefetch(self, urls: Iterable[Optional[str]]) -> None:
+        """Starts the downloads of the posters not cached yet, so the posters of a page are downloaded together.
+
+        Parameters
+        ----------
+        urls : Iterable[Optional[str]]
+            The URLs of the posters, the placeholder if not specified.
+        """
+        for url in dict.fromkeys(url or self.placeholder for url in urls):
+            digest, file_id = self.__state(url)
+            if file_id is not None or self.__is_broken(url):
+                continue
+            if digest is None or not os.path.exists(self.__path(digest)):
+                self.__download(url)
+
+    def get(self, url: Optional[str], wait: Optional[float] = None) -> Poster:
+        """Returns the poster to send.
+
+        The poster not downloaded yet is downloaded in the background. If it is not
+        downloaded within ``wait`` seconds, its URL is returned to let Telegram try it.
+
+        Parameters
+        ----------
+        url : str, optional
+            The URL of the poster, the placeholder is returned if not specified.
+        wait : float, optional
+            The time in seconds to wait for the download, ``self.wait`` if not specified.
+
+        Returns
+        -------
+        Poster
+            The poster.
+        """
+        url = url or self.placeholder
+        digest, file_id = self.__state(url)
+        if file_id is not None:
+            return Poster(url, file_id)
+        photo = self.__read(digest) if digest is not None else None
+        if photo is None and not self.__is_broken(url):
+            try:
+                digest = self.__download(url).result(self.wait if wait is None else wait)
+            except TimeoutError:
+                return Poster(url, url)
+            photo = self.__read(digest) if digest is not None else None
+        if photo is not None:
+            return Poster(url, photo)
+        if self.__is_broken(url) and url != self.placeholder:
+            return self.get(self.placeholder, wait)
+        return Poster(url, url)
+
+    def remember(self, poster: Poster, file_id: str) -> None:
+        """Remembers the Telegram file ID of the sent poster, so it is not uploaded again.
+
+        Parameters
+        ----------
+        poster : Poster
+            The sent poster.
+        file_id : str
+            The file ID of the largest size of the sent photo.
+        """
+        if isinstance(poster.photo, str) and poster.photo != poster.url:
+            return
+        with self.__lock:
+            digest, _ = self.__urls.get(poster.url, (None, None))
+            self.__urls[poster.url] = digest, file_id
+        self.__save(poster.url, digest, file_id)
+
+    def __state(self, url: str) -> tuple[Optional[str], Optional[str]]:
+        """Returns the digest and the file ID of the URL, loading them on the first access."""
+        with self.__lock:
+            state = self.__urls.get(url)
+        if state is not None:
+            return state
+        state = self.__load(url)
+        if state is None:
+            return None, None
+        with self.__lock:
+            self.__urls[url] = state
+        return state
+
+    def __is_broken(self, url: str) -> bool:
+        """Tells whether the URL is known to be broken."""
+        with self.__lock:
+            return self.__urls.get(url) == (None, None)
+
+    def __download(self, url: str) -> Future:
+        """Starts the download of the URL unless it is already running."""
+        with self.__lock:
+            future = self.__downloads.get(url)
+            if future is None:
+                future = self.__downloads[url] = self.__executor.submit(self.__fetch, url)
+        return future
+
+    def __fetch(self, url: str) -> Optional[str]:
+        """Downloads and stores the poster.
+
+        Returns the digest of the stored file, None if the URL is broken or the
+        download failed, which is retried on the next access.
+        """
+        try:
+            try:
+                response = self.transport(url, timeout=self.timeout)
+            except requests.RequestException as exception:
+                logger.warning('Failed to download the poster %s: %r', url, exception)
+                return None
+            if response.status_code in BROKEN_STATUSES:
+                return self.__mark_broken(url, f'HTTP {response.status_code}')
+            if not response.ok:
+                logger.warning('Failed to download the poster %s: HTTP %s', url, response.status_code)
+                return None
+            data = self.__normalize(response.content)
+            if data is None:
+                return self.__mark_broken(url, 'not an image')
+            digest = hashlib.sha256(data).hexdigest()
+            try:
+                self.__write(digest, data)
+            except OSError as exception:
+                logger.warning('Failed to store the poster %s: %r', url, exception)
+                return None
+            _, file_id = self.__state(url)
+            with self.__lock:
+                file_id = self.__urls.get(url, (None, file_id))[1]
+                self.__urls[url] = digest, file_id
+            self.__save(url, digest, file_id)
+            return digest
+        finally:
+            with self.__lock:
+                self.__downloads.pop(url, None)
+
+    def __normalize(self, data: bytes) -> Optional[bytes]:
+        """Returns the image scaled down and encoded to JPEG, None if it is not an image."""
+        if Image is None:
+            return data if data.startswith(JPEG_START) and data.rstrip(b'\0').endswith(JPEG_END) else None
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image = image.convert('RGB')
+                image.thumbnail(self.max_size)
+                output = io.BytesIO()
+                image.save(output, 'JPEG', quality=self.quality, optimize=True)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+        return output.getvalue()
+
+    def __mark_broken(self, url: str, reason: str) -> None:
+        """Remembers the URL as broken."""
+        logger.info('The poster %s is broken: %s', url, reason)
+        with self.__lock:
+            self.__urls[url] = None, None
+        self.__save(url, None, None)
+
+    def __path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f'{digest}.jpg')
+
+    def __read(self, digest: str) -> Optional[io.BytesIO]:
+        """Returns the cached file if it is intact, marking it as recently used."""
+        path = self.__path(digest)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            data = None
+        if data is None or hashlib.sha256(data).hexdigest() != digest:
+            if data is not None:
+                logger.warning('The cached poster %s is damaged', path)
+            self.__remove(digest)
+            return None
+        with self.__lock:
+            self.__files[digest] = len(data)
+            self.__files.move_to_end(digest)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        photo = io.BytesIO(data)
+        photo.name = os.path.basename(path)
+        return photo
+
+    def __write(self, digest: str, data: bytes) -> None:
+        """Stores the file and evicts the least recently used ones of the directory beyond the size limit."""
+        path = self.__path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        files = self.__scan()
+        with self.__lock:
+            self.__files = files
+            self.__files[digest] = len(data)
+            self.__files.move_to_end(digest)
+            total = sum(self.__files.values())
+            evicted = []
+            while total > self.max_bytes and len(self.__files) > 1:
+                evicted_digest, size = self.__files.popitem(last=False)
+                evicted.append(evicted_digest)
+                total -= size
+        for evicted_digest in evicted:
+            self.__remove(evicted_digest)
+
+    def __remove(self, digest: str) -> None:
+        """Deletes the cached file."""
+        with self.__lock:
+            self.__files.pop(digest, None)
+        try:
+            os.remove(self.__path(digest))
+        except OSError:
+            pass
+
+    def __scan(self) -> OrderedDict[str, int]:
+        """Returns the sizes of the cached files of all processes from the least recently used one."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.jpg'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:  # Evicted by another process meanwhile.
+                    continue
+                files.append((stat.st_mtime, name[:-len('.jpg')], stat.st_size))
+        return OrderedDict((digest, size) for _, digest, size in sorted(files))
@@ -0,0 +1,174 @@
+import hashlib
+import time
+from datetime import date
+from enum import IntEnum
+from threading import Lock
+from typing import Callable
+
+
+def key_fingerprint(key: str) -> str:
+    """Returns a short fingerprint identifying the API key without revealing it.
+
+    Parameters
+    ----------
+    key : str
+        The API key.
+
+    Returns
+    -------
+    str
+        The first 12 hex digits of the SHA-256 hash of the key.
+    """
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+class Priority(IntEnum):
+    """
+    A class to represent the priority of the API traffic.
+
+    ...
+
+    Attributes
+    ----------
+    BACKGROUND :
+        prefetch, warmup and synchronization requests
+    INTERACTIVE :
+        requests made to answer a user
+    """
+    BACKGROUND = 0
+    INTERACTIVE = 1
+
+
+class QuotaGovernor:
+    """A class used to keep the API usage of one key within its daily quota.
+
+    The calls are counted per endpoint in a daily window persisted by the
+    ``load``/``save`` functions, so the count survives restarts and is shared
+    by the processes using the same storage. The budget below ``reserve`` is kept
+    for the interactive requests, and below ``cache_threshold`` the interactive
+    requests are answered from the cache whenever possible.
+
+        ...
+
+        Attributes
+        ----------
+        key_id : str
+            The fingerprint of the API key the quota belongs to.
+        daily_limit : int
+            The number of requests allowed per day.
+        reserve : int
+            The remaining budget not available to the background requests.
+        cache_threshold : int
+            The remaining budget below which the cached answers are preferred.
+
+        Methods
+        -------
+        acquire(endpoint: str, priority: Priority) -> bool
+            Counts a call to the endpoint if the budget allows it.
+        prefers_cache(priority: Priority) -> bool
+            Checks whether the cached answers should be used instead of the API.
+        remaining() -> int
+            Returns the remaining budget for today.
+        """
+    def __init__(self,
+                 key_id: str,
+                 daily_limit: int,
+                 reserve: int,
+                 cache_threshold: int,
+                 load: Callable[[date, str], dict[str, int]],
+                 save: Callable[[date, str, str, int], None],
+                 sync_interval: float = 60):
+        """
+        Parameters
+        ----------
+        key_id : str
+            The fingerprint of the API key the quota belongs to.
+        daily_limit : int
+            The number of requests allowed per day.
+        reserve : int
+            The remaining budget not available to the background requests.
+        cache_threshold : int
+            The remaining budget below which the cached answers are preferred.
+        load : Callable[[date, str], dict[str, int]]
+            Returns the number of calls per endpoint made with the key on the day.
+        save : Callable[[date, str, str, int], None]
+            Adds the number of calls to the endpoint made with the key on the day.
+        sync_interval : float
+            The interval in seconds to reload the usage made by the other processes.
+        """
+        self.key_id = key_id
+        self.daily_limit = daily_limit
+        self.reserve = reserve
+        self.cache_threshold = cache_threshold
+        self.sync_interval = sync_interval
+        self.__load = load
+        self.__save = save
+        self.__day = None
+        self.__used = 0
+        self.__synced_at = 0.0
+        self.__lock = Lock()
+
+    def acquire(self, endpoint: str, priority: Priority) -> bool:
+        """Counts a call to the endpoint if the budget allows it.
+
+        Parameters
+        ----------
+        endpoint : str
+            The name of the endpoint.
+        priority : Priority
+            The priority of the request.
+
+        Returns
+        -------
+        bool
+            True if the call may be made, False if the budget is exhausted for this priority.
+        """
+        with self.__lock:
+            self.__sync()
+            floor = 0 if priority >= Priority.INTERACTIVE else self.reserve
+            if self.daily_limit - self.__used <= floor:
+                return False
+            self.__used += 1
+            day = self.__day
+        self.__save(day, self.key_id, endpoint, 1)
+        return True
+
+    def prefers_cache(self, priority: Priority) -> bool:
+        """Checks whether the cached answers should be used instead of the API.
+
+        Parameters
+        ----------
+        priority : Priority
+            The priority of the request.
+
+        Returns
+        -------
+        bool
+            True if the remaining budget is below the threshold or the reserve for this priority.
+        """
+        threshold = self.cache_threshold if priority >= Priority.INTERACTIVE else self.reserve
+        return self.remaining() <= threshold
+
+    def remaining(self) -> int:
+        """Returns the remaining budget for today.
+
+        Returns
+        -------
+        int
+            The number of requests left today.
+        """
+        with self.__lock:
+            self.__sync()
+            return max(0, self.daily_limit - self.__used)
+
+    def __sync(self) -> None:
+        """Reloads the usage on a new day or when the sync interval has passed.
+
+        Must be called with the lock held.
+        """
+        today = date.today()
+        now = time.monotonic()
+        if today != self.__day or now - self.__synced_at >= self.sync_interval:
+            self.__day = today
+            self.__used = sum(self.__load(today, self.key_id).values())
+            self.__synced_at = now
@@ -0,0 +1,281 @@
+import random
+from threading import Lock
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from core.models import Movie
+from core.snapshot import CatalogSnapshot
+
+MIN_YEAR, MAX_YEAR = 1850, 2050
+YEAR_BUCKETS = MAX_YEAR - MIN_YEAR + 2  # The bucket 0 is the unknown year.
+RATING_BUCKETS = 11
+TYPE_BUCKETS = 8  # The bucket 0 is the unknown type and the types beyond the first seven.
+ALL_GENRES = -1
+
+
+def year_bucket(year: Optional[int]) -> int:
+    """Returns the bucket of the release year, 0 if the year is unknown.
+
+    Parameters
+    ----------
+    year : int, optional
+        The release year.
+
+    Returns
+    -------
+    int
+        The bucket, the years out of range fall into the first or the last one.
+    """
+    if not year:
+        return 0
+    return min(max(int(year), MIN_YEAR), MAX_YEAR) - MIN_YEAR + 1
+
+
+def rating_bucket(rating: Optional[float]) -> int:
+    """Returns the bucket of the rating, its integer part.
+
+    Parameters
+    ----------
+    rating : float, optional
+        The rating from 0 to 10, 0 if unknown.
+
+    Returns
+    -------
+    int
+        The bucket from 0 to 10.
+    """
+    return min(max(int(rating or 0), 0), RATING_BUCKETS - 1)
+
+
+class RandomIndex:
+    """A class used to pick a random movie of the catalog matching the filters.
+
+    The IDs are kept in buckets by the genre, the type, the release year and the integer
+    part of the Kinopoisk rating, every genre also has an array of the bucket sizes. A
+    query takes the sizes of the matching buckets, picks one of the movies in them
+    with a single random number and finds its bucket by the cumulative sizes, so
+    every matching movie is equally likely and no pick is rejected. A movie is in
+    the bucket of every its genre and in the buckets of all genres.
+
+    The ratings are compared by their integer part: the rating range 7-8 matches
+    the ratings from 7.0 to 8.9.
+
+        ...
+
+        Methods
+        -------
+        load_snapshot(snapshot: CatalogSnapshot) -> None
+            Replaces the movies with the ones of the snapshot.
+        add_many(movies: Iterable[tuple[int, int, float, float, list[str], str]]) -> None
+            Adds or moves the movies.
+        sample(type: Optional[str], genre: Optional[str], years: Optional[tuple[int, int]],
+               ratings: Optional[tuple[int, int]], exclude: Callable[[int], bool]) -> Optional[int]
+            Returns a random movie matching the filters.
+        genres() -> list[str]
+            Returns the known genres.
+        types() -> list[str]
+            Returns the known types.
+        """
+    def __init__(self):
+        self.__genre_bits: dict[str, int] = {}
+        self.__type_buckets: dict[str, int] = {}
+        self.__buckets: dict[int, dict[int, list[int]]] = {}
+        self.__counts: dict[int, np.ndarray] = {}
+        self.__places: dict[int, tuple[int, int]] = {}
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__places)
+
+    def load_snapshot(self, snapshot: CatalogSnapshot) -> None:
+        """Replaces the movies with the ones of the snapshot.
+
+        Parameters
+        ----------
+        snapshot : CatalogSnapshot
+            The snapshot of the catalog.
+        """
+        ids = np.asarray(snapshot.ids, dtype=np.int64)
+        masks = np.asarray(snapshot.genre_masks, dtype=np.uint64)
+        years = np.asarray(snapshot.years, dtype=np.int64)
+        known = years > 0
+        years = np.where(known, np.clip(years, MIN_YEAR, MAX_YEAR) - MIN_YEAR + 1, 0)
+        ratings = np.clip(np.nan_to_num(np.asarray(snapshot.ratings_kp, dtype=np.float64)), 0, RATING_BUCKETS - 1)
+        types = np.asarray(snapshot.type_codes, dtype=np.int64)
+        types = np.where(types < TYPE_BUCKETS, types, 0)
+        cells = (types * YEAR_BUCKETS + years) * RATING_BUCKETS + ratings.astype(np.int64)
+
+        buckets = {ALL_GENRES: self.__group(ids, cells)}
+        for bit in range(len(snapshot.genres)):
+            rows = (masks >> np.uint64(bit)) & np.uint64(1) == 1
+            buckets[bit] = self.__group(ids[rows], cells[rows])
+        with self.__lock:
+            self.__genre_bits = {genre: bit for bit, genre in enumerate(snapshot.genres)}
+            self.__type_buckets = {type_: code for code, type_ in enumerate(snapshot.types[:TYPE_BUCKETS - 1], 1)}
+            self.__buckets = buckets
+            self.__counts = {genre: self.__sizes(cells) for genre, cells in buckets.items()}
+            self.__places = dict(zip(ids.tolist(), zip(cells.tolist(), masks.tolist())))
+
+    def add_movies(self, movies: Iterable[Movie]) -> None:
+        """Adds or moves the movies.
+
+        Parameters
+        ----------
+        movies : Iterable[Movie]
+            The movies.
+        """
+        self.add_many((movie.id, movie.year, movie.rating_kp, movie.rating_imdb, movie.genres, movie.type)
+                      for movie in movies)
+
+    def add_many(self, movies: Iterable[tuple[int, Optional[int], Optional[float], Optional[float], list[str],
+                                              Optional[str]]]) -> None:
+        """Adds or moves the movies, a movie changed since it was added is moved to its new buckets.
+
+        Parameters
+        ----------
+        movies : Iterable[tuple[int, Optional[int], Optional[float], Optional[float], list[str], Optional[str]]]
+            The ID, the year, the Kinopoisk and IMDB ratings, the genres and the type of every movie.
+        """
+        with self.__lock:
+            for id_kp, year, rating_kp, _, genres, type_ in movies:
+                id_kp = int(id_kp)
+                cell = (self.__type_bucket(type_) * YEAR_BUCKETS + year_bucket(year)) * RATING_BUCKETS \
+                    + rating_bucket(rating_kp)
+                place = (cell, self.__genre_mask(genres))
+                old_place = self.__places.get(id_kp)
+                if old_place == place:
+                    continue
+                if old_place is not None:
+                    for genre in self.__genre_keys(old_place[1]):
+                        self.__buckets[genre][old_place[0]].remove(id_kp)
+                        self.__counts[genre].flat[old_place[0]] -= 1
+                for genre in self.__genre_keys(place[1]):
+                    self.__buckets.setdefault(genre, {}).setdefault(place[0], []).append(id_kp)
+                    counts = self.__counts.setdefault(genre, np.zeros((TYPE_BUCKETS, YEAR_BUCKETS, RATING_BUCKETS),
+                                                                      np.int64))
+                    counts.flat[place[0]] += 1
+                self.__places[id_kp] = place
+
+    def sample(self,
+               type: Optional[str] = None,
+               genre: Optional[str] = None,
+               years: Optional[tuple[int, int]] = None,
+               ratings: Optional[tuple[int, int]] = None,
+               exclude: Optional[Callable[[int], bool]] = None,
+               attempts: int = 3) -> Optional[int]:
+        """Returns a random movie matching the filters.
+
+        Parameters
+        ----------
+        type : str, optional
+            The type, any if not specified.
+        genre : str, optional
+            The genre, any if not specified.
+        years : tuple[int, int], optional
+            The range of the release years, both included, any year if not specified.
+        ratings : tuple[int, int], optional
+            The range of the integer parts of the Kinopoisk rating, both included, any if not specified.
+        exclude : Callable[[int], bool], optional
+            Tells whether the movie should not be returned, e.g. the user has already seen it.
+        attempts : int
+            The number of movies picked, they are checked against the exclusion in turn.
+
+        Returns
+        -------
+        Optional[int]
+            The ID of the movie, the last picked one if all picked ones are excluded,
+            None if no movie matches.
+        """
+        with self.__lock:
+            key = ALL_GENRES if genre is None else self.__genre_bits.get(genre)
+            if key is None or key not in self.__counts:
+                return None
+            if type is None:
+                layers = slice(0, TYPE_BUCKETS)
+            elif type in self.__type_buckets:
+                layers = slice(self.__type_buckets[type], self.__type_buckets[type] + 1)
+            else:
+                return None
+            rows = slice(year_bucket(years[0]), year_bucket(years[1]) + 1) if years else slice(0, YEAR_BUCKETS)
+            columns = slice(rating_bucket(ratings[0]), rating_bucket(ratings[1]) + 1) if ratings \
+                else slice(0, RATING_BUCKETS)
+            sizes = self.__counts[key][layers, rows, columns]
+            total_sizes = np.cumsum(sizes, axis=None)
+            total = int(total_sizes[-1]) if len(total_sizes) else 0
+            if not total:
+                return None
+            candidates = []
+            for _ in range(attempts if exclude is not None else 1):
+                index = random.randrange(total)
+                cell = int(np.searchsorted(total_sizes, index, side='right'))
+                layer, row, column = np.unravel_index(cell, sizes.shape)
+                offset = index - (int(total_sizes[cell - 1]) if cell else 0)
+                bucket = ((layers.start + int(layer)) * YEAR_BUCKETS + rows.start + int(row)) * RATING_BUCKETS \
+                    + columns.start + int(column)
+                candidates.append(self.__buckets[key][bucket][offset])
+        # The exclusion may query the database, so it is checked without holding the lock.
+        for picked in candidates:
+            if exclude is None or not exclude(picked):
+                break
+        return picked
+
+    def genres(self) -> list[str]:
+        """Returns the known genres.
+
+        Returns
+        -------
+        list[str]
+            The genres in the order they were met.
+        """
+        with self.__lock:
+            return list(self.__genre_bits)
+
+    def types(self) -> list[str]:
+        """Returns the known types.
+
+        Returns
+        -------
+        list[str]
+            The types in the order they were met.
+        """
+        with self.__lock:
+            return list(self.__type_buckets)
+
+    def __type_bucket(self, type_: Optional[str]) -> int:
+        """Returns the bucket of the type, 0 if unknown or if all buckets are taken. Must be called with the lock held."""
+        if not type_:
+            return 0
+        if type_ not in self.__type_buckets and len(self.__type_buckets) < TYPE_BUCKETS - 1:
+            self.__type_buckets[type_] = len(self.__type_buckets) + 1
+        return self.__type_buckets.get(type_, 0)
+
+    def __genre_mask(self, genres: list[str]) -> int:
+        """Returns the bit mask of the genres. Must be called with the lock held."""
+        mask = 0
+        for genre in genres:
+            bit = self.__genre_bits.setdefault(genre, len(self.__genre_bits))
+            mask |= 1 << bit
+        return mask
+
+    @staticmethod
+    def __genre_keys(mask: int) -> list[int]:
+        """Returns the keys of the buckets of the genres of the mask and of all genres."""
+        return [ALL_GENRES, *(bit for bit in range(mask.bit_length()) if mask >> bit & 1)]
+
+    @staticmethod
+    def __group(ids: np.ndarray, cells: np.ndarray) -> dict[int, list[int]]:
+        """Returns the IDs grouped by the cells."""
+        order = np.argsort(cells, kind='stable')
+        cells, ids = cells[order], ids[order]
+        starts = np.flatnonzero(np.diff(cells, prepend=-1))
+        return {int(cell): group.tolist() for cell, group in zip(cells[starts], np.split(ids, starts[1:]))}
+
+    @staticmethod
+    def __sizes(buckets: dict[int, list[int]]) -> np.ndarray:
+        """Returns the array of the sizes of the buckets by the type, the year and the rating."""
+        sizes = np.zeros((TYPE_BUCKETS, YEAR_BUCKETS, RATING_BUCKETS), np.int64)
+        for cell, bucket in buckets.items():
+            sizes.flat[cell] = len(bucket)
+        return sizes
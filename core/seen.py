@@ -0,0 +1,268 @@
+import math
+import struct
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Iterable, Optional
+
+HEADER = struct.Struct('<IBI')  # The number of bits, of hash functions and of added IDs.
+MASK_64 = (1 << 64) - 1
+
+
+def mix64(value: int) -> int:
+    """Returns the 64-bit hash of the integer (the finalizer of SplitMix64).
+
+    Parameters
+    ----------
+    value : int
+        The integer.
+
+    Returns
+    -------
+    int
+        The hash, evenly distributed over the 64 bits even for the consecutive integers.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+
+class BloomFilter:
+    """A class used to keep a set of integer IDs in a fixed number of bits.
+
+    A contained ID is always found, an ID not added is found with the probability
+    ``error_rate`` as long as at most ``capacity`` IDs are added. Adding and checking
+    an ID costs the same few operations whatever the number of the added ones.
+
+        ...
+
+        Attributes
+        ----------
+        size : int
+            The number of bits.
+        hashes : int
+            The number of bits set for an ID.
+        count : int
+            The number of the IDs added.
+
+        Methods
+        -------
+        add(id_: int) -> None
+            Adds the ID.
+        to_bytes() -> bytes
+            Returns the serialized filter.
+        from_bytes(data: bytes) -> BloomFilter
+            Returns the filter read from its serialized form.
+        """
+    def __init__(self, capacity: int = 5000, error_rate: float = 0.01):
+        """
+        Parameters
+        ----------
+        capacity : int
+            The number of IDs the filter is sized for.
+        error_rate : float
+            The probability to find an ID not added once the filter is full.
+        """
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self.__bits = bytearray((self.size + 7) // 8)
+
+    def __contains__(self, id_: int) -> bool:
+        return all(self.__bits[bit >> 3] & (1 << (bit & 7)) for bit in self.__positions(id_))
+
+    def add(self, id_: int) -> None:
+        """Adds the ID.
+
+        Parameters
+        ----------
+        id_ : int
+            The ID.
+        """
+        for bit in self.__positions(id_):
+            self.__bits[bit >> 3] |= 1 << (bit & 7)
+        self.count += 1
+
+    def to_bytes(self) -> bytes:
+        """Returns the serialized filter.
+
+        Returns
+        -------
+        bytes
+            The header with the parameters and the bits.
+        """
+        return HEADER.pack(self.size, self.hashes, self.count) + bytes(self.__bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BloomFilter':
+        """Returns the filter read from its serialized form.
+
+        Parameters
+        ----------
+        data : bytes
+            The data returned by ``to_bytes``.
+
+        Returns
+        -------
+        BloomFilter
+            The filter.
+
+        Raises
+        ------
+        ValueError
+            If the data is not a serialized filter.
+        """
+        if len(data) < HEADER.size:
+            raise ValueError('The data is too short for a bloom filter')
+        size, hashes, count = HEADER.unpack_from(data)
+        bits = data[HEADER.size:]
+        if not size or not hashes or len(bits) != (size + 7) // 8:
+            raise ValueError('The data is not a bloom filter')
+        bloom = cls.__new__(cls)
+        bloom.size, bloom.hashes, bloom.count = size, hashes, count
+        bloom.__bits = bytearray(bits)
+        return bloom
+
+    def __positions(self, id_: int) -> Iterable[int]:
+        """Yields the bits of the ID, derived from two halves of its hash (double hashing)."""
+        value = mix64(id_)
+        first, second = value & 0xFFFFFFFF, (value >> 32) | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+
+class SeenMovies:
+    """A class used to tell the movies the user has already received.
+
+    The IDs of every user are kept in two bloom filters: the current one and the
+    previous one. Once the current filter is full, it becomes the previous one and
+    the oldest IDs are forgotten, so neither the memory nor the error rate grows with
+    the history. The filters of a user are loaded on the first access, built from
+    the history for a user without them, and saved on every change. The filters of
+    ``max_users`` recently active users are kept in memory.
+
+        ...
+
+        Attributes
+        ----------
+        capacity : int
+            The number of IDs a filter is sized for.
+        error_rate : float
+            The probability of a false match of a full filter.
+        max_users : int
+            The maximum number of users whose filters are kept in memory.
+
+        Methods
+        -------
+        contains(user_id: int, id_: int) -> bool
+            Tells whether the user has already received the movie.
+        add(user_id: int, ids: Iterable[int]) -> None
+            Remembers the movies received by the user.
+        """
+    def __init__(self,
+                 load: Callable[[int], Optional[tuple[bytes, Optional[bytes]]]],
+                 save: Callable[[int, bytes, Optional[bytes]], None],
+                 history: Callable[[int], Iterable[int]],
+                 capacity: int = 5000,
+                 error_rate: float = 0.01,
+                 max_users: int = 1000):
+        """
+        Parameters
+        ----------
+        load : Callable[[int], Optional[tuple[bytes, Optional[bytes]]]]
+            Returns the saved current and previous filters of the user, None if there are none.
+        save : Callable[[int, bytes, Optional[bytes]], None]
+            Saves the current and the previous filters of the user.
+        history : Callable[[int], Iterable[int]]
+            Returns the IDs of the movies in the history of the user.
+        capacity : int
+            The number of IDs a filter is sized for.
+        error_rate : float
+            The probability of a false match of a full filter.
+        max_users : int
+            The maximum number of users whose filters are kept in memory.
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_users = max_users
+        self.__load = load
+        self.__save = save
+        self.__history = history
+        self.__users: OrderedDict[int, tuple[BloomFilter, Optional[BloomFilter]]] = OrderedDict()
+        self.__lock = Lock()
+
+    def contains(self, user_id: int, id_: int) -> bool:
+        """Tells whether the user has already received the movie.
+
+        Parameters
+        ----------
+        user_id : int
+            The ID of the user.
+        id_ : int
+            The ID of the movie.
+
+        Returns
+        -------
+        bool
+            True if the movie is found, rarely for a movie not received yet.
+        """
+        current, previous = self.__filters(user_id)
+        with self.__lock:
+            return id_ in current or (previous is not None and id_ in previous)
+
+    def add(self, user_id: int, ids: Iterable[int]) -> None:
+        """Remembers the movies received by the user.
+
+        Parameters
+        ----------
+        user_id : int
+            The ID of the user.
+        ids : Iterable[int]
+            The IDs of the movies.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        current, previous = self.__filters(user_id)
+        with self.__lock:
+            for id_ in ids:
+                if id_ not in current:
+                    current, previous = self.__added(current, previous, id_)
+            self.__remember(user_id, (current, previous))
+            current_data, previous_data = current.to_bytes(), previous and previous.to_bytes()
+        self.__save(user_id, current_data, previous_data)
+
+    def __filters(self, user_id: int) -> tuple[BloomFilter, Optional[BloomFilter]]:
+        """Returns the filters of the user, loading or building them on the first access."""
+        with self.__lock:
+            filters = self.__users.get(user_id)
+            if filters is not None:
+                self.__users.move_to_end(user_id)
+                return filters
+        saved = self.__load(user_id)
+        if saved is not None:
+            current_data, previous_data = saved
+            filters = BloomFilter.from_bytes(current_data), previous_data and BloomFilter.from_bytes(previous_data)
+        else:
+            current, previous = BloomFilter(self.capacity, self.error_rate), None
+            for id_ in self.__history(user_id):
+                current, previous = self.__added(current, previous, id_)
+            filters = current, previous
+            self.__save(user_id, current.to_bytes(), previous and previous.to_bytes())
+        with self.__lock:
+            return self.__users.setdefault(user_id, filters)
+
+    def __added(self, current: BloomFilter, previous: Optional[BloomFilter],
+                id_: int) -> tuple[BloomFilter, Optional[BloomFilter]]:
+        """Adds the ID, starting a new current filter if the current one is full."""
+        if current.count >= self.capacity:
+            current, previous = BloomFilter(self.capacity, self.error_rate), current
+        current.add(id_)
+        return current, previous
+
+    def __remember(self, user_id: int, filters: tuple[BloomFilter, Optional[BloomFilter]]) -> None:
+        """Keeps the filters in memory, evicting the least recently active user beyond the limit."""
+        self.__users[user_id] = filters
+        self.__users.move_to_end(user_id)
+        while len(self.__users) > self.max_users:
+            self.__users.popitem(last=False)
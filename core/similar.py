@@ -0,0 +1,221 @@
+from threading import Lock
+from typing import Iterable, Optional
+
+import numpy as np
+
+from core.models import Movie
+from core.snapshot import CatalogSnapshot
+
+MAX_GENRES = 64
+
+
+class SimilarityIndex:
+    """A class used to find the movies similar to a given one.
+
+    The features of the movies are kept in column arrays: the genres as 64-bit masks,
+    the year and both ratings. A query scores all movies at once with vectorized
+    operations and picks the best ones with a partial sort, so the whole catalog is
+    scored in a few milliseconds.
+
+    The score is the weighted sum of the Jaccard similarity of the genres, the closeness
+    of the years decaying with ``year_scale`` and the closeness of the Kinopoisk and
+    IMDB ratings. A missing rating is neither close nor far.
+
+    The added movies are buffered and merged into the arrays by the next query.
+
+        ...
+
+        Attributes
+        ----------
+        genre_weight : float
+            The weight of the genre similarity.
+        year_weight : float
+            The weight of the year closeness.
+        rating_weight : float
+            The weight of the rating closeness, shared by both ratings.
+        year_scale : float
+            The year distance in years at which the year closeness drops by e times.
+
+        Methods
+        -------
+        load_snapshot(snapshot: CatalogSnapshot) -> None
+            Replaces the features of all movies with the ones of the snapshot.
+        add_many(movies: Iterable[tuple[int, int, float, float, list[str], str]]) -> None
+            Adds or replaces the features of the movies.
+        similar(id_kp: int, limit: int, exclude: Iterable[int]) -> Optional[list[tuple[int, float]]]
+            Returns the movies most similar to the movie.
+        """
+    def __init__(self,
+                 genre_weight: float = 0.6,
+                 year_weight: float = 0.2,
+                 rating_weight: float = 0.2,
+                 year_scale: float = 10):
+        """
+        Parameters
+        ----------
+        genre_weight : float
+            The weight of the genre similarity.
+        year_weight : float
+            The weight of the year closeness.
+        rating_weight : float
+            The weight of the rating closeness, shared by both ratings.
+        year_scale : float
+            The year distance in years at which the year closeness drops by e times.
+        """
+        self.genre_weight = genre_weight
+        self.year_weight = year_weight
+        self.rating_weight = rating_weight
+        self.year_scale = year_scale
+        self.__genre_bits: dict[str, int] = {}
+        self.__rows: dict[int, int] = {}
+        self.__ids = np.empty(0, dtype=np.int64)
+        self.__genres = np.empty(0, dtype=np.uint64)
+        self.__years = np.empty(0, dtype=np.float32)
+        self.__ratings_kp = np.empty(0, dtype=np.float32)
+        self.__ratings_imdb = np.empty(0, dtype=np.float32)
+        self.__genre_counts = np.empty(0, dtype=np.float32)
+        self.__pending: dict[int, tuple[int, float, float, int]] = {}
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__rows) + sum(id_kp not in self.__rows for id_kp in self.__pending)
+
+    def load_snapshot(self, snapshot: CatalogSnapshot) -> None:
+        """Replaces the features of all movies with the ones of the snapshot.
+
+        The genre masks and the ratings are used without copying, so they stay in
+        the shared page cache until the first movie is added.
+
+        Parameters
+        ----------
+        snapshot : CatalogSnapshot
+            The snapshot of the catalog.
+        """
+        with self.__lock:
+            self.__genre_bits = {genre: bit for bit, genre in enumerate(snapshot.genres)}
+            self.__ids = snapshot.ids
+            self.__genres = snapshot.genre_masks
+            self.__years = snapshot.years.astype(np.float32)
+            self.__ratings_kp = snapshot.ratings_kp
+            self.__ratings_imdb = snapshot.ratings_imdb
+            self.__genre_counts = np.bitwise_count(snapshot.genre_masks).astype(np.float32)
+            self.__rows = {id_kp: row for row, id_kp in enumerate(snapshot.ids.tolist())}
+            self.__pending.clear()
+
+    def add_movies(self, movies: Iterable[Movie]) -> None:
+        """Adds or replaces the features of the movies.
+
+        Parameters
+        ----------
+        movies : Iterable[Movie]
+            The movies.
+        """
+        self.add_many((movie.id, movie.year, movie.rating_kp, movie.rating_imdb, movie.genres, movie.type)
+                      for movie in movies)
+
+    def add_many(self, movies: Iterable[tuple[int, Optional[int], Optional[float], Optional[float], list[str],
+                                              Optional[str]]]) -> None:
+        """Adds or replaces the features of the movies.
+
+        Parameters
+        ----------
+        movies : Iterable[tuple[int, Optional[int], Optional[float], Optional[float], list[str], Optional[str]]]
+            The ID, the year, the Kinopoisk and IMDB ratings, the genres and the type of every movie,
+            the type is not compared.
+        """
+        with self.__lock:
+            for id_kp, year, rating_kp, rating_imdb, genres, _ in movies:
+                self.__pending[int(id_kp)] = (
+                    year or 0,
+                    rating_kp or 0.0,
+                    rating_imdb or 0.0,
+                    self.__genre_mask(genres)
+                )
+
+    def similar(self, id_kp: int, limit: int = 5, exclude: Iterable[int] = ()) -> Optional[list[tuple[int, float]]]:
+        """Returns the movies most similar to the movie.
+
+        Parameters
+        ----------
+        id_kp : int
+            The ID of the movie in Kinopoisk database.
+        limit : int
+            The maximum number of movies.
+        exclude : Iterable[int]
+            The IDs of the movies not to return, e.g. the ones the user has already seen.
+
+        Returns
+        -------
+        Optional[list[tuple[int, float]]]
+            The ID and the score from 0 to 1 of the movies, the most similar first,
+            or None if the movie is not in the index.
+        """
+        with self.__lock:
+            self.__merge()
+            row = self.__rows.get(int(id_kp))
+            if row is None:
+                return None
+            ids, genres, genre_counts, years = self.__ids, self.__genres, self.__genre_counts, self.__years
+            ratings_kp, ratings_imdb = self.__ratings_kp, self.__ratings_imdb
+            excluded_rows = [self.__rows[excluded] for excluded in exclude if excluded in self.__rows]
+
+        common = np.bitwise_count(genres & genres[row]).astype(np.float32)
+        union = genre_counts + genre_counts[row] - common
+        scores = np.divide(common, union, out=np.zeros(len(ids), dtype=np.float32), where=union > 0)
+        scores *= self.genre_weight
+        if years[row]:
+            scores += self.year_weight * np.where(years > 0, np.exp(-np.abs(years - years[row]) / self.year_scale), 0.5)
+        for ratings in (ratings_kp, ratings_imdb):
+            closeness = 1 - np.abs(ratings - ratings[row]) / 10 if ratings[row] else np.float32(0.5)
+            scores += self.rating_weight / 2 * np.where(ratings > 0, closeness, 0.5)
+
+        scores[row] = -1
+        scores[excluded_rows] = -1
+        count = min(limit, len(ids))
+        if not count:
+            return []
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best])]
+        return [(int(ids[index]), float(scores[index])) for index in best if scores[index] >= 0]
+
+    def __genre_mask(self, genres: list[str]) -> int:
+        """Returns the bit mask of the genres. Must be called with the lock held.
+
+        The genres beyond the first ``MAX_GENRES`` ones seen are ignored.
+        """
+        mask = 0
+        for genre in genres:
+            bit = self.__genre_bits.get(genre)
+            if bit is None:
+                if len(self.__genre_bits) >= MAX_GENRES:
+                    continue
+                bit = self.__genre_bits[genre] = len(self.__genre_bits)
+            mask |= 1 << bit
+        return mask
+
+    def __merge(self) -> None:
+        """Merges the pending movies into the arrays. Must be called with the lock held.
+
+        The arrays are replaced, not changed in place, so the running queries keep
+        their consistent copies.
+        """
+        if not self.__pending:
+            return
+        updated = {row: self.__pending.pop(id_kp) for id_kp, row in self.__rows.items() if id_kp in self.__pending}
+        added_ids = list(self.__pending)
+        added = list(self.__pending.values())
+        self.__pending.clear()
+
+        start = len(self.__ids)
+        self.__ids = np.concatenate([self.__ids, np.array(added_ids, dtype=np.int64)])
+        columns = [
+            np.concatenate([column, np.array([features[i] for features in added], dtype=column.dtype)])
+            for i, column in enumerate((self.__years, self.__ratings_kp, self.__ratings_imdb, self.__genres))
+        ]
+        for row, features in updated.items():
+            for column, value in zip(columns, features):
+                column[row] = value
+        self.__years, self.__ratings_kp, self.__ratings_imdb, self.__genres = columns
+        self.__genre_counts = np.bitwise_count(self.__genres).astype(np.float32)
+        self.__rows.update((id_kp, start + i) for i, id_kp in enumerate(added_ids))
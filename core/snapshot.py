@@ -0,0 +1,250 @@
+import glob
+import json
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+MAGIC = b'MVSNAP02'
+HEADER = struct.Struct('<8sQdQQ')
+
+
+def write_snapshot(path: str,
+                   rows: Iterable[tuple[int, Optional[int], Optional[float], Optional[float], list[str],
+                                        Optional[str], str, Optional[str]]],
+                   created_at: datetime) -> int:
+    """Writes the columnar snapshot of the catalog.
+
+    The file consists of the header, the genre and type names in JSON and the column
+    arrays aligned to 8 bytes: the IDs (int64), the genre bit masks (uint64), the offsets
+    of the titles in the blob (uint64, two titles per movie), the years (int32), the
+    Kinopoisk and IMDB ratings (float32), the type codes (uint8) and the blob of the
+    UTF-8 titles. The file
+    is written next to the old one under a unique temporary name and renamed over it,
+    so the processes having the old snapshot open keep reading it intact and the
+    concurrent writers do not mix their data. Where the old file cannot be replaced
+    while it is mapped into memory (Windows), the new one is kept as a version next
+    to it, ``open_snapshot`` opens the latest one. The older versions are removed once
+    they are not mapped.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot file.
+    rows : Iterable[tuple[int, Optional[int], Optional[float], Optional[float], list[str], Optional[str], str, Optional[str]]]
+        The ID, the year, the Kinopoisk and IMDB ratings, the genres, the type, the original
+        and the alternative title of every movie.
+    created_at : datetime
+        The time the catalog was read at, the movies updated later are not in the snapshot.
+
+    Returns
+    -------
+    int
+        The number of movies written.
+    """
+    genre_bits: dict[str, int] = {}
+    type_codes: dict[str, int] = {}
+    ids, years, ratings_kp, ratings_imdb, masks, types, offsets = [], [], [], [], [], [], [0]
+    blob = bytearray()
+    for id_kp, year, rating_kp, rating_imdb, genres, type_, original_title, alternative_title in rows:
+        mask = 0
+        for genre in genres:
+            bit = genre_bits.setdefault(genre, len(genre_bits))
+            if bit < 64:
+                mask |= 1 << bit
+        ids.append(id_kp)
+        years.append(year or 0)
+        ratings_kp.append(rating_kp or 0.0)
+        ratings_imdb.append(rating_imdb or 0.0)
+        masks.append(mask)
+        code = type_codes.setdefault(type_, len(type_codes) + 1) if type_ else 0
+        types.append(code if code < 256 else 0)
+        for title in (original_title, alternative_title):
+            blob += (title or '').encode()
+            offsets.append(len(blob))
+
+    genres_json = json.dumps({'genres': list(genre_bits)[:64], 'types': list(type_codes)[:255]},
+                             ensure_ascii=False).encode()
+    sections = [
+        np.array(ids, dtype=np.int64),
+        np.array(masks, dtype=np.uint64),
+        np.array(offsets, dtype=np.uint64),
+        np.array(years, dtype=np.int32),
+        np.array(ratings_kp, dtype=np.float32),
+        np.array(ratings_imdb, dtype=np.float32),
+        np.array(types, dtype=np.uint8),
+    ]
+    descriptor, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix=f'.{os.path.basename(path)}.',
+                                            dir=os.path.dirname(path) or None)
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(ids), created_at.timestamp(), len(genres_json), len(blob)))
+            file.write(genres_json)
+            for section in sections:
+                file.write(b'\0' * (-file.tell() % 8))
+                file.write(section.tobytes())
+            file.write(blob)
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    try:
+        os.replace(tmp_path, path)
+        written_path = path
+    except PermissionError:
+        written_path = f'{path}.v{time.time_ns()}'
+        os.replace(tmp_path, written_path)
+    for old_path in __versions(path):
+        if old_path != written_path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    return len(ids)
+
+
+def open_snapshot(path: str) -> 'CatalogSnapshot':
+    """Opens the latest snapshot of the catalog written to the path.
+
+    Parameters
+    ----------
+    path : str
+        The path the snapshot is written to.
+
+    Returns
+    -------
+    CatalogSnapshot
+        The snapshot of the file or of its latest version.
+
+    Raises
+    ------
+    OSError
+        If there is no snapshot.
+    ValueError
+        If the latest file is not a catalog snapshot.
+    """
+    paths = __versions(path)
+    if not paths:
+        raise FileNotFoundError(f'No catalog snapshot at {path}')
+    return CatalogSnapshot(paths[-1])
+
+
+def __versions(path: str) -> list[str]:
+    """Returns the existing files of the snapshot, the oldest first."""
+    paths = [*glob.glob(f'{glob.escape(path)}.v*'), path]
+    return sorted((path for path in paths if os.path.isfile(path)), key=os.path.getmtime)
+
+
+class CatalogSnapshot:
+    """A class used to read the columnar snapshot of the catalog without loading it.
+
+    The file is mapped into memory and the columns are the NumPy views of the mapping,
+    so opening takes milliseconds whatever the size of the catalog, the pages are read
+    from the disk only when accessed, and the processes opening the same file share
+    the page cache. The titles are decoded one by one on access.
+
+        ...
+
+        Attributes
+        ----------
+        created_at : datetime
+            The time the catalog was read at.
+        genres : list[str]
+            The genre names, the genre ``i`` is the bit ``i`` of the masks.
+        types : list[str]
+            The type names, the type ``i`` has the code ``i + 1``.
+        ids : np.ndarray
+            The IDs of the movies (int64).
+        genre_masks : np.ndarray
+            The genre bit masks (uint64).
+        years : np.ndarray
+            The release years, 0 if unknown (int32).
+        ratings_kp : np.ndarray
+            The Kinopoisk ratings, 0 if unknown (float32).
+        ratings_imdb : np.ndarray
+            The IMDB ratings, 0 if unknown (float32).
+        type_codes : np.ndarray
+            The type codes, 0 if unknown (uint8).
+
+        Methods
+        -------
+        title(index: int) -> tuple[str, Optional[str]]
+            Returns the original and the alternative title of the movie.
+        titles() -> Iterator[tuple[int, str, Optional[str]]]
+            Yields the ID and the titles of every movie.
+        """
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            The path of the snapshot file.
+
+        Raises
+        ------
+        ValueError
+            If the file is not a catalog snapshot.
+        """
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(data) < HEADER.size:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        magic, count, created_at, genres_length, blob_length = HEADER.unpack(data[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        self.created_at = datetime.fromtimestamp(created_at)
+        position = HEADER.size + genres_length
+        names = json.loads(data[HEADER.size:position].tobytes())
+        self.genres: list[str] = names['genres']
+        self.types: list[str] = names['types']
+
+        columns = []
+        for dtype, length in ((np.int64, count), (np.uint64, count), (np.uint64, 2 * count + 1),
+                              (np.int32, count), (np.float32, count), (np.float32, count), (np.uint8, count)):
+            position += -position % 8
+            size = np.dtype(dtype).itemsize * length
+            columns.append(data[position:position + size].view(dtype))
+            position += size
+        (self.ids, self.genre_masks, self.__offsets, self.years,
+         self.ratings_kp, self.ratings_imdb, self.type_codes) = columns
+        self.__blob = data[position:position + blob_length]
+        if len(self.__blob) != blob_length:
+            raise ValueError(f'{path} is truncated')
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def title(self, index: int) -> tuple[str, Optional[str]]:
+        """Returns the titles of the movie.
+
+        Parameters
+        ----------
+        index : int
+            The index of the movie in the snapshot.
+
+        Returns
+        -------
+        tuple[str, Optional[str]]
+            The original and the alternative title of the movie.
+        """
+        start, middle, end = (int(offset) for offset in self.__offsets[2 * index:2 * index + 3])
+        alternative_title = self.__blob[middle:end].tobytes().decode()
+        return self.__blob[start:middle].tobytes().decode(), alternative_title or None
+
+    def titles(self) -> Iterator[tuple[int, str, Optional[str]]]:
+        """Yields the titles of every movie.
+
+        Returns
+        -------
+        Iterator[tuple[int, str, Optional[str]]]
+            The ID, the original and the alternative title of every movie.
+        """
+        offsets = self.__offsets.tolist()
+        blob = self.__blob.tobytes()
+        for index, id_kp in enumerate(self.ids.tolist()):
+            start, middle, end = offsets[2 * index:2 * index + 3]
+            yield id_kp, blob[start:middle].decode(), blob[middle:end].decode() or None
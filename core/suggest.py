@@ -0,0 +1,153 @@
+import re
+from collections import Counter
+from threading import Lock
+from typing import Iterable, Optional
+
+__WORD = re.compile(r'\w+')
+
+
+def trigrams(text: str) -> set[str]:
+    """Splits the text into the set of its trigrams.
+
+    The text is lowercased, 'ё' is replaced with 'е' and every word is padded with
+    two spaces in front and one behind, so the beginnings of the words weigh more
+    and a typo costs at most three trigrams.
+
+    Parameters
+    ----------
+    text : str
+        The text to split.
+
+    Returns
+    -------
+    set[str]
+        The trigrams of the text.
+    """
+    result = set()
+    for word in __WORD.findall(text.lower().replace('ё', 'е')):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class TitleIndex:
+    """A class used to find the titles similar to a misspelled query.
+
+    Every title of a movie, the original and the alternative one, is split into
+    trigrams and kept in an inverted index from the trigram to the titles containing
+    it. The similarity of a title to the query is the Sørensen–Dice coefficient of
+    their trigram sets, so a query is scored by walking only the postings of its own
+    trigrams.
+
+        ...
+
+        Attributes
+        ----------
+        min_similarity : float
+            The lowest similarity of a suggested title.
+
+        Methods
+        -------
+        add(id_kp: int, original_title: str, alternative_title: Optional[str]) -> None
+            Adds or replaces the titles of a movie.
+        add_many(titles: Iterable[tuple[int, str, Optional[str]]]) -> None
+            Adds or replaces the titles of several movies.
+        suggest(query: str, limit: int) -> list[tuple[int, str]]
+            Returns the titles most similar to the query.
+        """
+    def __init__(self, min_similarity: float = 0.3):
+        """
+        Parameters
+        ----------
+        min_similarity : float
+            The lowest similarity of a suggested title.
+        """
+        self.min_similarity = min_similarity
+        self.__titles: list[Optional[tuple[int, str, int]]] = []
+        self.__movie_titles: dict[int, tuple[list[int], tuple[str, Optional[str]]]] = {}
+        self.__postings: dict[str, list[int]] = {}
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.__movie_titles)
+
+    def add(self, id_kp: int, original_title: str, alternative_title: Optional[str]) -> None:
+        """Adds the titles of a movie, replacing its titles added before.
+
+        Parameters
+        ----------
+        id_kp : int
+            The ID of the movie in Kinopoisk database.
+        original_title : str
+            The original title of the movie.
+        alternative_title : str, optional
+            The alternative title of the movie.
+        """
+        with self.__lock:
+            self.__add(id_kp, original_title, alternative_title)
+
+    def add_many(self, titles: Iterable[tuple[int, str, Optional[str]]]) -> None:
+        """Adds the titles of several movies, replacing their titles added before.
+
+        Parameters
+        ----------
+        titles : Iterable[tuple[int, str, Optional[str]]]
+            The ID, the original and the alternative title of every movie.
+        """
+        with self.__lock:
+            for id_kp, original_title, alternative_title in titles:
+                self.__add(id_kp, original_title, alternative_title)
+
+    def suggest(self, query: str, limit: int = 5) -> list[tuple[int, str]]:
+        """Returns the titles most similar to the query.
+
+        Parameters
+        ----------
+        query : str
+            The query typed by the user.
+        limit : int
+            The maximum number of titles.
+
+        Returns
+        -------
+        list[tuple[int, str]]
+            The ID of the movie and its title, the most similar first, one title per movie.
+        """
+        query_trigrams = trigrams(query)
+        if not query_trigrams:
+            return []
+        with self.__lock:
+            common = Counter()
+            for trigram in query_trigrams:
+                common.update(self.__postings.get(trigram, ()))
+            best: dict[int, tuple[float, str]] = {}
+            for title_index, count in common.items():
+                entry = self.__titles[title_index]
+                if entry is None:
+                    continue
+                id_kp, title, size = entry
+                similarity = 2 * count / (len(query_trigrams) + size)
+                if similarity >= self.min_similarity and similarity > best.get(id_kp, (0.0, ''))[0]:
+                    best[id_kp] = (similarity, title)
+        ranked = sorted(best.items(), key=lambda item: -item[1][0])
+        return [(id_kp, title) for id_kp, (_, title) in ranked[:limit]]
+
+    def __add(self, id_kp: int, original_title: str, alternative_title: Optional[str]) -> None:
+        """Adds the titles of a movie. Must be called with the lock held."""
+        known = self.__movie_titles.get(id_kp)
+        if known is not None:
+            if known[1] == (original_title, alternative_title):
+                return
+            for title_index in known[0]:
+                self.__titles[title_index] = None
+        title_indexes = []
+        for title in {original_title, alternative_title}:
+            title_trigrams = trigrams(title) if title else set()
+            if not title_trigrams:
+                continue
+            title_index = len(self.__titles)
+            self.__titles.append((id_kp, title, len(title_trigrams)))
+            for trigram in title_trigrams:
+                self.__postings.setdefault(trigram, []).append(title_index)
+            title_indexes.append(title_index)
+        self.__movie_titles[id_kp] = (title_indexes, (original_title, alternative_title))
@@ -0,0 +1,153 @@
+import json
+import logging
+import math
+from datetime import date, datetime, timedelta
+from threading import Event
+from typing import Callable, Optional
+
+from core.api import ApiUnavailable, MoviesApi, QuotaExceeded
+from core.models import Movie
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 250
+
+
+class CatalogSync:
+    """A class used to keep the local catalog mirror up to date with the movie database.
+
+    Every run requests only the movies changed since the checkpoint, the least recently
+    changed first, and saves every page together with the progress in one transaction.
+    Once the last page of the period is saved, the latest change time becomes the next
+    checkpoint. The API filters the changes by days, so the movies changed on the day
+    of the checkpoint are requested once more.
+
+    The period is requested day by day. A movie changed again while its day is paged
+    through moves to the current day and shifts the rest of its old day to the pages
+    already requested. Such a shift shows as the smaller number of the movies of the day,
+    and the pages it may have hidden are requested again. The days still being changed
+    are requested once more by the next period.
+
+    A run stops after ``max_pages`` pages, on the exhausted background quota or on
+    the failed request, and the next run continues from the saved page of the same period.
+    The requests are spaced by ``pause`` seconds.
+
+        ...
+
+        Attributes
+        ----------
+        api : MoviesApi
+            The client of the movie database API, the background priority is expected.
+        max_pages : int
+            The maximum number of pages requested by one run.
+        pause : float
+            The time in seconds between the requests.
+        initial_days : int
+            The number of the past days requested by the first run.
+
+        Methods
+        -------
+        run() -> int
+            Saves the movies changed since the checkpoint.
+        stop() -> None
+            Stops the current run after the page being requested and cancels the next ones.
+        """
+    def __init__(self,
+                 api: MoviesApi,
+                 load: Callable[[], Optional[str]],
+                 save: Callable[[list[Movie], str], None],
+                 max_pages: int = 20,
+                 pause: float = 1,
+                 initial_days: int = 30):
+        """
+        Parameters
+        ----------
+        api : MoviesApi
+            The client of the movie database API, the background priority is expected.
+        load : Callable[[], Optional[str]]
+            Returns the saved progress, None before the first run.
+        save : Callable[[list[Movie], str], None]
+            Saves the movies and the progress in one transaction.
+        max_pages : int
+            The maximum number of pages requested by one run.
+        pause : float
+            The time in seconds between the requests.
+        initial_days : int
+            The number of the past days requested by the first run.
+        """
+        self.api = api
+        self.max_pages = max_pages
+        self.pause = pause
+        self.initial_days = initial_days
+        self.__load = load
+        self.__save = save
+        self.__stopped = Event()
+
+    def run(self) -> int:
+        """Saves the movies changed since the checkpoint.
+
+        Returns
+        -------
+        int
+            The number of the saved movies.
+        """
+        progress = self.__progress()
+        checkpoint = datetime.fromisoformat(progress['checkpoint'])
+        until = date.fromisoformat(progress['until'])
+        latest = datetime.fromisoformat(progress['latest'])
+        day = date.fromisoformat(progress['day'])
+        page, total = progress['page'], progress['total']
+        saved = 0
+        if self.__stopped.is_set():
+            return saved
+        for number in range(self.max_pages):
+            if number and self.__stopped.wait(self.pause):
+                break
+            try:
+                updates = self.api.updates(day, day, page, PAGE_SIZE)
+            except QuotaExceeded:
+                logger.info('The catalog sync is paused until the quota is renewed')
+                break
+            except ApiUnavailable as exception:
+                logger.warning('The catalog sync is paused: %s', exception)
+                break
+            if updates.updated_at is not None:
+                latest = max(latest, updates.updated_at)
+            if total is not None and updates.total_movies < total:
+                # The movies changed again left the day and shifted the rest to the requested pages.
+                page = max(1, page - math.ceil((total - updates.total_movies) / PAGE_SIZE))
+                total = updates.total_movies
+            elif page < updates.total_pages:
+                page, total = page + 1, updates.total_movies
+            else:
+                day, page, total = day + timedelta(days=1), 1, None
+            done = day > until
+            if done:
+                progress = {'checkpoint': latest.isoformat()}
+            else:
+                progress = {'checkpoint': checkpoint.isoformat(), 'until': until.isoformat(), 'day': day.isoformat(),
+                            'page': page, 'total': total, 'latest': latest.isoformat()}
+            self.__save(updates.movies, json.dumps(progress))
+            saved += len(updates.movies)
+            if done:
+                logger.info('The catalog is synced up to %s', latest)
+                break
+        return saved
+
+    def stop(self) -> None:
+        """Stops the current run after the page being requested and cancels the next ones."""
+        self.__stopped.set()
+
+    def __progress(self) -> dict:
+        """Returns the saved progress, starting the next period if the last one is done."""
+        saved = self.__load()
+        progress = json.loads(saved) if saved else {}
+        if 'checkpoint' not in progress:
+            progress['checkpoint'] = (datetime.utcnow() - timedelta(days=self.initial_days)).isoformat()
+        if 'day' not in progress:
+            # The next day covers the changes made today in the time zones ahead of UTC.
+            until = (datetime.utcnow() + timedelta(days=1)).date()
+            day = datetime.fromisoformat(progress['checkpoint']).date()
+            progress.update(until=until.isoformat(), day=day.isoformat(), page=1, total=None,
+                            latest=progress['checkpoint'])
+        return progress
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+import core.models
+import utils.presenters
+from database import functions
+from database.connection import release_connection
+from database.models import database, Request, Movie
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStorage:
+    """
+    The database functions for the asyncio code, run in a dedicated database thread.
+
+    The calls are queued to the thread and awaited without blocking the event loop.
+    The thread takes the queued calls in batches and runs every batch in one transaction,
+    each call in its own savepoint, so a burst of writes costs one commit and a failed
+    call does not undo the others. The results are delivered after the commit. At most
+    ``max_pending`` calls wait in the queue, the next ones wait for room in it.
+
+    The synchronous functions of database.functions stay available for the threaded bot.
+
+    Args:
+        max_pending (int): The maximum number of queued calls.
+        batch_size (int): The maximum number of calls run in one transaction.
+
+    Example:
+        storage = AsyncStorage()
+        request = await storage.save_byname_request(user_id, title, amount)
+        await storage.save_movies(movies, request)
+        history = await storage.get_history(user_id, amount=10)
+        await storage.close()
+    """
+    def __init__(self, max_pending: int = 1000, batch_size: int = 64):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.__calls: queue.Queue = queue.Queue()
+        self.__slots = asyncio.Semaphore(max_pending)
+        self.__thread = threading.Thread(target=self.__serve, name='database', daemon=True)
+        self.__thread.start()
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs the function in the database thread.
+
+        Args:
+            func (Callable[..., Any]): The function accessing the database.
+            *args: The positional arguments of the function.
+            **kwargs: The keyword arguments of the function.
+
+        Returns:
+            Any: The result of the function, its exception is raised.
+        """
+        async with self.__slots:
+            future = asyncio.get_running_loop().create_future()
+            self.__calls.put((func, args, kwargs, future))
+            return await future
+
+    async def save_byfilters_request(self,
+                                     user_id: int,
+                                     type: str,
+                                     genre: str,
+                                     years: tuple[int, int],
+                                     ratings: tuple[int, int],
+                                     amount: int) -> Request:
+        """The asynchronous database.functions.save_byfilters_request."""
+        return await self.run(functions.save_byfilters_request, user_id, type, genre, years, ratings, amount)
+
+    async def save_byname_request(self, user_id: int, title: str, amount: int) -> Request:
+        """The asynchronous database.functions.save_byname_request."""
+        return await self.run(functions.save_byname_request, user_id, title, amount)
+
+    async def save_random_request(self, user_id: int) -> Request:
+        """The asynchronous database.functions.save_random_request."""
+        return await self.run(functions.save_random_request, user_id)
+
+    async def save_movies(self, movies: list[core.models.Movie], request: Request) -> list[Movie]:
+        """The asynchronous database.functions.save_movies."""
+        return await self.run(functions.save_movies, movies, request)
+
+    async def get_history(self, user_id: int, amount: int) -> list[utils.presenters.Request]:
+        """The asynchronous database.functions.get_history."""
+        return await self.run(functions.get_history, user_id, amount)
+
+    async def close(self) -> None:
+        """
+        Stops the database thread once the queued calls are done.
+
+        Returns:
+            None
+        """
+        self.__calls.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self.__thread.join)
+
+    def __serve(self) -> None:
+        """
+        Runs the queued calls in batches until None is queued.
+
+        Returns:
+            None
+        """
+        while True:
+            batch = [self.__calls.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.__calls.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            calls = batch[:-1] if stop else batch
+            if calls:
+                self.__run_batch(calls)
+            if stop:
+                release_connection(database)
+                return
+
+    def __run_batch(self, calls: list[tuple[Callable[..., Any], tuple, dict, asyncio.Future]]) -> None:
+        """
+        Runs the calls in one transaction and delivers their results after the commit.
+
+        Args:
+            calls (list[tuple[Callable[..., Any], tuple, dict, asyncio.Future]]): The calls.
+
+        Returns:
+            None
+        """
+        outcomes: list[tuple[Optional[BaseException], Any]] = []
+        try:
+            with database.atomic():
+                for func, args, kwargs, _ in calls:
+                    try:
+                        with database.atomic():
+                            outcomes.append((None, func(*args, **kwargs)))
+                    except Exception as exception:
+                        outcomes.append((exception, None))
+        except Exception as exception:
+            logger.exception('The batch of %s database calls failed', len(calls))
+            outcomes = [(exception, None)] * len(calls)
+        for (_, _, _, future), (exception, result) in zip(calls, outcomes):
+            try:
+                future.get_loop().call_soon_threadsafe(self.__deliver, future, exception, result)
+            except RuntimeError:
+                logger.warning('The event loop waiting for the database call is closed')
+
+    @staticmethod
+    def __deliver(future: asyncio.Future, exception: Optional[BaseException], result: Any) -> None:
+        """
+        Sets the outcome of the call unless the caller has stopped waiting.
+        """
+        if future.cancelled():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
@@ -0,0 +1,107 @@
+import csv
+import gzip
+import io
+import json
+from typing import BinaryIO, Iterator
+
+from peewee import Tuple
+
+from database.models import database, Request, Movie
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+REQUEST_FIELDS = (Request.id, Request.created_at, Request.command, Request.title, Request.type, Request.genre,
+                  Request.year_min, Request.year_max, Request.rating_min, Request.rating_max, Request.amount)
+CSV_HEADER = ('request_id', 'created_at', 'command', 'title', 'type', 'genre', 'year_min', 'year_max',
+              'rating_min', 'rating_max', 'amount', 'movie_id_kp', 'movie_title')
+
+
+def export_history(user_id: int, file: BinaryIO, format: str = 'csv', chunk_size: int = 500) -> int:
+    """
+    Writes the whole history of the user to the file as gzip-compressed CSV or NDJSON.
+
+    The CSV has a row per movie, with the columns of its request repeated, and a row with
+    the empty movie columns for a request without movies. The NDJSON has a line per
+    request with the list of its movies under the 'movies' key. The history is read and
+    written chunk by chunk, so the memory used does not depend on its size.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        file (BinaryIO): The file to write to.
+        format (str): 'csv' or 'ndjson'.
+        chunk_size (int): The number of requests read at once.
+
+    Returns:
+        int: The number of exported requests.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format {format!r}, expected one of {EXPORT_FORMATS}')
+    count = 0
+    with gzip.GzipFile(fileobj=file, mode='wb', compresslevel=6) as archive, \
+            io.TextIOWrapper(archive, encoding='utf-8', newline='') as text:
+        writer = csv.writer(text)
+        if format == 'csv':
+            writer.writerow(CSV_HEADER)
+        for request in iter_history(user_id, chunk_size):
+            count += 1
+            if format == 'ndjson':
+                text.write(json.dumps(request, ensure_ascii=False, default=str) + '\n')
+                continue
+            values = [request[field.name] for field in REQUEST_FIELDS]
+            for movie in request['movies'] or [{'id_kp': None, 'title': None}]:
+                writer.writerow([*values, movie['id_kp'], movie['title']])
+    return count
+
+
+def iter_history(user_id: int, chunk_size: int = 500) -> Iterator[dict]:
+    """
+    Yields the requests of the user with their movies, the oldest first.
+
+    Every chunk of requests is read by a separate keyset query on the (user_id, created_at, id)
+    index, and its movies by one more query selecting the chunk as a subquery. The rows
+    are fetched from the cursors as they are, without building the model instances. No
+    read stays open between the chunks, so a slow consumer neither holds a lock nor keeps
+    an old snapshot of the database.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        chunk_size (int): The number of requests read at once.
+
+    Returns:
+        Iterator[dict]: The requests with the list of their movies under the 'movies' key.
+    """
+    names = [field.name for field in REQUEST_FIELDS]
+    key = Tuple(Request.created_at, Request.id)
+    cursor = None
+    while True:
+        chunk = Request.select(*REQUEST_FIELDS).where(Request.user_id == user_id)
+        if cursor is not None:
+            chunk = chunk.where(key > Tuple(*cursor))
+        chunk = chunk.order_by(Request.created_at, Request.id).limit(chunk_size)
+        requests = [dict(zip(names, row)) for row in database.execute(chunk).fetchall()]
+        if not requests:
+            return
+        movies = __chunk_movies(chunk.select(Request.id))
+        for request in requests:
+            request['movies'] = movies.get(request['id'], [])
+            yield request
+        cursor = (requests[-1]['created_at'], requests[-1]['id'])
+
+
+def __chunk_movies(ids) -> dict[int, list[dict]]:
+    """
+    Retrieves the movies of the requests.
+
+    Args:
+        ids (ModelSelect): The query of the ids of the requests.
+
+    Returns:
+        dict[int, list[dict]]: The movies of every request in the order they were found, keyed by the request id.
+    """
+    movies: dict[int, list[dict]] = {}
+    query = (Movie
+             .select(Movie.request, Movie.id_kp, Movie.title)
+             .where(Movie.request.in_(ids))
+             .order_by(Movie.id))
+    for request_id, id_kp, title in database.execute(query):
+        movies.setdefault(request_id, []).append({'id_kp': id_kp, 'title': title})
+    return movies
@@ -1,9 +1,16 @@
-from typing import Iterable
+from datetime import date, datetime
+from itertools import groupby
+from typing import Callable, Iterable, Optional
+
+from peewee import EXCLUDED, JOIN, Tuple, fn
 
 import core.models
 import utils.presenters
-from database.mappers import request_to_presenter, movie_to_presenter
-from database.models import Request, Movie
+from database.mappers import request_to_presenter, movie_to_presenter, catalog_movie_to_movie
+from database.models import database, Request, Movie, CatalogMovie, CallbackValue, ApiUsage, Poster, BotState, SeenFilter
+
+__movies_listeners: list[Callable[[list[core.models.Movie]], None]] = []
+__received_listeners: list[Callable[[int, list[core.models.Movie]], None]] = []
 
 
 def save_byfilters_request(user_id: int,
@@ -76,6 +83,9 @@ def save_movies(movies: list[core.models.Movie],
     """
     Saves a list of movies into the database with relation to a specific request.
 
+    The movies are also mirrored into the catalog, and the listeners added with
+    add_movies_listener and add_received_listener are notified.
+
     Args:
         movies (list): List of movie objects to save.
         request (Request): Request instance to which the movies related.
@@ -83,12 +93,385 @@ def save_movies(movies: list[core.models.Movie],
     Returns:
         list[Movie]: The list of created Movie objects.
     """
-    return Movie.bulk_create([
+    created = Movie.bulk_create([
         Movie(id_kp=movie.id,
               title=utils.presenters.Movie.get_full_title(movie.original_title, movie.alternative_title),
               request=request)
         for movie in movies
     ])
+    save_catalog_movies(movies)
+    for listener in __received_listeners:
+        listener(request.user_id, movies)
+    return created
+
+
+def save_catalog_movies(movies: list[core.models.Movie]) -> None:
+    """
+    Inserts the movies into the catalog mirror or updates the mirrored ones and notifies the listeners.
+
+    The description, the IMDB rating and the type missing from the search results don't overwrite the known ones.
+
+    Args:
+        movies (list): List of movie objects to save.
+
+    Returns:
+        None
+    """
+    if not movies:
+        return
+    CatalogMovie.insert_many([
+        {
+            CatalogMovie.id_kp: movie.id,
+            CatalogMovie.original_title: movie.original_title,
+            CatalogMovie.alternative_title: movie.alternative_title,
+            CatalogMovie.year: movie.year,
+            CatalogMovie.rating_kp: movie.rating_kp,
+            CatalogMovie.rating_imdb: movie.rating_imdb,
+            CatalogMovie.genres: ','.join(movie.genres),
+            CatalogMovie.description: movie.description,
+            CatalogMovie.poster_url: movie.poster_url,
+            CatalogMovie.type: movie.type,
+            CatalogMovie.updated_at: datetime.now(),
+        }
+        for movie in {movie.id: movie for movie in movies}.values()
+    ]).on_conflict(
+        conflict_target=[CatalogMovie.id_kp],
+        preserve=[CatalogMovie.original_title, CatalogMovie.alternative_title, CatalogMovie.year,
+                  CatalogMovie.rating_kp, CatalogMovie.genres, CatalogMovie.poster_url, CatalogMovie.updated_at],
+        update={
+            CatalogMovie.rating_imdb: fn.COALESCE(fn.NULLIF(EXCLUDED.rating_imdb, 0), CatalogMovie.rating_imdb),
+            CatalogMovie.description: fn.COALESCE(fn.NULLIF(EXCLUDED.description, ''), CatalogMovie.description),
+            CatalogMovie.type: fn.COALESCE(EXCLUDED.type, CatalogMovie.type),
+        }
+    ).execute()
+    for listener in __movies_listeners:
+        listener(movies)
+
+
+def save_synced_movies(movies: list[core.models.Movie], key: str, progress: str) -> None:
+    """
+    Saves the movies received by the catalog sync and its progress in one transaction.
+
+    Args:
+        movies (list): List of movie objects to save.
+        key (str): The name of the value keeping the progress.
+        progress (str): The progress of the sync.
+
+    Returns:
+        None
+    """
+    with database.atomic():
+        save_catalog_movies(movies)
+        set_bot_state(key, progress)
+
+
+def add_movies_listener(listener: Callable[[list[core.models.Movie]], None]) -> None:
+    """
+    Adds a function called with the movies every time they are saved.
+
+    Args:
+        listener (Callable[[list[core.models.Movie]], None]): The function to call.
+
+    Returns:
+        None
+    """
+    __movies_listeners.append(listener)
+
+
+def add_received_listener(listener: Callable[[int, list[core.models.Movie]], None]) -> None:
+    """
+    Adds a function called with the user ID and the movies every time the movies sent to the user are saved.
+
+    Args:
+        listener (Callable[[int, list[core.models.Movie]], None]): The function to call.
+
+    Returns:
+        None
+    """
+    __received_listeners.append(listener)
+
+
+def get_bot_state(key: str) -> Optional[str]:
+    """
+    Retrieves a value the bot keeps between the restarts.
+
+    Args:
+        key (str): The name of the value.
+
+    Returns:
+        Optional[str]: The value or None if it was never set.
+    """
+    return BotState.select(BotState.value).where(BotState.key == key).scalar()
+
+
+def set_bot_state(key: str, value: str) -> None:
+    """
+    Saves a value the bot keeps between the restarts.
+
+    Args:
+        key (str): The name of the value.
+        value (str): The value.
+
+    Returns:
+        None
+    """
+    BotState.insert(key=key, value=value).on_conflict(
+        conflict_target=[BotState.key],
+        preserve=[BotState.value]
+    ).execute()
+
+
+def get_poster(url: str) -> Optional[tuple[Optional[str], Optional[str]]]:
+    """
+    Retrieves the state of the poster URL in the local poster cache.
+
+    Args:
+        url (str): The URL of the poster.
+
+    Returns:
+        Optional[tuple[Optional[str], Optional[str]]]: The digest of the cached file and the Telegram file ID
+            or None if the URL is unknown. The digest is None if the URL is broken.
+    """
+    poster = Poster.get_or_none(Poster.url == url)
+    return None if poster is None else (poster.digest, poster.file_id)
+
+
+def save_poster(url: str, digest: Optional[str], file_id: Optional[str]) -> None:
+    """
+    Saves the state of the poster URL in the local poster cache.
+
+    Args:
+        url (str): The URL of the poster.
+        digest (str, optional): The SHA-256 of the cached file, None if the URL is broken.
+        file_id (str, optional): The Telegram file ID of the uploaded poster.
+
+    Returns:
+        None
+    """
+    Poster.insert(url=url, digest=digest, file_id=file_id, updated_at=datetime.now()).on_conflict(
+        conflict_target=[Poster.url],
+        preserve=[Poster.digest, Poster.file_id, Poster.updated_at]
+    ).execute()
+
+
+def get_known_titles(since: Optional[datetime] = None) -> Iterable[tuple[int, str, Optional[str]]]:
+    """
+    Retrieves the titles of all movies in the catalog mirror and in the history.
+
+    The movies saved only in the history before the mirror existed have their full title
+    as the original one and no alternative title.
+
+    Args:
+        since (datetime, optional): Skip the mirrored movies not updated after this time.
+
+    Returns:
+        Iterable[tuple[int, str, Optional[str]]]: The ID, the original and the alternative title of every movie.
+    """
+    yield from get_catalog_titles(since)
+    history_titles = Movie.select(
+        Movie.id_kp, fn.MAX(Movie.title)
+    ).join(
+        CatalogMovie, JOIN.LEFT_OUTER, on=(Movie.id_kp == CatalogMovie.id_kp)
+    ).where(
+        CatalogMovie.id.is_null()
+    ).group_by(Movie.id_kp).tuples().iterator()
+    for id_kp, title in history_titles:
+        yield id_kp, title, None
+
+
+def get_catalog_titles(since: Optional[datetime] = None) -> Iterable[tuple[int, str, Optional[str]]]:
+    """
+    Retrieves the titles of the movies in the catalog mirror.
+
+    Args:
+        since (datetime, optional): Skip the movies not updated after this time.
+
+    Returns:
+        Iterable[tuple[int, str, Optional[str]]]: The ID, the original and the alternative title of every movie.
+    """
+    return __catalog_since(
+        CatalogMovie.select(CatalogMovie.id_kp, CatalogMovie.original_title, CatalogMovie.alternative_title),
+        since
+    ).tuples().iterator()
+
+
+def register_callback_value(kind: str, value: str, display: str) -> int:
+    """
+    Saves a value passed in the callback data and returns its short id.
+
+    Args:
+        kind (str): The kind of the value (e.g. "genre", "type").
+        value (str): The value passed to the API.
+        display (str): The value shown to the user.
+
+    Returns:
+        int: The id of the value, the same for every call with this kind and value.
+    """
+    callback_value, created = CallbackValue.get_or_create(kind=kind, value=value, defaults={'display': display})
+    if not created and callback_value.display != display:
+        callback_value.display = display
+        callback_value.save()
+    return callback_value.id
+
+
+def get_callback_values(kind: str) -> dict[int, tuple[str, str]]:
+    """
+    Retrieves all saved values of the kind.
+
+    Args:
+        kind (str): The kind of the values (e.g. "genre", "type").
+
+    Returns:
+        dict[int, tuple[str, str]]: The pairs of the value and its display keyed by the id.
+    """
+    query = CallbackValue.select().where(CallbackValue.kind == kind)
+    return {callback_value.id: (callback_value.value, callback_value.display) for callback_value in query}
+
+
+def add_api_usage(day: date, key: str, endpoint: str, count: int) -> None:
+    """
+    Adds the number of calls to the API endpoint made with the key during the day.
+
+    Args:
+        day (date): The day of the calls.
+        key (str): The fingerprint of the API key.
+        endpoint (str): The name of the endpoint.
+        count (int): The number of calls to add.
+
+    Returns:
+        None
+    """
+    ApiUsage.insert(day=day, key=key, endpoint=endpoint, count=count).on_conflict(
+        conflict_target=[ApiUsage.day, ApiUsage.key, ApiUsage.endpoint],
+        update={ApiUsage.count: ApiUsage.count + count}
+    ).execute()
+
+
+def get_api_usage(day: date, key: str) -> dict[str, int]:
+    """
+    Retrieves the number of calls per API endpoint made with the key during the day.
+
+    Args:
+        day (date): The day of the calls.
+        key (str): The fingerprint of the API key.
+
+    Returns:
+        dict[str, int]: The number of calls keyed by the endpoint.
+    """
+    query = ApiUsage.select().where((ApiUsage.day == day) & (ApiUsage.key == key))
+    return {usage.endpoint: usage.count for usage in query}
+
+
+def get_catalog_features(since: Optional[datetime] = None) \
+        -> Iterable[tuple[int, Optional[int], Optional[float], Optional[float], list[str], Optional[str]]]:
+    """
+    Retrieves the features the movies of the catalog mirror are compared and filtered by.
+
+    Args:
+        since (datetime, optional): Skip the movies not updated after this time.
+
+    Returns:
+        Iterable[tuple]: The ID, the year, the Kinopoisk and IMDB ratings, the genres and the type of every movie.
+    """
+    query = __catalog_since(CatalogMovie.select(
+        CatalogMovie.id_kp, CatalogMovie.year, CatalogMovie.rating_kp, CatalogMovie.rating_imdb, CatalogMovie.genres,
+        CatalogMovie.type
+    ), since).tuples().iterator()
+    for id_kp, year, rating_kp, rating_imdb, genres, type_ in query:
+        yield id_kp, year, rating_kp, rating_imdb, genres.split(',') if genres else [], type_
+
+
+def get_catalog_rows() -> Iterable[tuple[int, Optional[int], Optional[float], Optional[float], list[str],
+                                         Optional[str], str, Optional[str]]]:
+    """
+    Retrieves all movies of the catalog mirror ordered by the ID.
+
+    Returns:
+        Iterable[tuple]: The ID, the year, the Kinopoisk and IMDB ratings, the genres, the type,
+            the original and the alternative title of every movie.
+    """
+    query = CatalogMovie.select(
+        CatalogMovie.id_kp, CatalogMovie.year, CatalogMovie.rating_kp, CatalogMovie.rating_imdb, CatalogMovie.genres,
+        CatalogMovie.type, CatalogMovie.original_title, CatalogMovie.alternative_title
+    ).order_by(CatalogMovie.id_kp).tuples().iterator()
+    for id_kp, year, rating_kp, rating_imdb, genres, type_, original_title, alternative_title in query:
+        yield (id_kp, year, rating_kp, rating_imdb, genres.split(',') if genres else [], type_,
+               original_title, alternative_title)
+
+
+def get_catalog_movies(ids: list[int]) -> list[core.models.Movie]:
+    """
+    Retrieves the movies from the catalog mirror.
+
+    Args:
+        ids (list[int]): The IDs of the movies in Kinopoisk database.
+
+    Returns:
+        list[core.models.Movie]: The movies found in the mirror in the order of the IDs.
+    """
+    movies = {movie.id_kp: movie for movie in CatalogMovie.select().where(CatalogMovie.id_kp.in_(ids))}
+    return [catalog_movie_to_movie(movies[id_kp]) for id_kp in ids if id_kp in movies]
+
+
+def get_seen_movie_ids(user_id: int) -> set[int]:
+    """
+    Retrieves the IDs of all movies the user has received.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+
+    Returns:
+        set[int]: The IDs of the movies in Kinopoisk database.
+    """
+    query = Movie.select(Movie.id_kp).join(Request).where(Request.user_id == user_id).distinct()
+    return set(query.scalars())
+
+
+def get_seen_filter(user_id: int) -> Optional[tuple[bytes, Optional[bytes]]]:
+    """
+    Retrieves the bloom filters of the movies the user has received.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+
+    Returns:
+        Optional[tuple[bytes, Optional[bytes]]]: The current and the previous filter or None if there are none.
+    """
+    seen = SeenFilter.get_or_none(SeenFilter.user_id == user_id)
+    return None if seen is None else (bytes(seen.current), seen.previous and bytes(seen.previous))
+
+
+def save_seen_filter(user_id: int, current: bytes, previous: Optional[bytes]) -> None:
+    """
+    Saves the bloom filters of the movies the user has received.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        current (bytes): The filter the new movies are added to.
+        previous (bytes, optional): The full filter with the older movies.
+
+    Returns:
+        None
+    """
+    SeenFilter.insert(user_id=user_id, current=current, previous=previous, updated_at=datetime.now()).on_conflict(
+        conflict_target=[SeenFilter.user_id],
+        preserve=[SeenFilter.current, SeenFilter.previous, SeenFilter.updated_at]
+    ).execute()
+
+
+def get_last_movie_id(user_id: int) -> Optional[int]:
+    """
+    Retrieves the ID of the movie the user has received last.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+
+    Returns:
+        Optional[int]: The ID of the movie in Kinopoisk database or None if the history is empty.
+    """
+    return Movie.select(Movie.id_kp).join(Request).where(
+        Request.user_id == user_id
+    ).order_by(Movie.id.desc()).limit(1).scalar()
 
 
 def get_history(user_id: int, amount: int) -> list[utils.presenters.Request]:
@@ -113,6 +496,109 @@ def get_history(user_id: int, amount: int) -> list[utils.presenters.Request]:
     ]
 
 
+def get_history_page(user_id: int,
+                     amount: int,
+                     cursor: Optional[tuple[datetime, int]] = None,
+                     older: bool = True) -> utils.presenters.HistoryPage:
+    """
+    Retrieves a page of the user's requests next to the keyset cursor.
+
+    Requests are ordered by the (created_at, id) pair, and the page is looked up
+    by comparing with the cursor instead of skipping rows, so with the
+    (user_id, created_at, id) index the query costs the same at any depth.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        amount (int): Amount of requests on the page.
+        cursor (tuple, optional): The (created_at, id) pair of the request the page starts after.
+            If not specified, the page with the most recent requests is returned.
+        older (bool): Whether the page goes to the older requests from the cursor or to the newer ones.
+
+    Returns:
+        HistoryPage: The page of requests with related movies and cursors of the neighbouring pages.
+    """
+    key = Tuple(Request.created_at, Request.id)
+    query = Request.select().where(Request.user_id == user_id)
+    if cursor is not None:
+        query = query.where(key < Tuple(*cursor) if older else key > Tuple(*cursor))
+    if older:
+        query = query.order_by(Request.created_at.desc(), Request.id.desc())
+    else:
+        query = query.order_by(Request.created_at, Request.id)
+    requests = list(query.limit(amount + 1))
+    has_more = len(requests) > amount
+    requests = requests[:amount]
+    if not older:
+        requests.reverse()
+    if not requests:
+        return utils.presenters.HistoryPage([], None, None)
+
+    first = (requests[0].created_at, requests[0].id)
+    last = (requests[-1].created_at, requests[-1].id)
+    if older:
+        has_older, has_newer = has_more, __has_requests(user_id, first, older=False)
+    else:
+        has_older, has_newer = __has_requests(user_id, last, older=True), has_more
+
+    movies = __requests_movies(requests)
+    return utils.presenters.HistoryPage(
+        requests=[
+            request_to_presenter(request, [movie_to_presenter(movie) for movie in movies.get(request.id, [])])
+            for request in requests
+        ],
+        older=last if has_older else None,
+        newer=first if has_newer else None
+    )
+
+
+def __catalog_since(query, since: Optional[datetime]):
+    """Limits the query of the catalog mirror to the movies updated after the time.
+
+    Args:
+        query (ModelSelect): The query of the CatalogMovie rows.
+        since (datetime, optional): The time, or None to keep all movies.
+
+    Returns:
+        ModelSelect: The limited query.
+    """
+    return query if since is None else query.where(CatalogMovie.updated_at > since)
+
+
+def __has_requests(user_id: int, cursor: tuple[datetime, int], older: bool) -> bool:
+    """
+    Checks whether the user has requests beyond the keyset cursor.
+
+    Args:
+        user_id (int): Unique identifier of the user.
+        cursor (tuple): The (created_at, id) pair to compare with.
+        older (bool): Whether to look for the older requests or for the newer ones.
+
+    Returns:
+        bool: True if there is at least one request beyond the cursor.
+    """
+    key = Tuple(Request.created_at, Request.id)
+    return Request.select().where(
+        (Request.user_id == user_id) & (key < Tuple(*cursor) if older else key > Tuple(*cursor))
+    ).exists()
+
+
+def __requests_movies(requests: list[Request]) -> dict[int, list[Movie]]:
+    """Retrieves the last pages of movies associated with the requests in a single query.
+
+    Args:
+        requests (list[Request]): The Request instances for which to retrieve movies.
+
+    Returns:
+        dict[int, list[Movie]]: The movies of every request, keyed by the request id.
+    """
+    amounts = {request.id: request.amount for request in requests}
+    query = Movie.select().where(Movie.request.in_(list(amounts))).order_by(Movie.request, Movie.id.desc())
+    return {
+        request_id: list(movies)[:amounts[request_id]]
+        for request_id, movies in groupby(query, key=lambda movie: movie.request_id)
+    }
+
+
 def __request_movies(request: Movie) -> Iterable[Movie]:
     """Retrieves the last page of movies from database associated with specific request.
 
@@ -1,10 +1,65 @@
-from database.models import database, Movie, Request
+import logging
+from typing import Optional
 
+from playhouse.migrate import SchemaMigrator, migrate
 
-def initialize_db() -> None:
-    """Initializes the database by creating required tables.
+from config_data import config
+from database.connection import MEMORY, is_sqlite, open_database
+from database.models import database, Movie, Request, CatalogMovie, CallbackValue, ApiUsage, Poster, BotState, SeenFilter
+
+logger = logging.getLogger(__name__)
+
+MODELS = [Request, Movie, CatalogMovie, CallbackValue, ApiUsage, Poster, BotState, SeenFilter]
+
+
+def initialize_db(url: Optional[str] = None) -> None:
+    """Initializes the database by connecting to it and creating required tables.
+
+    A SQLite file created before the incremental vacuum was enabled is rebuilt once to enable it,
+    the columns added to the models since the tables were created are added to the tables.
+
+    Args:
+        url (str, optional): The URL of the database, DATABASE_URL from the settings if not specified.
+
+    Returns:
+        None: This function doesn't return anything.
+    """
+    database.initialize(open_database(url or config.DATABASE_URL,
+                                      max_connections=config.DATABASE_MAX_CONNECTIONS,
+                                      stale_timeout=config.DATABASE_STALE_TIMEOUT))
+    database.create_tables(MODELS)
+    __add_missing_columns()
+    __enable_incremental_vacuum()
+
+
+def __add_missing_columns() -> None:
+    """Adds the nullable columns of the models missing from the existing tables.
+
+    Returns:
+        None: This function doesn't return anything.
+    """
+    migrator = SchemaMigrator.from_database(database.obj)
+    for model in MODELS:
+        table = model._meta.table_name
+        existing = {column.name for column in database.get_columns(table)}
+        for field in model._meta.sorted_fields:
+            if field.column_name not in existing and field.null:
+                logger.info('Adding the column %s.%s', table, field.column_name)
+                migrate(migrator.add_column(table, field.column_name, field))
+
+
+def __enable_incremental_vacuum() -> None:
+    """Rebuilds the SQLite database file once if it does not release its free pages incrementally.
+
+    The auto_vacuum mode of an existing file only changes when the file is rebuilt with VACUUM.
 
     Returns:
         None: This function doesn't return anything.
     """
-    database.create_tables([Request, Movie])
+    if not is_sqlite(database) or database.database == MEMORY:
+        return
+    if database.execute_sql('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return
+    logger.info('Rebuilding the database file to enable the incremental vacuum')
+    database.execute_sql('PRAGMA auto_vacuum = incremental')
+    database.execute_sql('VACUUM')
@@ -1,3 +1,4 @@
+import core.models
 import database.models
 import utils.presenters
 
@@ -15,6 +16,28 @@ def movie_to_presenter(movie: database.models.Movie) -> utils.presenters.Movie:
     return utils.presenters.Movie(movie.id_kp, movie.title)
 
 
+def catalog_movie_to_movie(movie: database.models.CatalogMovie) -> core.models.Movie:
+    """
+    Converts a CatalogMovie database model to a Movie.
+
+    Args:
+        movie (database.models.CatalogMovie): The CatalogMovie model to be converted.
+
+    Returns:
+        core.models.Movie: The converted Movie.
+    """
+    return core.models.Movie(id=movie.id_kp,
+                             original_title=movie.original_title,
+                             year=movie.year,
+                             rating_kp=movie.rating_kp,
+                             rating_imdb=movie.rating_imdb,
+                             genres=movie.genres.split(',') if movie.genres else [],
+                             description=movie.description,
+                             poster_url=movie.poster_url,
+                             alternative_title=movie.alternative_title,
+                             type=movie.type)
+
+
 def request_to_presenter(request: database.models.Request,
                          movies: list[utils.presenters.Movie]) -> utils.presenters.Request:
     """
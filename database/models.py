@@ -1,10 +1,11 @@
 from datetime import datetime
 
-from peewee import Model, DateTimeField, SqliteDatabase, ForeignKeyField
-from peewee import IntegerField, TextField
+from peewee import Model, BlobField, DateField, DateTimeField, DatabaseProxy, ForeignKeyField
+from peewee import BigIntegerField, FloatField, IntegerField, TextField
 
 
-database = SqliteDatabase('db.sqlite')
+# The database selected by DATABASE_URL, set by database.helpers.initialize_db.
+database = DatabaseProxy()
 
 
 class BaseModel(Model):
@@ -13,7 +14,7 @@ class BaseModel(Model):
 
     Attributes:
         Meta:
-            database (SqliteDatabase): The database connection.
+            database (DatabaseProxy): The database connection.
     """
     class Meta:
         database = database
@@ -36,7 +37,7 @@ class Request(BaseModel):
         amount (int, default=1): The number of movies to request (default is 1).
         created_at (datetime, default=datetime.now): The date and time when the request was created.
     """
-    user_id = IntegerField()
+    user_id = BigIntegerField()
     command = TextField()
     title = TextField(null=True)
     type = TextField(null=True)
@@ -48,6 +49,11 @@ class Request(BaseModel):
     amount = IntegerField(default=1)
     created_at = DateTimeField(default=datetime.now)
 
+    class Meta:
+        indexes = (
+            (('user_id', 'created_at', 'id'), False),
+        )
+
 
 class Movie(BaseModel):
     """
@@ -61,3 +67,117 @@ class Movie(BaseModel):
     id_kp = IntegerField()
     title = TextField()
     request = ForeignKeyField(Request, backref='movies')
+
+
+class CatalogMovie(BaseModel):
+    """
+    Represents a movie of the local mirror of the catalog, kept up to date with every movie received from the API.
+
+    Attributes:
+        id_kp (int): The ID of the movie in Kinopoisk database.
+        original_title (str): The original title of the movie.
+        alternative_title (str, optional): The alternative title of the movie.
+        year (int, optional): The release year of the movie.
+        rating_kp (float, optional): The Kinopoisk rating of the movie.
+        rating_imdb (float, optional): The IMDB rating of the movie.
+        genres (str): The genres of the movie separated by commas.
+        description (str, optional): The description of the movie.
+        poster_url (str, optional): The URL of the movie poster.
+        type (str, optional): The type of the movie, e.g. 'movie' or 'tv-series'.
+        updated_at (datetime, default=datetime.now): The date and time when the movie was last received.
+    """
+    id_kp = IntegerField(unique=True)
+    original_title = TextField()
+    alternative_title = TextField(null=True)
+    year = IntegerField(null=True)
+    rating_kp = FloatField(null=True)
+    rating_imdb = FloatField(null=True)
+    genres = TextField(default='')
+    description = TextField(null=True)
+    poster_url = TextField(null=True)
+    type = TextField(null=True)
+    updated_at = DateTimeField(default=datetime.now)
+
+
+class CallbackValue(BaseModel):
+    """
+    Represents a value passed in the callback data by its short id.
+
+    Attributes:
+        kind (str): The kind of the value (e.g. "genre", "type").
+        value (str): The value passed to the API.
+        display (str): The value shown to the user.
+    """
+    kind = TextField()
+    value = TextField()
+    display = TextField()
+
+    class Meta:
+        indexes = (
+            (('kind', 'value'), True),
+        )
+
+
+class ApiUsage(BaseModel):
+    """
+    Represents the number of calls to an API endpoint made with a key during a day.
+
+    Attributes:
+        day (date): The day of the calls.
+        key (str): The fingerprint of the API key.
+        endpoint (str): The name of the endpoint.
+        count (int): The number of calls.
+    """
+    day = DateField()
+    key = TextField()
+    endpoint = TextField()
+    count = IntegerField(default=0)
+
+    class Meta:
+        indexes = (
+            (('day', 'key', 'endpoint'), True),
+        )
+
+
+class Poster(BaseModel):
+    """
+    Represents the state of a poster URL in the local poster cache.
+
+    Attributes:
+        url (str): The URL of the poster.
+        digest (str, optional): The SHA-256 of the cached file, None if the URL is broken.
+        file_id (str, optional): The Telegram file ID of the uploaded poster.
+        updated_at (datetime, default=datetime.now): The date and time when the state was last changed.
+    """
+    url = TextField(unique=True)
+    digest = TextField(null=True)
+    file_id = TextField(null=True)
+    updated_at = DateTimeField(default=datetime.now)
+
+
+class BotState(BaseModel):
+    """
+    Represents a value the bot keeps between the restarts.
+
+    Attributes:
+        key (str): The name of the value.
+        value (str): The value.
+    """
+    key = TextField(unique=True)
+    value = TextField()
+
+
+class SeenFilter(BaseModel):
+    """
+    Represents the bloom filters of the movies a user has received.
+
+    Attributes:
+        user_id (int): The ID of the user.
+        current (bytes): The filter the new movies are added to.
+        previous (bytes, optional): The full filter with the older movies.
+        updated_at (datetime, default=datetime.now): The date and time when the filters were last changed.
+    """
+    user_id = BigIntegerField(unique=True)
+    current = BlobField()
+    previous = BlobField(null=True)
+    updated_at = DateTimeField(default=datetime.now)
@@ -0,0 +1,150 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator
+
+from peewee import fn
+
+from database.connection import is_sqlite
+from database.models import database, Request, Movie
+
+REQUEST_KEY_FIELDS = (Request.command, Request.title, Request.type, Request.genre,
+                      Request.year_min, Request.year_max, Request.rating_min, Request.rating_max,
+                      Request.amount)
+
+
+def run_retention(max_requests: int,
+                  max_age_days: int,
+                  archive_dir: str,
+                  batch_size: int = 100,
+                  vacuum_pages: int = 1000) -> int:
+    """
+    Prunes the history and archives the pruned rows.
+
+    A request is pruned if it is older than the age cutoff, if it is not among
+    the user's most recent requests, or if the user's next request is identical to it.
+    The pruned requests with their movies are deleted in small transactions, so the live
+    handlers are not blocked for long, and each batch is written to a gzip-compressed NDJSON
+    archive once its transaction has committed, so a rolled back batch is never archived.
+    The freed pages of SQLite are returned to the file system with incremental vacuum.
+
+    Args:
+        max_requests (int): The maximum number of requests kept per user.
+        max_age_days (int): The maximum age of the kept requests in days.
+        archive_dir (str): The directory to write the archive to.
+        batch_size (int): The number of requests deleted in one transaction.
+        vacuum_pages (int): The maximum number of free pages released by one incremental vacuum step.
+
+    Returns:
+        int: The number of pruned requests.
+    """
+    ids = sorted(set(__expired_requests(max_age_days))
+                 | set(__excess_requests(max_requests))
+                 | set(__repeated_requests()))
+    if not ids:
+        return 0
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'history-{datetime.now():%Y%m%d-%H%M%S}.ndjson.gz')
+    with gzip.open(path, 'at', encoding='utf-8') as archive:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with database.atomic():
+                rows = list(__archive_rows(batch))
+                Movie.delete().where(Movie.request.in_(batch)).execute()
+                Request.delete().where(Request.id.in_(batch)).execute()
+            for row in rows:
+                archive.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+            archive.flush()
+            __vacuum(vacuum_pages)
+    return len(ids)
+
+
+def __expired_requests(max_age_days: int) -> Iterable[int]:
+    """
+    Retrieves the requests older than the age cutoff.
+
+    Args:
+        max_age_days (int): The maximum age of the kept requests in days.
+
+    Returns:
+        Iterable[int]: The ids of the expired requests.
+    """
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    return Request.select(Request.id).where(Request.created_at < cutoff).scalars()
+
+
+def __excess_requests(max_requests: int) -> Iterable[int]:
+    """
+    Retrieves the requests exceeding the per-user cap.
+
+    Args:
+        max_requests (int): The maximum number of requests kept per user.
+
+    Returns:
+        Iterable[int]: The ids of the requests beyond the user's most recent ones.
+    """
+    position = fn.ROW_NUMBER().over(partition_by=[Request.user_id],
+                                    order_by=[Request.created_at.desc(), Request.id.desc()])
+    ranked = Request.select(Request.id, position.alias('position')).alias('ranked')
+    return (Request
+            .select(ranked.c.id)
+            .from_(ranked)
+            .where(ranked.c.position > max_requests)
+            .scalars())
+
+
+def __repeated_requests() -> Iterator[int]:
+    """
+    Retrieves the requests followed by an identical request of the same user.
+
+    Only the newest request of a run of identical consecutive requests is kept.
+
+    Returns:
+        Iterator[int]: The ids of the repeated requests.
+    """
+    query = (Request
+             .select(Request.id, Request.user_id, *REQUEST_KEY_FIELDS)
+             .order_by(Request.user_id, Request.created_at, Request.id)
+             .tuples()
+             .iterator())
+    previous = None
+    for id_, *key in query:
+        if previous is not None and previous[1] == key:
+            yield previous[0]
+        previous = (id_, key)
+
+
+def __archive_rows(ids: list[int]) -> Iterator[dict]:
+    """
+    Retrieves the requests with their movies as plain dictionaries.
+
+    Args:
+        ids (list[int]): The ids of the requests.
+
+    Returns:
+        Iterator[dict]: The requests with the list of their movies under the 'movies' key.
+    """
+    movies = {}
+    for movie in Movie.select().where(Movie.request.in_(ids)).dicts():
+        movies.setdefault(movie.pop('request'), []).append(movie)
+    for request in Request.select().where(Request.id.in_(ids)).dicts():
+        request['movies'] = movies.get(request['id'], [])
+        yield request
+
+
+def __vacuum(pages: int) -> None:
+    """
+    Releases free pages of the SQLite database file, the other databases reclaim the space themselves.
+
+    Args:
+        pages (int): The maximum number of pages to release.
+
+    Returns:
+        None
+    """
+    if not is_sqlite(database):
+        return
+    if database.execute_sql('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        database.execute_sql(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
@@ -1,7 +1,10 @@
-from telebot.callback_data import CallbackData
+from filters.callback_codec import CallbackCodec
 
-movie_type_factory = CallbackData('display', 'value', prefix='t')
-movie_genre_factory = CallbackData('display', 'value', prefix='g')
-movie_rating_factory = CallbackData('display', 'value', prefix='r')
-movie_amount_factory = CallbackData('value', prefix='a')
-movie_pagination_factory = CallbackData('value', prefix='p')
+movie_type_factory = CallbackCodec('value', prefix='t')
+movie_genre_factory = CallbackCodec('value', prefix='g')
+movie_rating_factory = CallbackCodec('value', prefix='r')
+movie_amount_factory = CallbackCodec('value', prefix='a')
+movie_pagination_factory = CallbackCodec('value', prefix='p')
+
+PAGINATION_STOP = 0
+PAGINATION_NEXT = 1
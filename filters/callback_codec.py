@@ -0,0 +1,113 @@
+from string import digits, ascii_lowercase, ascii_uppercase
+
+ALPHABET = digits + ascii_lowercase + ascii_uppercase
+SEPARATOR = '.'
+
+
+def encode_int(number: int) -> str:
+    """
+    Encodes a non-negative integer in base 62.
+
+    Args:
+        number (int): The integer to encode.
+
+    Returns:
+        str: The base-62 representation of the integer.
+
+    Example:
+        encode_int(125)
+        '21'
+    """
+    if number < 0:
+        raise ValueError(f'Only non-negative integers can be encoded, got {number}')
+    encoded = ''
+    while True:
+        number, digit = divmod(number, len(ALPHABET))
+        encoded = ALPHABET[digit] + encoded
+        if not number:
+            return encoded
+
+
+def decode_int(encoded: str) -> int:
+    """
+    Decodes a base-62 integer.
+
+    Args:
+        encoded (str): The base-62 representation of the integer.
+
+    Returns:
+        int: The decoded integer.
+
+    Raises:
+        ValueError: If the string is not a base-62 integer.
+
+    Example:
+        decode_int('21')
+        125
+    """
+    if not encoded:
+        raise ValueError('Empty base-62 integer')
+    number = 0
+    for char in encoded:
+        digit = ALPHABET.find(char)
+        if digit < 0:
+            raise ValueError(f'Invalid base-62 digit {char!r}')
+        number = number * len(ALPHABET) + digit
+    return number
+
+
+class CallbackCodec:
+    """
+    Compact callback data made of a one-character prefix and base-62 integer fields.
+
+    Non-integer values (genres, types) are passed as the short ids of the
+    callback registry, so the data stays far below Telegram's 64-byte limit.
+
+    Args:
+        *fields (str): The names of the integer fields.
+        prefix (str): The one-character prefix used to route the callback.
+
+    Example:
+        movie_amount_factory = CallbackCodec('value', prefix='a')
+        movie_amount_factory.new(value=5)
+        'a5'
+        movie_amount_factory.parse('a5')
+        {'value': 5}
+    """
+    def __init__(self, *fields: str, prefix: str):
+        if len(prefix) != 1 or prefix == SEPARATOR:
+            raise ValueError(f'Prefix must be a single character other than {SEPARATOR!r}, got {prefix!r}')
+        self.fields = fields
+        self.prefix = prefix
+
+    def new(self, **values: int) -> str:
+        """
+        Generates the callback data.
+
+        Args:
+            **values (int): The values of all fields.
+
+        Returns:
+            str: The callback data.
+        """
+        return self.prefix + SEPARATOR.join(encode_int(values[field]) for field in self.fields)
+
+    def parse(self, data: str) -> dict[str, int]:
+        """
+        Parses the callback data.
+
+        Args:
+            data (str): The callback data.
+
+        Returns:
+            dict[str, int]: The values of the fields.
+
+        Raises:
+            ValueError: If the data was not generated by this codec.
+        """
+        if not data.startswith(self.prefix):
+            raise ValueError(f'Callback data {data!r} has no prefix {self.prefix!r}')
+        parts = data[len(self.prefix):].split(SEPARATOR)
+        if len(parts) != len(self.fields):
+            raise ValueError(f'Callback data {data!r} does not match the fields {self.fields}')
+        return {field: decode_int(part) for field, part in zip(self.fields, parts)}
@@ -0,0 +1,88 @@
+from typing import Callable, Optional
+
+from telebot.types import CallbackQuery
+
+from filters.callback_codec import CallbackCodec
+
+CallbackHandler = Callable[[CallbackQuery], None]
+
+
+class CallbackDispatcher:
+    """
+    Routes callback queries to the handlers by the first character of the callback data.
+
+    The bot registers a single callback query handler calling ``dispatch``,
+    so a query is routed with one dictionary lookup instead of testing
+    the filters of every handler in turn.
+
+    Methods:
+        route(codec: CallbackCodec, **values: int) -> Callable:
+            Registers a handler for the callback data of the codec.
+        dispatch(query: CallbackQuery) -> bool:
+            Calls the handler registered for the callback query.
+        find(data: str) -> Optional[CallbackHandler]:
+            Finds the handler registered for the callback data.
+
+    Example:
+        callback_dispatcher = CallbackDispatcher()
+
+        @callback_dispatcher.route(movie_pagination_factory, value=PAGINATION_NEXT)
+        def pagination_next(query: CallbackQuery) -> None:
+            ...
+    """
+    def __init__(self):
+        self.__routes: dict[str, list[tuple[CallbackCodec, dict[str, int], CallbackHandler]]] = {}
+
+    def route(self, codec: CallbackCodec, **values: int) -> Callable[[CallbackHandler], CallbackHandler]:
+        """
+        Registers a handler for the callback data of the codec.
+
+        Args:
+            codec (CallbackCodec): The codec of the callback data.
+            **values (int): The field values the callback data must have. If not specified,
+                the handler gets all callback data of the codec.
+
+        Returns:
+            Callable: The decorator registering the handler.
+        """
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            self.__routes.setdefault(codec.prefix, []).append((codec, values, handler))
+            return handler
+        return decorator
+
+    def dispatch(self, query: CallbackQuery) -> bool:
+        """
+        Calls the handler registered for the callback query.
+
+        Args:
+            query (CallbackQuery): The callback query object received by the bot.
+
+        Returns:
+            bool: True if a handler was found, False if the callback data is unknown
+            (for example, the button of a message sent before an update of the bot).
+        """
+        handler = self.find(query.data)
+        if handler is None:
+            return False
+        handler(query)
+        return True
+
+    def find(self, data: str) -> Optional[CallbackHandler]:
+        """
+        Finds the handler registered for the callback data.
+
+        Args:
+            data (str): The callback data.
+
+        Returns:
+            Optional[CallbackHandler]: The handler or None if the callback data is unknown.
+        """
+        for codec, values, handler in self.__routes.get(data[:1], ()):
+            try:
+                callback_data = codec.parse(data)
+            except ValueError:
+                return None
+            if any(callback_data[field] != value for field, value in values.items()):
+                continue
+            return handler
+        return None
@@ -0,0 +1,74 @@
+from threading import Lock
+from typing import Optional
+
+from database.functions import register_callback_value, get_callback_values
+
+ANY_ID = 0
+ANY_DISPLAY = 'Любой'
+
+
+class CallbackRegistry:
+    """
+    Maps the values of one kind to the short ids passed in the callback data.
+
+    The ids are saved in the database, so the buttons of the sent messages
+    keep working after a restart and in every bot process.
+    The id 0 is reserved for the 'Любой' button meaning no filter.
+
+    Args:
+        kind (str): The kind of the values (e.g. "genre", "type").
+
+    Example:
+        genre_registry = CallbackRegistry('genre')
+        id_ = genre_registry.id_of('драма', 'Драма')
+        genre_registry.get(id_)
+        ('драма', 'Драма')
+    """
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.__ids: dict[str, int] = {}
+        self.__values: dict[int, tuple[Optional[str], str]] = {ANY_ID: (None, ANY_DISPLAY)}
+        self.__lock = Lock()
+
+    def id_of(self, value: str, display: str) -> int:
+        """
+        Returns the id of the value, registering it if needed.
+
+        Args:
+            value (str): The value passed to the API.
+            display (str): The value shown to the user.
+
+        Returns:
+            int: The id of the value.
+        """
+        id_ = self.__ids.get(value)
+        if id_ is None or self.__values[id_][1] != display:
+            with self.__lock:
+                id_ = register_callback_value(self.kind, value, display)
+                self.__ids[value] = id_
+                self.__values[id_] = (value, display)
+        return id_
+
+    def get(self, id_: int) -> tuple[Optional[str], str]:
+        """
+        Returns the value and its display by the id.
+
+        Args:
+            id_ (int): The id of the value.
+
+        Returns:
+            tuple[Optional[str], str]: The value (None for 'Любой') and its display.
+
+        Raises:
+            KeyError: If the id is unknown.
+        """
+        if id_ not in self.__values:
+            with self.__lock:
+                for saved_id, (value, display) in get_callback_values(self.kind).items():
+                    self.__ids[value] = saved_id
+                    self.__values[saved_id] = (value, display)
+        return self.__values[id_]
+
+
+type_registry = CallbackRegistry('type')
+genre_registry = CallbackRegistry('genre')
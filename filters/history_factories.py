@@ -1,4 +1,7 @@
-from telebot.callback_data import CallbackData
+from filters.callback_codec import CallbackCodec
 
-history_factory = CallbackData('id_kp', prefix='h')
-history_amount_factory = CallbackData('value', prefix='ah')
\ No newline at end of file
+history_factory = CallbackCodec('id_kp', prefix='h')
+history_amount_factory = CallbackCodec('value', prefix='A')
+history_page_factory = CallbackCodec('older', 'created_at', 'id', 'amount', prefix='P')
+
+HISTORY_CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
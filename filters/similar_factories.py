@@ -0,0 +1,3 @@
+from filters.callback_codec import CallbackCodec
+
+similar_factory = CallbackCodec('id_kp', prefix='s')
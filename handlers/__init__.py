@@ -1,2 +1,17 @@
-from . import default_handlers
-from . import custom_handlers
+from importlib import import_module
+
+MODULES = ('handlers.default_handlers', 'handlers.custom_handlers')
+
+
+def register() -> None:
+    """
+    Imports the handler modules, which registers their handlers with the bot.
+
+    Importing the package itself registers nothing, so the tools can import it
+    without touching the bot.
+
+    Returns:
+        None
+    """
+    for module in MODULES:
+        import_module(module)
@@ -2,5 +2,8 @@ from . import random
 from . import byname
 from . import byfilters
 from . import history
+from . import inline
+from . import similar
+from . import export
 from . import hello
 from . import echo
@@ -1,21 +1,20 @@
-import time
-
 from telebot.types import Message, CallbackQuery
 
-from config_data import config
-from core.api import MoviesApi
+from core.pagination import MoviesWindow
 from database.functions import save_byfilters_request, save_movies
 from filters.byfilters_factories import movie_type_factory, movie_genre_factory, movie_rating_factory, \
-    movie_amount_factory, movie_pagination_factory
+    movie_amount_factory, movie_pagination_factory, PAGINATION_NEXT, PAGINATION_STOP
+from filters.callback_registry import type_registry, genre_registry, ANY_ID
 from keyboards.inline.byfilters import types_keyboard, genres_keyboard, rating_keyboard
 from keyboards.inline.common import amount_keyboard, pagination_keyboard
-from loader import bot
+from loader import bot, callback_dispatcher, movies_api, seen_movies
 from parsers.common import parse_year_range
 from states.search_film_byfilters import SearchFilmByFiltersState
-from utils.senders import send_movie_message
+from utils.senders import send_movie_messages, report_api_errors
 
 
 @bot.message_handler(commands=['byfilters'])
+@report_api_errors
 def by_filters(message: Message) -> None:
     """
     Handles the '/byfilters' command and initiates the process of searching films by filters.
@@ -28,13 +27,13 @@ def by_filters(message: Message) -> None:
     """
     bot.delete_state(message.from_user.id)
     bot.set_state(message.from_user.id, SearchFilmByFiltersState.type)
-    movies_api = MoviesApi(config.API_KEY, config.API_HOST)
     bot.send_message(message.chat.id,
                      text=f'{message.from_user.first_name}, что хотите найти:',
                      reply_markup=types_keyboard(movies_api.get_types()))
 
 
-@bot.callback_query_handler(func=None, query=movie_type_factory.filter())
+@callback_dispatcher.route(movie_type_factory)
+@report_api_errors
 def movie_type_handler(query: CallbackQuery) -> None:
     """
     Handles the user selection for the movie type.
@@ -47,23 +46,20 @@ def movie_type_handler(query: CallbackQuery) -> None:
     """
     callback_data = movie_type_factory.parse(query.data)
     bot.set_state(query.from_user.id, SearchFilmByFiltersState.genre)
+    type_, display = type_registry.get(callback_data['value'])
     with bot.retrieve_data(query.from_user.id) as data:
-        data['display_type'] = callback_data['display']
-        if callback_data['value'] == 'any':
-            data['type'] = None
-        else:
-            data['type'] = callback_data['value']
+        data['display_type'] = display
+        data['type'] = type_
 
-    bot.edit_message_text(f'Выбранный тип - {callback_data["display"]}. Отличный выбор!',
+    bot.edit_message_text(f'Выбранный тип - {display}. Отличный выбор!',
                           query.message.chat.id,
                           query.message.id)
-    movies_api = MoviesApi(config.API_KEY, config.API_HOST)
     bot.send_message(query.message.chat.id,
                      text=f'Выберите жанр: ',
                      reply_markup=genres_keyboard(movies_api.get_genres()))
 
 
-@bot.callback_query_handler(func=None, query=movie_genre_factory.filter())
+@callback_dispatcher.route(movie_genre_factory)
 def movie_genre_handler(query: CallbackQuery) -> None:
     """
     Handles the user selection for the movie genre.
@@ -76,19 +72,17 @@ def movie_genre_handler(query: CallbackQuery) -> None:
     """
     callback_data = movie_genre_factory.parse(query.data)
     bot.set_state(query.from_user.id, SearchFilmByFiltersState.rating)
+    genre, display = genre_registry.get(callback_data['value'])
     with bot.retrieve_data(query.from_user.id) as data:
-        data['display_genre'] = callback_data['display']
-        if callback_data['value'] == 'any':
-            data['genre'] = None
-        else:
-            data['genre'] = callback_data['value']
-    bot.edit_message_text(f'Выбранный жанр - {callback_data["display"]}', query.message.chat.id, query.message.id)
+        data['display_genre'] = display
+        data['genre'] = genre
+    bot.edit_message_text(f'Выбранный жанр - {display}', query.message.chat.id, query.message.id)
     bot.send_message(query.message.chat.id,
                      text=f'Теперь укажите минимальный желаемый рейтинг',
                      reply_markup=rating_keyboard(is_minimum_input=True))
 
 
-@bot.callback_query_handler(func=None, query=movie_rating_factory.filter())
+@callback_dispatcher.route(movie_rating_factory)
 def movie_rating_handler(query: CallbackQuery) -> None:
     """
     Handles the user selection for the movie rating.
@@ -104,15 +98,15 @@ def movie_rating_handler(query: CallbackQuery) -> None:
 
     min_, max_ = 1, 10
     with bot.retrieve_data(query.from_user.id) as data:
-        if callback_data['value'] == 'any':
+        if callback_data['value'] == ANY_ID:
             data['rating'] = (1, 10)
             next_state = True
         elif 'rating' in data:
-            data['rating'] += (int(callback_data['value']), )
+            data['rating'] += (callback_data['value'], )
             min_, max_ = data['rating']
             next_state = True
         else:
-            data['rating'] = (int(callback_data['value']), )
+            data['rating'] = (callback_data['value'], )
             min_, = data['rating']
 
     if next_state:
@@ -151,7 +145,7 @@ def movie_year_handler(message: Message) -> None:
                      reply_markup=amount_keyboard())
 
 
-@bot.callback_query_handler(func=None, query=movie_amount_factory.filter())
+@callback_dispatcher.route(movie_amount_factory)
 def movie_amount_handler(query: CallbackQuery) -> None:
     """
     Handles the user selection for the number of movies to display.
@@ -165,8 +159,9 @@ def movie_amount_handler(query: CallbackQuery) -> None:
     callback_data = movie_amount_factory.parse(query.data)
     bot.set_state(query.from_user.id, SearchFilmByFiltersState.pagination)
     with bot.retrieve_data(query.from_user.id) as data:
-        data['amount'] = int(callback_data['value'])
+        data['amount'] = callback_data['value']
         data['page'] = 0
+        data['window'] = MoviesWindow(data['amount'])
         data['request'] = save_byfilters_request(user_id=query.from_user.id,
                                                  type=data['display_type'],
                                                  genre=data['display_genre'],
@@ -176,10 +171,11 @@ def movie_amount_handler(query: CallbackQuery) -> None:
     pagination_next(query)
 
 
-@bot.callback_query_handler(func=None, query=movie_pagination_factory.filter(value='next'))
+@callback_dispatcher.route(movie_pagination_factory, value=PAGINATION_NEXT)
+@report_api_errors
 def pagination_next(query: CallbackQuery) -> None:
     """
-    Handles the pagination for displaying the next page of movies.
+    Handles the pagination for displaying the next page of movies, skipping the ones the user has already received.
 
     Args:
         query (CallbackQuery): The callback query object received by the bot.
@@ -190,24 +186,27 @@ def pagination_next(query: CallbackQuery) -> None:
     delete_state = False
     bot.delete_message(query.message.chat.id, query.message.id)
     with bot.retrieve_data(query.from_user.id) as data:
-        data['page'] += 1
-        movies_api = MoviesApi(config.API_KEY, config.API_HOST)
-        response = movies_api.byfilters(
-            data['type'],
-            data['genre'],
-            data['rating'],
-            data['year'],
-            data['amount'],
-            data['page'],
+        response = data['window'].next(
+            lambda page, limit: movies_api.byfilters(
+                data['type'],
+                data['genre'],
+                data['rating'],
+                data['year'],
+                limit,
+                page,
+            ),
+            exclude=lambda movie: seen_movies.contains(query.from_user.id, int(movie.id))
         )
+        data['page'] = response.current_page
         save_movies(response.movies, data['request'])
-        if not response.movies:
+        if not response.movies and response.total_movies:
+            bot.send_message(query.message.chat.id,
+                             text=f'Новых фильмов не нашлось: все найденные вы уже видели.')
+        elif not response.movies:
             bot.send_message(query.message.chat.id,
                              text=f'Ничего не нашлось. Попробуйте изменить запрос.')
         else:
-            for movie in response.movies:
-                send_movie_message(query.message.chat.id, movie)
-                time.sleep(0.3)
+            send_movie_messages(query.message.chat.id, response.movies)
 
         if response.total_pages <= response.current_page:
             delete_state = True
@@ -224,7 +223,7 @@ def pagination_next(query: CallbackQuery) -> None:
             bot.send_message(query.message.chat.id, f'По данному запросу больше ничего нет')
 
 
-@bot.callback_query_handler(func=None, query=movie_pagination_factory.filter(value='stop'))
+@callback_dispatcher.route(movie_pagination_factory, value=PAGINATION_STOP)
 def pagination_stop(query: CallbackQuery) -> None:
     """
     Handles the user input to stop the pagination and search process.
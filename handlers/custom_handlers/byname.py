@@ -1,14 +1,13 @@
-import time
-
 from telebot.types import Message, ReplyKeyboardRemove
 
 from database.functions import save_byname_request, save_movies
-from loader import bot
+from loader import bot, movies_api, title_index
 from states.search_film_byname import SearchFilmState
-from core.api import MoviesApi
-from config_data import config
-from utils.senders import send_movie_message
+from core.pagination import MoviesWindow
+from utils.senders import send_movie_messages, report_api_errors
+from keyboards.inline.history import history_movie_keyboard
 from keyboards.reply.common import pagination_keyboard
+from utils.presenters import Movie
 
 
 @bot.message_handler(commands=['byname'])
@@ -63,6 +62,7 @@ def get_amount(message: Message) -> None:
     with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
         data['amount'] = amount
         data['page'] = 0
+        data['window'] = MoviesWindow(amount)
         data['request'] = save_byname_request(user_id=message.from_user.id,
                                               title=data['query'],
                                               amount=data['amount'])
@@ -70,6 +70,7 @@ def get_amount(message: Message) -> None:
 
 
 @bot.message_handler(state=SearchFilmState.pagination, regexp='Далее')
+@report_api_errors
 def pagination_next(message: Message) -> None:
     """
     Handles the 'Далее' command to display the next page of search results.
@@ -82,18 +83,17 @@ def pagination_next(message: Message) -> None:
     """
     delete_state = False
     with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
-        data['page'] += 1
-        movies_api = MoviesApi(config.API_KEY, config.API_HOST)
-        response = movies_api.byname(data['page'], data['amount'], data['query'])
+        response = data['window'].page(
+            data['page'] + 1,
+            lambda page, limit: movies_api.byname(page, limit, data['query'])
+        )
+        data['page'] = response.current_page
         save_movies(response.movies, data['request'])
 
         if not response.movies:
-            bot.send_message(message.from_user.id,
-                             f'Ничего не нашлось. Попробуйте изменить запрос.')
+            send_not_found(message, data['query'])
         else:
-            for movie in response.movies:
-                send_movie_message(message.chat.id, movie)
-                time.sleep(0.3)
+            send_movie_messages(message.chat.id, response.movies)
         if response.total_pages <= response.current_page:
             delete_state = True
 
@@ -110,6 +110,29 @@ def pagination_next(message: Message) -> None:
                          reply_markup=pagination_keyboard())
 
 
+def send_not_found(message: Message, query: str) -> None:
+    """
+    Tells the user nothing was found and suggests the known titles similar to the query.
+
+    The suggestions come from the local title index, so no API requests are made.
+
+    Args:
+        message (Message): The message object received by the bot.
+        query (str): The film name query.
+
+    Returns:
+        None
+    """
+    suggestions = title_index.suggest(query)
+    if not suggestions:
+        bot.send_message(message.from_user.id,
+                         f'Ничего не нашлось. Попробуйте изменить запрос.')
+        return
+    bot.send_message(message.from_user.id,
+                     f'Ничего не нашлось. Возможно, вы имели в виду:',
+                     reply_markup=history_movie_keyboard([Movie(id_kp, title) for id_kp, title in suggestions]))
+
+
 @bot.message_handler(state=SearchFilmState.pagination, regexp='Хватит')
 def pagination_stop(message: Message) -> None:
     """
@@ -0,0 +1,46 @@
+import tempfile
+from datetime import datetime
+
+from telebot.types import Message
+
+from database.export import EXPORT_FORMATS, export_history
+from loader import bot
+
+DOCUMENT_LIMIT = 50 * 1024 * 1024
+
+
+@bot.message_handler(commands=['export'])
+def export(message: Message) -> None:
+    """
+    Handles the '/export' command and sends the whole history of the user as a gzip-compressed document.
+
+    The format is given after the command: '/export csv' (the default) or '/export ndjson'.
+    The document is written to a temporary file, not to the memory.
+
+    Args:
+        message (Message): The message object received by the bot.
+
+    Returns:
+        None
+    """
+    bot.delete_state(message.from_user.id)
+    argument = message.text.split(maxsplit=1)[1:]
+    format = argument[0].strip().lower() if argument else EXPORT_FORMATS[0]
+    if format not in EXPORT_FORMATS:
+        bot.send_message(message.chat.id, 'Укажите формат выгрузки: /export csv или /export ndjson')
+        return
+
+    bot.send_chat_action(message.chat.id, 'upload_document')
+    with tempfile.TemporaryFile() as file:
+        count = export_history(message.from_user.id, file, format)
+        if not count:
+            bot.send_message(message.chat.id, 'История запросов пуста')
+            return
+        if file.tell() > DOCUMENT_LIMIT:
+            bot.send_message(message.chat.id, 'История слишком большая для отправки в Telegram')
+            return
+        file.seek(0)
+        bot.send_document(message.chat.id,
+                          file,
+                          caption=f'История запросов: {count}',
+                          visible_file_name=f'history-{datetime.now():%Y%m%d}.{format}.gz')
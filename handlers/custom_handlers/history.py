@@ -1,15 +1,17 @@
-import time
+from datetime import datetime
 
 from telebot.types import Message, CallbackQuery
 
-from config_data import config
-from core.api import MoviesApi
-from database.functions import get_history
-from filters.history_factories import history_factory, history_amount_factory
-from keyboards.inline.history import history_amount_keyboard, history_movie_keyboard
+from database.functions import get_history, get_history_page
+from filters.history_factories import history_factory, history_amount_factory, history_page_factory, \
+    HISTORY_CURSOR_FORMAT
+from keyboards.inline.history import history_amount_keyboard, history_page_keyboard
 from states.history import HistoryState
-from loader import bot
-from utils.senders import send_movie_message
+from loader import bot, callback_dispatcher, movies_api
+from utils.presenters import pack_history
+from utils.senders import send_movie_message, report_api_errors
+
+COMPACT_HISTORY_MAX_REQUESTS = 50
 
 
 @bot.message_handler(commands=['history'])
@@ -17,6 +19,8 @@ def history(message: Message) -> None:
     """
     Handles the '/history' command and initiates the process of displaying the user's request history.
 
+    With the number, e.g. '/history 10', the last requests are sent at once in the compact view.
+
     Args:
         message (Message): The message object received by the bot.
 
@@ -24,14 +28,45 @@ def history(message: Message) -> None:
         None
     """
     bot.delete_state(message.from_user.id)
+    argument = message.text.split(maxsplit=1)[1:]
+    if argument and argument[0].strip().isdecimal():
+        send_compact_history(message.chat.id, message.from_user.id,
+                             min(max(int(argument[0]), 1), COMPACT_HISTORY_MAX_REQUESTS))
+        return
     bot.set_state(message.from_user.id, HistoryState.amount)
-    bot.send_message(message.chat.id, f'Сколько последних запросов показать?', reply_markup=history_amount_keyboard())
+    bot.send_message(message.chat.id,
+                     f'Сколько запросов показывать на странице?',
+                     reply_markup=history_amount_keyboard())
+
+
+def send_compact_history(chat_id: int, user_id: int, amount: int) -> None:
+    """
+    Sends the last requests of the user in as few messages as the message length allows.
+
+    Every message has the buttons of its movies, numbered as in its text.
+
+    Args:
+        chat_id (int): The ID of the chat to send the messages to.
+        user_id (int): The ID of the user.
+        amount (int): The amount of the last requests.
+
+    Returns:
+        None
+    """
+    pages = pack_history(get_history(user_id=user_id, amount=amount))
+    if not pages:
+        bot.send_message(chat_id, 'История запросов пуста')
+    for page in pages:
+        bot.send_message(chat_id,
+                         page.to_html(),
+                         reply_markup=history_page_keyboard(page, amount),
+                         parse_mode='HTML')
 
 
-@bot.callback_query_handler(func=None, query=history_amount_factory.filter())
+@callback_dispatcher.route(history_amount_factory)
 def get_amount(query: CallbackQuery) -> None:
     """
-    Retrieves the specified amount of history requests and displays them to the user.
+    Displays the first page of the history with the specified amount of requests on a page.
 
     Args:
         query (CallbackQuery): The callback query object received by the bot.
@@ -40,15 +75,42 @@ def get_amount(query: CallbackQuery) -> None:
         None
     """
     callback_data = history_amount_factory.parse(query.data)
-    history_list = get_history(user_id=query.from_user.id, amount=int(callback_data['value']))
-    for request in history_list:
-        bot.send_message(query.message.chat.id, request.to_html(),
-                         reply_markup=history_movie_keyboard(request.movies),
-                         parse_mode='HTML')
-        time.sleep(0.2)
+    amount = callback_data['value']
+    page = get_history_page(user_id=query.from_user.id, amount=amount)
+    bot.edit_message_text(page.to_html(),
+                          query.message.chat.id,
+                          query.message.id,
+                          reply_markup=history_page_keyboard(page, amount),
+                          parse_mode='HTML')
+
 
+@callback_dispatcher.route(history_page_factory)
+def turn_page(query: CallbackQuery) -> None:
+    """
+    Replaces the history page in the message with the older or newer one.
 
-@bot.callback_query_handler(func=None, query=history_factory.filter())
+    Args:
+        query (CallbackQuery): The callback query object received by the bot.
+
+    Returns:
+        None
+    """
+    callback_data = history_page_factory.parse(query.data)
+    amount = callback_data['amount']
+    cursor = (datetime.strptime(str(callback_data['created_at']), HISTORY_CURSOR_FORMAT), callback_data['id'])
+    page = get_history_page(user_id=query.from_user.id,
+                            amount=amount,
+                            cursor=cursor,
+                            older=bool(callback_data['older']))
+    bot.edit_message_text(page.to_html(),
+                          query.message.chat.id,
+                          query.message.id,
+                          reply_markup=history_page_keyboard(page, amount),
+                          parse_mode='HTML')
+
+
+@callback_dispatcher.route(history_factory)
+@report_api_errors
 def show_movie_from_history(query: CallbackQuery) -> None:
     """
     Displays detailed information about a movie from the user's request history.
@@ -60,10 +122,5 @@ def show_movie_from_history(query: CallbackQuery) -> None:
         None
     """
     callback_data = history_factory.parse(query.data)
-    movies_api = MoviesApi(config.API_KEY, config.API_HOST)
-    movie = movies_api.byid(int(callback_data['id_kp']))
+    movie = movies_api.byid(callback_data['id_kp'])
     send_movie_message(query.message.chat.id, movie)
-
-
-
-
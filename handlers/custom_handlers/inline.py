@@ -0,0 +1,108 @@
+import logging
+
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InlineQuery, InlineQueryResultArticle, InlineQueryResultPhoto, InputTextMessageContent
+
+from config_data import config
+from core.api import ApiUnavailable
+from core.cache import PrefixCache
+from core.models import Movie
+from database.connection import releasing_connection
+from database.models import database
+from loader import bot, movies_api
+from utils.debounce import Debouncer
+from utils.presenters import movie_to_html
+
+logger = logging.getLogger(__name__)
+
+__results_cache = PrefixCache(ttl=config.INLINE_CACHE_TIME)
+__debouncer = Debouncer(config.INLINE_DEBOUNCE)
+
+
+@bot.inline_handler(func=lambda query: len(PrefixCache.normalize(query.query)) >= 2)
+def search_inline(query: InlineQuery) -> None:
+    """
+    Handles the inline query '@bot <title>' and answers with the movies found by name.
+
+    The cached results are sent at once. Otherwise the search is postponed until the user
+    stops typing, so the queries superseded by the next keystroke never reach the API.
+
+    Args:
+        query (InlineQuery): The inline query received by the bot.
+
+    Returns:
+        None
+    """
+    text = PrefixCache.normalize(query.query)
+    movies = __results_cache.get(text)
+    if movies is not None:
+        __answer(query, movies)
+        return
+    __debouncer.submit(query.from_user.id, releasing_connection(database, lambda: __search(query, text)))
+
+
+def __search(query: InlineQuery, text: str) -> None:
+    """
+    Searches for the movies by name, caches and sends the results.
+
+    It runs in the timer thread of the debouncer, outside the handlers, so the failed
+    answer (e.g. to the query expired meanwhile) is logged here.
+
+    Args:
+        query (InlineQuery): The inline query to answer.
+        text (str): The normalized query.
+
+    Returns:
+        None
+    """
+    try:
+        try:
+            response = movies_api.byname(1, config.INLINE_RESULTS, text)
+        except ApiUnavailable:
+            bot.answer_inline_query(query.id, [], cache_time=5, is_personal=True)
+            return
+        __results_cache.put(text, response.movies, complete=response.total_movies <= len(response.movies))
+        __answer(query, response.movies)
+    except ApiTelegramException:
+        logger.exception('Failed to answer the inline query %s', query.id)
+
+
+def __answer(query: InlineQuery, movies: list[Movie]) -> None:
+    """
+    Sends the movies as the answer to the inline query.
+
+    Args:
+        query (InlineQuery): The inline query to answer.
+        movies (list[Movie]): The movies to send.
+
+    Returns:
+        None
+    """
+    bot.answer_inline_query(query.id, [__to_result(movie) for movie in movies], cache_time=config.INLINE_CACHE_TIME)
+
+
+def __to_result(movie: Movie) -> InlineQueryResultArticle | InlineQueryResultPhoto:
+    """
+    Builds the inline query result for the movie: a photo if the movie has a poster, an article otherwise.
+
+    Args:
+        movie (Movie): The movie.
+
+    Returns:
+        InlineQueryResultArticle | InlineQueryResultPhoto: The inline query result.
+    """
+    title = f'{movie.original_title} ({movie.year})'
+    description = ', '.join(movie.genres)
+    if movie.poster_url:
+        return InlineQueryResultPhoto(id=str(movie.id),
+                                      photo_url=movie.poster_url,
+                                      thumb_url=movie.poster_url,
+                                      title=title,
+                                      description=description,
+                                      caption=movie_to_html(movie),
+                                      parse_mode='HTML')
+    return InlineQueryResultArticle(id=str(movie.id),
+                                    title=title,
+                                    description=description,
+                                    input_message_content=InputTextMessageContent(movie_to_html(movie),
+                                                                                  parse_mode='HTML'))
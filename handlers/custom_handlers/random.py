@@ -1,25 +1,80 @@
 from telebot.types import Message
 
-from database.functions import save_random_request, save_movies
-from loader import bot
-from core.api import MoviesApi
-from config_data import config
-from utils.senders import send_movie_message
+from database.functions import save_random_request, save_movies, get_catalog_movies
+from loader import bot, movies_api, seen_movies, random_index
+from parsers.common import parse_random_filters
+from utils.senders import send_movie_message, report_api_errors
+
+RANDOM_ATTEMPTS = 3
 
 
 @bot.message_handler(commands=['random'])
+@report_api_errors
 def random(message: Message) -> None:
     """
     Handles the '/random' command and sends a message with random movie to the chat.
 
+    With the filters, e.g. '/random сериал драма 1990-2000 7', the movie is picked from the
+    local catalog by the random index, without requesting the API. Otherwise it is
+    requested from the API. A movie the user has already received is replaced with
+    another one, at most RANDOM_ATTEMPTS movies are picked.
+
     Args:
         message (Message): The message object received by the bot.
 
     Returns:
         None
     """
-    movies = MoviesApi(config.API_KEY, config.API_HOST)
-    result = movies.random()
+    user_id = message.from_user.id
+    argument = message.text.split(maxsplit=1)[1:]
+    if argument:
+        filters, error = parse_random_filters(argument[0])
+        if error:
+            bot.send_message(message.chat.id, error)
+            return
+        send_filtered_random(message.chat.id, user_id, *filters)
+        return
+
+    result = movies_api.random()
+    for _ in range(RANDOM_ATTEMPTS - 1):
+        if not seen_movies.contains(user_id, int(result.id)):
+            break
+        result = movies_api.random()
     save_movies(movies=[result],
-                request=save_random_request(message.from_user.id))
+                request=save_random_request(user_id))
     send_movie_message(message.chat.id, result)
+
+
+def send_filtered_random(chat_id: int,
+                         user_id: int,
+                         type: str | None,
+                         genre: str | None,
+                         years: tuple[int, int] | None,
+                         ratings: tuple[int, int] | None) -> None:
+    """
+    Sends a random movie of the local catalog matching the filters.
+
+    Args:
+        chat_id (int): The ID of the chat to send the message to.
+        user_id (int): The ID of the user.
+        type (str, optional): The type, any if not specified.
+        genre (str, optional): The genre, any if not specified.
+        years (tuple[int, int], optional): The range of the release years.
+        ratings (tuple[int, int], optional): The range of the Kinopoisk rating.
+
+    Returns:
+        None
+    """
+    if genre is not None and genre not in random_index.genres():
+        bot.send_message(chat_id, f'Жанр «{genre}» не найден. Доступные жанры: {", ".join(random_index.genres())}')
+        return
+    id_kp = random_index.sample(type, genre, years, ratings,
+                                exclude=lambda picked: seen_movies.contains(user_id, picked),
+                                attempts=RANDOM_ATTEMPTS)
+    movies = get_catalog_movies([id_kp]) if id_kp is not None else []
+    if not movies:
+        bot.send_message(chat_id, 'Фильмов с такими условиями пока нет. Попробуйте изменить запрос.')
+        return
+    save_movies(movies=movies,
+                request=save_random_request(user_id))
+    send_movie_message(chat_id, movies[0])
@@ -0,0 +1,77 @@
+from telebot.types import Message, CallbackQuery
+
+from database.functions import get_catalog_movies, get_last_movie_id, get_seen_movie_ids, save_catalog_movies
+from filters.similar_factories import similar_factory
+from keyboards.inline.history import history_movie_keyboard
+from loader import bot, callback_dispatcher, movies_api, similarity_index
+from utils.presenters import Movie
+from utils.senders import report_api_errors
+
+
+@bot.message_handler(commands=['similar'])
+@report_api_errors
+def similar(message: Message) -> None:
+    """
+    Handles the '/similar' command and sends the movies similar to the last movie the user has received.
+
+    Args:
+        message (Message): The message object received by the bot.
+
+    Returns:
+        None
+    """
+    id_kp = get_last_movie_id(message.from_user.id)
+    if id_kp is None:
+        bot.send_message(message.chat.id, 'Сначала найдите какой-нибудь фильм, и я подберу похожие.')
+        return
+    send_similar(message.chat.id, message.from_user.id, id_kp)
+
+
+@callback_dispatcher.route(similar_factory)
+@report_api_errors
+def similar_to_movie(query: CallbackQuery) -> None:
+    """
+    Sends the movies similar to the movie under which the button was pressed.
+
+    Args:
+        query (CallbackQuery): The callback query object received by the bot.
+
+    Returns:
+        None
+    """
+    bot.answer_callback_query(query.id)
+    callback_data = similar_factory.parse(query.data)
+    send_similar(query.message.chat.id, query.from_user.id, callback_data['id_kp'])
+
+
+def send_similar(chat_id: int, user_id: int, id_kp: int, amount: int = 5) -> None:
+    """
+    Sends the list of the movies similar to the movie, skipping the ones the user has already received.
+
+    The movies are picked from the local catalog mirror. The movie itself is requested
+    from the API only if it is not in the mirror yet.
+
+    Args:
+        chat_id (int): The ID of the chat to send the message to.
+        user_id (int): The ID of the user.
+        id_kp (int): The ID of the movie in Kinopoisk database.
+        amount (int): The maximum number of movies.
+
+    Returns:
+        None
+    """
+    seen = get_seen_movie_ids(user_id)
+    ranked = similarity_index.similar(id_kp, amount, exclude=seen)
+    if ranked is None:
+        save_catalog_movies([movies_api.byid(id_kp)])
+        ranked = similarity_index.similar(id_kp, amount, exclude=seen)
+    movies = get_catalog_movies([similar_id for similar_id, _ in ranked or ()])
+    if not movies:
+        bot.send_message(chat_id, 'Пока не нашлось похожих фильмов. Поищите ещё что-нибудь, и подборка станет лучше.')
+        return
+    bot.send_message(chat_id,
+                     'Похожие фильмы:',
+                     reply_markup=history_movie_keyboard([
+                         Movie(movie.id, Movie.get_full_title(movie.original_title, movie.alternative_title))
+                         for movie in movies
+                     ]))
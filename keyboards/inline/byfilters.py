@@ -1,9 +1,12 @@
-from telebot.callback_data import CallbackData
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from filters.byfilters_factories import movie_type_factory, movie_genre_factory, movie_rating_factory
+from filters.callback_codec import CallbackCodec
+from filters.callback_registry import type_registry, genre_registry, ANY_ID, ANY_DISPLAY
+from keyboards.inline.cache import keyboard_cache
 
 
+@keyboard_cache.cached(single=True)
 def types_keyboard(types: list[str]) -> InlineKeyboardMarkup:
     """
     Creates an inline keyboard markup for selecting movie types.
@@ -24,8 +27,7 @@ def types_keyboard(types: list[str]) -> InlineKeyboardMarkup:
         InlineKeyboardButton(
             text=display,
             callback_data=movie_type_factory.new(
-                display=display,
-                value=value
+                value=type_registry.id_of(value, display)
             )
         )
         for value, display in formatted.items()
@@ -34,6 +36,7 @@ def types_keyboard(types: list[str]) -> InlineKeyboardMarkup:
     return keyboard
 
 
+@keyboard_cache.cached(single=True)
 def genres_keyboard(genres: list[str]) -> InlineKeyboardMarkup:
     """
     Creates an inline keyboard markup for selecting movie genres.
@@ -54,8 +57,7 @@ def genres_keyboard(genres: list[str]) -> InlineKeyboardMarkup:
         InlineKeyboardButton(
             text=display,
             callback_data=movie_genre_factory.new(
-                display=display,
-                value=value
+                value=genre_registry.id_of(value, display)
             )
         )
         for value, display in formatted.items()
@@ -64,6 +66,7 @@ def genres_keyboard(genres: list[str]) -> InlineKeyboardMarkup:
     return keyboard
 
 
+@keyboard_cache.cached()
 def rating_keyboard(min_rating: int = 1, is_minimum_input: bool = False) -> InlineKeyboardMarkup:
     """
     Creates an inline keyboard markup for selecting movie ratings.
@@ -89,7 +92,6 @@ def rating_keyboard(min_rating: int = 1, is_minimum_input: bool = False) -> Inli
         InlineKeyboardButton(
             text=num,
             callback_data=movie_rating_factory.new(
-                display=num,
                 value=num
             )
         )
@@ -100,13 +102,13 @@ def rating_keyboard(min_rating: int = 1, is_minimum_input: bool = False) -> Inli
     return keyboard
 
 
-def __add_button_any(keyboard: InlineKeyboardMarkup, data_factory: CallbackData) -> None:
+def __add_button_any(keyboard: InlineKeyboardMarkup, data_factory: CallbackCodec) -> None:
     """
     Adds an 'Any' button to the inline keyboard.
 
     Args:
         keyboard (InlineKeyboardMarkup): The inline keyboard markup.
-        data_factory (CallbackData): The callback data factory.
+        data_factory (CallbackCodec): The callback data factory.
 
     Returns:
         None
@@ -115,10 +117,9 @@ def __add_button_any(keyboard: InlineKeyboardMarkup, data_factory: CallbackData)
         __add_button_any(keyboard, movie_type_factory)
     """
     keyboard.add(InlineKeyboardButton(
-        'Любой',
+        ANY_DISPLAY,
         callback_data=data_factory.new(
-            display='Любой',
-            value='any',
+            value=ANY_ID,
         ))
     )
 
@@ -0,0 +1,104 @@
+from functools import wraps
+from threading import Lock
+from typing import Callable, Hashable, Optional
+
+from telebot.types import InlineKeyboardMarkup
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    """
+    An inline keyboard markup serialized once on creation.
+
+    The markup is shared between the calls, so it must not be modified:
+    the changes are not reflected in the serialized reply markup.
+
+    Args:
+        markup (InlineKeyboardMarkup): The markup to freeze.
+
+    Example:
+        keyboard = FrozenInlineKeyboardMarkup(amount_keyboard())
+    """
+    def __init__(self, markup: InlineKeyboardMarkup):
+        super().__init__(keyboard=markup.keyboard, row_width=markup.row_width)
+        self.json = markup.to_json()
+
+    def to_json(self) -> str:
+        """
+        Returns the serialized reply markup.
+
+        Returns:
+            str: The JSON representation of the markup.
+        """
+        return self.json
+
+
+class KeyboardCache:
+    """
+    Cache of inline keyboards keyed by the arguments of the keyboard function.
+
+    Methods:
+        cached(single: bool = False) -> Callable:
+            Decorates a keyboard function to build every markup only once.
+        invalidate(name: Optional[str] = None) -> None:
+            Drops the cached markups of a keyboard function or of all of them.
+
+    Example:
+        keyboard_cache = KeyboardCache()
+
+        @keyboard_cache.cached()
+        def amount_keyboard() -> InlineKeyboardMarkup:
+            ...
+    """
+    def __init__(self):
+        self.__keyboards: dict[str, dict[Hashable, FrozenInlineKeyboardMarkup]] = {}
+        self.__lock = Lock()
+
+    def cached(self, single: bool = False) -> Callable:
+        """
+        Decorates a keyboard function to build every markup only once per set of arguments.
+
+        List arguments are compared by their items.
+
+        Args:
+            single (bool): Whether to keep only the markup for the latest arguments. Used for keyboards
+                built from the data loaded from the API, so the markup is rebuilt when the data changes.
+
+        Returns:
+            Callable: The decorator.
+        """
+        def decorator(func: Callable[..., InlineKeyboardMarkup]) -> Callable[..., InlineKeyboardMarkup]:
+            @wraps(func)
+            def wrapper(*args, **kwargs) -> InlineKeyboardMarkup:
+                key = (tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args),
+                       tuple(sorted(kwargs.items())))
+                keyboard = self.__keyboards.get(func.__name__, {}).get(key)
+                if keyboard is None:
+                    keyboard = FrozenInlineKeyboardMarkup(func(*args, **kwargs))
+                    with self.__lock:
+                        if single:
+                            self.__keyboards[func.__name__] = {key: keyboard}
+                        else:
+                            self.__keyboards.setdefault(func.__name__, {})[key] = keyboard
+                return keyboard
+            return wrapper
+        return decorator
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        Drops the cached markups.
+
+        Args:
+            name (Optional[str]): The name of the keyboard function. If not specified,
+                the markups of all functions are dropped.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            if name is None:
+                self.__keyboards.clear()
+            else:
+                self.__keyboards.pop(name, None)
+
+
+keyboard_cache = KeyboardCache()
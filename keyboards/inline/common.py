@@ -1,8 +1,11 @@
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from filters.byfilters_factories import movie_amount_factory, movie_pagination_factory
+from filters.byfilters_factories import movie_amount_factory, movie_pagination_factory, PAGINATION_STOP, \
+    PAGINATION_NEXT
+from keyboards.inline.cache import keyboard_cache
 
 
+@keyboard_cache.cached()
 def amount_keyboard() -> InlineKeyboardMarkup:
     """
     Creates an inline keyboard markup for selecting the amount of movies.
@@ -26,6 +29,7 @@ def amount_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+@keyboard_cache.cached()
 def pagination_keyboard() -> InlineKeyboardMarkup:
     """
     Creates an inline keyboard markup for pagination.
@@ -40,10 +44,10 @@ def pagination_keyboard() -> InlineKeyboardMarkup:
     keyboard.add(
         InlineKeyboardButton(
             text='Хватит',
-            callback_data=movie_pagination_factory.new(value='stop')),
+            callback_data=movie_pagination_factory.new(value=PAGINATION_STOP)),
         InlineKeyboardButton(
             text='Далее',
-            callback_data=movie_pagination_factory.new(value='next'))
+            callback_data=movie_pagination_factory.new(value=PAGINATION_NEXT))
     )
 
     return keyboard
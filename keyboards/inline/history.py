@@ -1,12 +1,15 @@
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from filters.history_factories import history_factory, history_amount_factory
-from utils.presenters import Movie
+from filters.history_factories import history_factory, history_amount_factory, history_page_factory, \
+    HISTORY_CURSOR_FORMAT
+from keyboards.inline.cache import keyboard_cache
+from utils.presenters import Movie, HistoryPage
 
 
+@keyboard_cache.cached()
 def history_amount_keyboard() -> InlineKeyboardMarkup:
     """
-    Creates an inline keyboard markup for selecting the amount of history items.
+    Creates an inline keyboard markup for selecting the amount of history items on a page.
 
     Returns:
         InlineKeyboardMarkup: The inline keyboard markup.
@@ -53,3 +56,47 @@ def history_movie_keyboard(movies: list[Movie]) -> InlineKeyboardMarkup:
     ))
     return keyboard
 
+
+def history_page_keyboard(page: HistoryPage, amount: int) -> InlineKeyboardMarkup:
+    """
+    Creates an inline keyboard markup for a page of the history.
+
+    The keyboard has a numbered button for every movie on the page and the navigation
+    buttons carrying the keyset cursors of the neighbouring pages.
+
+    Args:
+        page (HistoryPage): The page of the history.
+        amount (int): The amount of requests on a page.
+
+    Returns:
+        InlineKeyboardMarkup: The inline keyboard markup.
+
+    Example:
+        keyboard = history_page_keyboard(page, amount=5)
+    """
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    keyboard.add(*(
+        InlineKeyboardButton(
+            text=f'{number}. {movie.title}',
+            callback_data=history_factory.new(
+                id_kp=movie.id_kp
+            )
+        )
+        for number, movie in enumerate(page.movies, start=1)
+    ))
+    navigation = [
+        InlineKeyboardButton(
+            text=text,
+            callback_data=history_page_factory.new(
+                older=older,
+                created_at=int(cursor[0].strftime(HISTORY_CURSOR_FORMAT)),
+                id=cursor[1],
+                amount=amount
+            )
+        )
+        for text, older, cursor in (('« Новее', False, page.newer), ('Старше »', True, page.older))
+        if cursor is not None
+    ]
+    if navigation:
+        keyboard.row(*navigation)
+    return keyboard
@@ -0,0 +1,21 @@
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from filters.similar_factories import similar_factory
+
+
+def similar_keyboard(id_kp: int) -> InlineKeyboardMarkup:
+    """
+    Creates an inline keyboard markup with the button to find the movies similar to the movie.
+
+    Args:
+        id_kp (int): The ID of the movie in Kinopoisk database.
+
+    Returns:
+        InlineKeyboardMarkup: The inline keyboard markup.
+
+    Example:
+        keyboard = similar_keyboard(id_kp=123)
+    """
+    keyboard = InlineKeyboardMarkup()
+    keyboard.add(InlineKeyboardButton(text='Похожие фильмы', callback_data=similar_factory.new(id_kp=id_kp)))
+    return keyboard
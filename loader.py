@@ -1,6 +1,76 @@
-from telebot import TeleBot
+from concurrent.futures import ThreadPoolExecutor
+
 from telebot.storage import StateMemoryStorage
 from config_data import config
+from core.api import MoviesApi
+from core.balancer import ApiKey, KeyPool
+from core.breaker import CircuitBreaker
+from core.cache import ResponseCache
+from core.posters import PosterCache
+from core.quota import QuotaGovernor, key_fingerprint
+from core.sampling import RandomIndex
+from core.seen import SeenMovies
+from core.similar import SimilarityIndex
+from core.suggest import TitleIndex
+from database.connection import releasing_connection
+from database.functions import get_api_usage, add_api_usage, add_movies_listener, get_poster, save_poster, \
+    get_seen_filter, save_seen_filter, get_seen_movie_ids, add_received_listener
+from database.models import database
+from filters.callback_dispatcher import CallbackDispatcher
+from utils.metrics import metrics
+from utils.shutdown import DrainingTeleBot
 
 storage = StateMemoryStorage()
-bot = TeleBot(token=config.BOT_TOKEN, state_storage=storage)
+bot = DrainingTeleBot(token=config.BOT_TOKEN, state_storage=storage)
+callback_dispatcher = CallbackDispatcher()
+
+api_pool = KeyPool(
+    keys=[
+        ApiKey(key, QuotaGovernor(key_fingerprint(key),
+                                  daily_limit=config.API_DAILY_LIMIT,
+                                  reserve=config.API_INTERACTIVE_RESERVE,
+                                  cache_threshold=config.API_CACHE_THRESHOLD,
+                                  load=releasing_connection(database, get_api_usage),
+                                  save=releasing_connection(database, add_api_usage)))
+        for key in config.API_KEYS
+    ],
+    hosts=config.API_HOSTS
+)
+api_breaker = CircuitBreaker()
+movies_api = MoviesApi(api_pool,
+                       cache=ResponseCache(),
+                       breaker=api_breaker,
+                       hedge_executor=ThreadPoolExecutor(8, 'hedge') if config.API_HEDGING else None,
+                       timeout=config.API_TIMEOUT)
+metrics.gauge('api_quota_remaining', api_pool.remaining)
+metrics.gauge('api_breaker_state', lambda: int(api_breaker.state))
+for api_key in api_pool.keys:
+    metrics.gauge(f'api_key_quota_remaining{{key="{api_key.id}"}}', api_key.governor.remaining)
+    metrics.gauge(f'api_key_calls_total{{key="{api_key.id}"}}', lambda api_key=api_key: api_key.calls)
+    metrics.gauge(f'api_key_errors_total{{key="{api_key.id}"}}', lambda api_key=api_key: api_key.errors)
+    metrics.gauge(f'api_key_latency_seconds{{key="{api_key.id}"}}', lambda api_key=api_key: api_key.latency)
+
+title_index = TitleIndex()
+add_movies_listener(lambda movies: title_index.add_many(
+    (movie.id, movie.original_title, movie.alternative_title) for movie in movies
+))
+metrics.gauge('title_index_movies', lambda: len(title_index))
+
+similarity_index = SimilarityIndex()
+add_movies_listener(similarity_index.add_movies)
+metrics.gauge('similarity_index_movies', lambda: len(similarity_index))
+
+random_index = RandomIndex()
+add_movies_listener(random_index.add_movies)
+metrics.gauge('random_index_movies', lambda: len(random_index))
+
+poster_cache = PosterCache(config.POSTER_CACHE_DIR,
+                           max_bytes=config.POSTER_CACHE_MAX_MB * 1024 * 1024,
+                           load=releasing_connection(database, get_poster),
+                           save=releasing_connection(database, save_poster),
+                           wait=config.POSTER_WAIT)
+metrics.gauge('poster_cache_files', lambda: len(poster_cache))
+metrics.gauge('poster_cache_bytes', lambda: poster_cache.size)
+
+seen_movies = SeenMovies(load=get_seen_filter, save=save_seen_filter, history=get_seen_movie_ids)
+add_received_listener(lambda user_id, movies: seen_movies.add(user_id, [int(movie.id) for movie in movies]))
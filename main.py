@@ -1,17 +1,373 @@
+import logging
+import multiprocessing
+import signal
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from queue import Empty
+from threading import Thread
+from typing import Callable, Optional
+
+IMPORTS_STARTED_AT = time.perf_counter()  # Taken before the imports of the bot modules.
+
+from config_data import config
+from core.quota import Priority
+from core.snapshot import open_snapshot, write_snapshot
+from core.sync import CatalogSync
+from database.functions import get_known_titles, get_catalog_features, get_catalog_rows, get_bot_state, \
+    set_bot_state, save_synced_movies, get_catalog_titles
+from database.connection import release_connection, releasing_connection
 from database.helpers import initialize_db
-from filters.callback_filter import CallbackFilter
-from loader import bot
-import handlers  # noqa
+from database.models import database
+from database.retention import run_retention
+from keyboards.inline.byfilters import types_keyboard, genres_keyboard
+from loader import bot, callback_dispatcher, movies_api, title_index, similarity_index, random_index
+import handlers
+from utils.jobs import PeriodicJob
+from utils.metrics import metrics
+from utils.recording import Recorder
+from utils.startup import StartupReport
+from utils.shutdown import ShutdownCoordinator
 from utils.set_bot_commands import set_default_commands
+from utils.supervisor import Supervisor
+from telebot import apihelper
 from telebot.custom_filters import StateFilter, IsDigitFilter
+from telebot.types import Update
 
-if __name__ == '__main__':
-    initialize_db()
 
-    bot.add_custom_filter(StateFilter(bot))
-    bot.add_custom_filter(IsDigitFilter())
-    bot.add_custom_filter(CallbackFilter())
+def load_catalog(dump: bool = True) -> None:
+    """
+    Fills the local catalog indexes from the snapshot and the movies updated after it.
+
+    The similarity index uses the memory-mapped columns of the snapshot as they are,
+    the random index is built from them and the title index is built in the background.
+    Without the snapshot, it is written once the catalog is loaded, so the next start is fast.
+
+    Args:
+        dump (bool): Whether to write the missing snapshot, only one of the shards does it.
+
+    Returns:
+        None
+    """
+    since = None
+    try:
+        snapshot = open_snapshot(config.CATALOG_SNAPSHOT_PATH)
+    except (OSError, ValueError):
+        logging.info('No catalog snapshot at %s, loading the catalog from the database',
+                     config.CATALOG_SNAPSHOT_PATH)
+    else:
+        since = snapshot.created_at
+        similarity_index.load_snapshot(snapshot)
+        random_index.load_snapshot(snapshot)
+    features = list(get_catalog_features(since))
+    similarity_index.add_many(features)
+    random_index.add_many(features)
+
+    def fill_title_index() -> None:
+        if since is not None:
+            title_index.add_many(snapshot.titles())
+        title_index.add_many(get_known_titles(since))
+        if since is None and dump:
+            dump_catalog()
+
+    Thread(target=releasing_connection(database, fill_title_index), name='title-index', daemon=True).start()
+
+
+def catalog_refresher(since: datetime) -> Callable[[], int]:
+    """
+    Creates the function adding the catalog movies updated by another process to the local indexes.
+
+    The catalog sync runs only in the first shard, the other shards pick its movies up
+    from the database. Every run reads the movies updated since the previous one, with
+    an overlap covering the transactions committed after the previous run started.
+
+    Args:
+        since (datetime): The time the indexes are up to date with.
+
+    Returns:
+        Callable[[], int]: The function returning the number of the added movies.
+    """
+    def refresh() -> int:
+        nonlocal since
+        started = datetime.now()
+        features = list(get_catalog_features(since))
+        similarity_index.add_many(features)
+        random_index.add_many(features)
+        title_index.add_many(get_catalog_titles(since))
+        since = started - CATALOG_REFRESH_OVERLAP
+        return len(features)
+
+    return refresh
+
+
+def dump_catalog() -> int:
+    """
+    Writes the snapshot of the catalog mirror, a failed write is logged and retried by the next run.
+
+    Returns:
+        int: The number of movies written, 0 if the write failed.
+    """
+    try:
+        return write_snapshot(config.CATALOG_SNAPSHOT_PATH, get_catalog_rows(), created_at=datetime.now())
+    except OSError as exception:
+        logging.warning('Failed to write the catalog snapshot: %r', exception)
+        return 0
+
+
+def warmup(report: StartupReport, dump: bool = True) -> None:
+    """
+    Loads the catalog and prepares the movie types and genres keyboards in parallel.
+
+    The types and genres are requested with the background priority, so the warmup
+    never uses the quota reserved for the users. A failed task is logged and skipped.
+
+    Args:
+        report (StartupReport): The report the tasks are measured in.
+        dump (bool): Whether to write the missing catalog snapshot.
+
+    Returns:
+        None
+    """
+    background_api = movies_api.with_priority(Priority.BACKGROUND)
+    tasks = {
+        'catalog': partial(load_catalog, dump=dump),
+        'types': lambda: types_keyboard(background_api.get_types()),
+        'genres': lambda: genres_keyboard(background_api.get_genres()),
+    }
+    with ThreadPoolExecutor(len(tasks), 'warmup') as executor:
+        measured = releasing_connection(database, __measured)
+        futures = {name: executor.submit(measured, report, f'warmup.{name}', task) for name, task in tasks.items()}
+    for name, future in futures.items():
+        if future.exception() is not None:
+            logging.warning('Warmup of %s failed: %r', name, future.exception())
+
+
+def __measured(report: StartupReport, name: str, task) -> None:
+    """
+    Runs the task as a phase of the report.
+
+    Args:
+        report (StartupReport): The report.
+        name (str): The name of the phase.
+        task (Callable[[], object]): The task.
+
+    Returns:
+        None
+    """
+    with report.phase(name):
+        task()
+
+
+LAST_UPDATE_ID = 'last_update_id'
+CATALOG_SYNC = 'catalog_sync'
+JOB_LAST_RUN = 'job_last_run:{}'
+CATALOG_REFRESH_OVERLAP = timedelta(minutes=1)
+LONG_POLLING_TIMEOUT = 10
+
+
+def start(shard: int = 0, set_commands: bool = True, dump_snapshot: bool = True) -> ShutdownCoordinator:
+    """
+    Prepares the process to handle the updates and logs the time every startup phase took.
+
+    The background jobs run only in the first shard, the other shards only add the movies
+    it syncs to their catalog indexes. The metrics of a shard are served on the port shifted
+    by its number.
+
+    Args:
+        shard (int): The number of the shard served by the process.
+        set_commands (bool): Whether to update the bot commands in Telegram.
+        dump_snapshot (bool): Whether the first shard writes the missing catalog snapshot.
+
+    Returns:
+        ShutdownCoordinator: The coordinator with the steps waiting for the running handlers and the jobs.
+    """
+    report = StartupReport(started_at=IMPORTS_STARTED_AT)
+    report.add('imports', time.perf_counter() - IMPORTS_STARTED_AT)
+    with report.phase('database'):
+        initialize_db()
+        bot.add_processed_listener(lambda update_id: release_connection(database))
+    with report.phase('handlers'):
+        handlers.register()
+        bot.add_custom_filter(StateFilter(bot))
+        bot.add_custom_filter(IsDigitFilter())
+        bot.register_callback_query_handler(callback_dispatcher.dispatch, func=None)
+    with report.phase('warmup'):
+        warmed_up_at = datetime.now() - CATALOG_REFRESH_OVERLAP
+        warmup(report, dump=shard == 0 and dump_snapshot)
+    if set_commands:
+        with report.phase('commands'):
+            set_default_commands(bot)
+
+    jobs = []
+    catalog_sync = None
+    if shard == 0:
+        catalog_sync = CatalogSync(movies_api.with_priority(Priority.BACKGROUND),
+                                   partial(get_bot_state, CATALOG_SYNC),
+                                   lambda movies, progress: save_synced_movies(movies, CATALOG_SYNC, progress),
+                                   max_pages=config.CATALOG_SYNC_MAX_PAGES,
+                                   pause=config.CATALOG_SYNC_PAUSE,
+                                   initial_days=config.CATALOG_SYNC_INITIAL_DAYS)
+        jobs = [
+            PeriodicJob('retention',
+                        config.RETENTION_INTERVAL_HOURS * 3600,
+                        releasing_connection(database, partial(run_retention,
+                                                               max_requests=config.HISTORY_MAX_REQUESTS,
+                                                               max_age_days=config.HISTORY_MAX_AGE_DAYS,
+                                                               archive_dir=config.HISTORY_ARCHIVE_DIR)),
+                        *job_state('retention')),
+            PeriodicJob('catalog-snapshot', config.CATALOG_SNAPSHOT_INTERVAL_HOURS * 3600,
+                        releasing_connection(database, dump_catalog)),
+            PeriodicJob('catalog-sync', config.CATALOG_SYNC_INTERVAL_HOURS * 3600,
+                        releasing_connection(database, catalog_sync.run),
+                        *job_state('catalog-sync')),
+        ]
+    else:
+        jobs = [
+            PeriodicJob('catalog-refresh', config.CATALOG_REFRESH_INTERVAL_MINUTES * 60,
+                        releasing_connection(database, catalog_refresher(warmed_up_at))),
+        ]
+    for job in jobs:
+        job.start()
+    if config.METRICS_PORT:
+        metrics.serve(config.METRICS_PORT + shard)
+    for name, seconds in report.phases.items():
+        metrics.gauge(f'startup_seconds{{phase="{name}"}}', lambda seconds=seconds: seconds)
+    logging.info(report.render())
+
+    coordinator = ShutdownCoordinator(config.SHUTDOWN_DEADLINE)
+    coordinator.add_step('handlers', bot.drain)
+    if catalog_sync is not None:
+        coordinator.on_stop(catalog_sync.stop)
+        coordinator.add_step('catalog-sync', lambda timeout: catalog_sync.stop())
+    coordinator.add_step('jobs', partial(stop_jobs, jobs))
+    release_connection(database)
+    return coordinator
+
+
+def job_state(name: str) -> tuple[Callable[[], Optional[str]], Callable[[str], None]]:
+    """
+    Creates the functions keeping the time of the last run of a job in the bot state.
+
+    Args:
+        name (str): The name of the job.
+
+    Returns:
+        tuple[Callable[[], Optional[str]], Callable[[str], None]]: The functions loading and saving the time.
+    """
+    key = JOB_LAST_RUN.format(name)
+    return (releasing_connection(database, partial(get_bot_state, key)),
+            releasing_connection(database, partial(set_bot_state, key)))
+
+
+def stop_jobs(jobs: list[PeriodicJob], timeout: float) -> bool:
+    """
+    Stops the background jobs and waits for their current runs to finish.
+
+    Args:
+        jobs (list[PeriodicJob]): The jobs.
+        timeout (float): The maximum time to wait in seconds.
+
+    Returns:
+        bool: True if all jobs have stopped.
+    """
+    until = time.monotonic() + timeout
+    for job in jobs:
+        job.stop()
+    for job in jobs:
+        job.join(max(0.0, until - time.monotonic()))
+    return not any(job.is_alive() for job in jobs)
+
+
+def run_worker(shard: int, updates: multiprocessing.Queue) -> None:
+    """
+    Handles the updates routed to the shard by the supervisor until None is received.
+
+    The signals are left to the supervisor, which stops the worker with None once the
+    updates routed before are queued. The worker also stops if the supervisor has died.
+
+    Args:
+        shard (int): The number of the shard.
+        updates (multiprocessing.Queue): The queue of the raw updates of the shard.
+
+    Returns:
+        None
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    coordinator = start(shard, set_commands=False)
+    supervisor = multiprocessing.parent_process()
+    while True:
+        try:
+            update = updates.get(timeout=1)
+        except Empty:
+            if supervisor.is_alive():
+                continue
+            break
+        if update is None:
+            break
+        bot.process_new_updates([Update.de_json(update)])
+    coordinator.shutdown()
+
+
+def run_single() -> None:
+    """
+    Polls and handles the updates in this process until SIGTERM or SIGINT.
+
+    The polling resumes after the last update processed by the previous run, and on
+    shutdown the running handlers are given time to finish before that update is saved.
+    With RECORD_PATH set, the session is recorded to be replayed with utils.replay.
+
+    Returns:
+        None
+    """
+    recorder = None
+    if config.RECORD_PATH:
+        recorder = Recorder(config.RECORD_PATH)
+        recorder.install(movies_api)
+    coordinator = start()
+    if recorder is not None:
+        recorder.save_database(database)
+    bot.last_update_id = int(get_bot_state(LAST_UPDATE_ID) or 0)
+    coordinator.on_stop(bot.stop_polling)
+    coordinator.add_step('update-id', lambda timeout: set_bot_state(LAST_UPDATE_ID, str(bot.processed_update_id())))
+    if recorder is not None:
+        coordinator.add_step('recording', lambda timeout: recorder.close())
+    coordinator.install()
+    bot.infinity_polling(long_polling_timeout=LONG_POLLING_TIMEOUT)
+    coordinator.shutdown()
+
+
+def run_supervisor() -> None:
+    """
+    Routes the updates to the worker processes until SIGTERM or SIGINT.
+
+    The workers finish the updates routed to them before the last routed update is saved.
+
+    Returns:
+        None
+    """
+    if config.RECORD_PATH:
+        logging.warning('RECORD_PATH is ignored: the session is recorded only with one worker')
+    initialize_db()
     set_default_commands(bot)
+    supervisor = Supervisor(config.WORKERS,
+                            run_worker,
+                            partial(apihelper.get_updates, config.BOT_TOKEN,
+                                    timeout=LONG_POLLING_TIMEOUT + 5, long_polling_timeout=LONG_POLLING_TIMEOUT),
+                            last_update_id=int(get_bot_state(LAST_UPDATE_ID) or 0),
+                            stop_timeout=config.SHUTDOWN_DEADLINE + 5)
+    coordinator = ShutdownCoordinator(config.SHUTDOWN_DEADLINE)
+    coordinator.on_stop(supervisor.stop)
+    coordinator.install()
+    supervisor.run()
+    set_bot_state(LAST_UPDATE_ID, str(supervisor.last_update_id))
 
-    bot.infinity_polling()
 
+if __name__ == '__main__':
+    config.check()
+    logging.basicConfig(level=logging.INFO)
+    if config.WORKERS > 1:
+        run_supervisor()
+    else:
+        run_single()
@@ -1,5 +1,12 @@
 import re
 
+RANDOM_TYPES = {'фильм': 'movie',
+                'сериал': 'tv-series',
+                'мультфильм': 'cartoon',
+                'мультсериал': 'animated-series',
+                'аниме': 'anime',
+                }
+
 
 def parse_year_range(text: str) -> tuple[tuple[int, int] | None, str]:
     """Parses a text string to extract a range of years.
@@ -33,3 +40,47 @@ def parse_year_range(text: str) -> tuple[tuple[int, int] | None, str]:
         return None, 'Минимальный год должен быть меньше чем максимальный. Попробуйте ещё раз.'
     return (min_year, max_year), ''
 
+
+def parse_random_filters(text: str) -> tuple[tuple[str | None, str | None, tuple[int, int] | None,
+                                                   tuple[int, int] | None] | None,
+                                             str]:
+    """Parses a text string to extract the filters of a random movie.
+
+    The text may contain a type (one of RANDOM_TYPES), a year or a range of years
+    ("yyyy" or "yyyy-yyyy"), a minimum rating or a range of ratings from 1 to 10
+    ("r" or "r-r") and a genre, in any order. The words other than the type, the years
+    and the ratings make the genre.
+
+    Args:
+        text (str): The text string to parse.
+
+    Returns:
+        tuple: A tuple containing the type, the genre, the range of years and the range of ratings,
+        None if not specified, and an error message if any.
+
+    Example:
+        parse_random_filters('сериал драма 1990-2000 7')
+        (('tv-series', 'драма', (1990, 2000), (7, 10)), '')
+
+    """
+    type, genre, years, ratings = None, [], None, None
+    for word in text.lower().split():
+        year_match = re.fullmatch(r'(\d{4})(?:-(\d{4}))?', word)
+        rating_match = re.fullmatch(r'(\d{1,2})(?:-(\d{1,2}))?', word)
+        if year_match is not None:
+            min_year, max_year = int(year_match[1]), int(year_match[2] or year_match[1])
+            if min_year < 1850:
+                return None, 'Год слишком маленький. Укажите год больше 1850.'
+            if min_year > max_year:
+                return None, 'Минимальный год должен быть меньше чем максимальный.'
+            years = (min_year, max_year)
+        elif rating_match is not None:
+            min_rating, max_rating = int(rating_match[1]), int(rating_match[2] or 10)
+            if not 1 <= min_rating <= max_rating <= 10:
+                return None, 'Рейтинг указывается числом от 1 до 10, например 7 или 6-8.'
+            ratings = (min_rating, max_rating)
+        elif word in RANDOM_TYPES:
+            type = RANDOM_TYPES[word]
+        else:
+            genre.append(word)
+    return (type, ' '.join(genre) or None, years, ratings), ''
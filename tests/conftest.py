@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from database.helpers import MODELS, initialize_db
+from database.models import database
+
+MEMORY_URL = 'sqlite:///:memory:'
+
+
+@pytest.fixture(params=['memory', 'server'])
+def db(request):
+    """Initializes the in-memory database, and the server one if TEST_DATABASE_URL is set."""
+    if request.param == 'server':
+        url = os.getenv('TEST_DATABASE_URL')
+        if not url:
+            pytest.skip('TEST_DATABASE_URL is not set')
+    else:
+        url = MEMORY_URL
+    initialize_db(url)
+    yield database
+    if request.param == 'server':
+        database.drop_tables(MODELS)
+    database.close()
@@ -0,0 +1,77 @@
+from threading import Thread
+
+import pytest
+from peewee import ProgrammingError, SqliteDatabase
+from playhouse.pool import PooledDatabase
+
+from database.connection import open_database, releasing_connection
+from database.helpers import initialize_db
+from database.models import database, BotState
+from database.functions import get_bot_state, set_bot_state
+
+
+def run_in_thread(func) -> list[Exception]:
+    errors = []
+
+    def run():
+        try:
+            func()
+        except Exception as exception:
+            errors.append(exception)
+
+    thread = Thread(target=run)
+    thread.start()
+    thread.join()
+    return errors
+
+
+def test_open_file_database(tmp_path):
+    db = open_database(f'sqlite:///{tmp_path / "db.sqlite"}')
+    assert type(db) is SqliteDatabase
+    assert db.execute_sql('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert db.execute_sql('PRAGMA auto_vacuum').fetchone()[0] == 2
+    db.close()
+
+
+def test_open_pooled_database(tmp_path):
+    db = open_database(f'sqlite+pool:///{tmp_path / "db.sqlite"}', max_connections=2, timeout=0.5)
+    assert isinstance(db, PooledDatabase)
+    assert db.execute_sql('SELECT 1').fetchone() == (1,)
+    db.close_all()
+
+
+def test_open_memory_database():
+    db = open_database('sqlite:///:memory:')
+    assert db.execute_sql('SELECT 1').fetchone() == (1,)
+    errors = run_in_thread(lambda: db.execute_sql('SELECT 1'))
+    assert len(errors) == 1 and isinstance(errors[0], ProgrammingError)
+
+
+def test_memory_database_cannot_be_pooled():
+    with pytest.raises(ValueError):
+        open_database('sqlite+pool:///:memory:')
+
+
+def test_unsupported_scheme():
+    with pytest.raises(ValueError):
+        open_database('mysql://localhost/db')
+
+
+def test_releasing_connection_returns_pooled_connections(tmp_path):
+    database.initialize(open_database(f'sqlite+pool:///{tmp_path / "db.sqlite"}', max_connections=2, timeout=0.5))
+    query = releasing_connection(database, lambda: database.execute_sql('SELECT 1').fetchall())
+    for _ in range(3):
+        assert run_in_thread(query) == []
+    database.close_all()
+
+
+def test_initialize_db_round_trip(tmp_path):
+    path = tmp_path / 'db.sqlite'
+    initialize_db(f'sqlite:///{path}')
+    set_bot_state('key', 'value')
+    database.close()
+
+    initialize_db(f'sqlite:///{path}')
+    assert get_bot_state('key') == 'value'
+    assert BotState.select().count() == 1
+    database.close()
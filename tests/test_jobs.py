@@ -0,0 +1,39 @@
+import threading
+import time
+
+from utils.jobs import PeriodicJob
+
+
+def run_job(interval: float, last_run=None, saved=None) -> tuple[list, list]:
+    runs = []
+    done = threading.Event()
+
+    def func():
+        runs.append(time.time())
+        done.set()
+
+    job = PeriodicJob('test', interval, func,
+                      (lambda: last_run) if saved is not None else None,
+                      saved.append if saved is not None else None)
+    job.start()
+    done.wait(1)
+    job.stop()
+    job.join()
+    return runs, saved
+
+
+def test_job_without_state_waits_an_interval():
+    runs, _ = run_job(60)
+    assert runs == []
+
+
+def test_job_never_run_runs_at_once():
+    runs, saved = run_job(60, None, [])
+    assert len(runs) == 1 and len(saved) == 1
+
+
+def test_job_runs_after_the_saved_run():
+    runs, _ = run_job(60, str(time.time() - 59.9), [])
+    assert len(runs) == 1
+    runs, _ = run_job(60, str(time.time()), [])
+    assert runs == []
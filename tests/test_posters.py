@@ -0,0 +1,44 @@
+import io
+import os
+import time
+
+from core.posters import PosterCache
+
+
+class Response:
+    status_code = 200
+    ok = True
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+
+def slow_transport(url: str, timeout: float) -> Response:
+    time.sleep(0.5)
+    return Response(b'\xff\xd8' + url.encode() * 100 + b'\xff\xd9')
+
+
+def make_cache(directory, state: dict, max_bytes: int = 100_000) -> PosterCache:
+    return PosterCache(str(directory), max_bytes, state.get,
+                       lambda url, digest, file_id: state.update({url: (digest, file_id)}),
+                       wait=2, transport=slow_transport)
+
+
+def test_prefetch_downloads_the_page_together(tmp_path):
+    cache = make_cache(tmp_path, {})
+    urls = [f'https://posters/{i}' for i in range(4)]
+    started = time.monotonic()
+    cache.prefetch(urls)
+    posters = [cache.get(url) for url in urls]
+    assert time.monotonic() - started < 1.5
+    assert all(isinstance(poster.photo, io.BytesIO) for poster in posters)
+
+
+def test_size_limit_is_shared_by_the_processes(tmp_path):
+    state = {}
+    first, second = make_cache(tmp_path, state, 5000), make_cache(tmp_path, state, 5000)
+    for i in range(4):
+        first.get(f'https://first/{i}')
+        second.get(f'https://second/{i}')
+    total = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(tmp_path) for name in names)
+    assert 0 < total <= 5000
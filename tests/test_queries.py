@@ -0,0 +1,110 @@
+import gzip
+import io
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from core.models import Movie
+from database import functions
+from database.export import export_history
+from database.models import Request
+from database.retention import run_retention
+
+
+def make_movie(id_: int, title: str = 'Фильм', type_: str | None = 'movie') -> Movie:
+    return Movie(str(id_), title, 2000, 7.5, 7.0, ['драма'], 'Описание', None, None, type_)
+
+
+def test_history(db):
+    functions.save_movies([make_movie(1), make_movie(2)], functions.save_byname_request(5, 'фильм', 2))
+    functions.save_movies([make_movie(3)], functions.save_random_request(5))
+    functions.save_movies([], functions.save_byfilters_request(5, 'movie', 'драма', (2000, 2010), (7, 10), 5))
+    functions.save_random_request(6)
+
+    history = functions.get_history(5, 10)
+    assert len(history) == 3
+    assert sorted(len(request.movies) for request in history) == [0, 1, 2]
+    assert functions.get_seen_movie_ids(5) == {1, 2, 3}
+    assert functions.get_last_movie_id(5) == 3
+
+    first = functions.get_history_page(5, 2)
+    assert len(first.requests) == 2 and first.newer is None and first.older is not None
+    second = functions.get_history_page(5, 2, cursor=first.older)
+    assert len(second.requests) == 1 and second.older is None and second.newer is not None
+
+
+def test_catalog(db):
+    functions.save_catalog_movies([make_movie(1, 'Первый'), make_movie(2, 'Второй')])
+    functions.save_catalog_movies([make_movie(1, 'Первый фильм')])
+    functions.save_catalog_movies([make_movie(2, 'Второй', None)])
+    movies = functions.get_catalog_movies([1, 2])
+    assert sorted(movie.original_title for movie in movies) == ['Второй', 'Первый фильм']
+    assert [movie.type for movie in movies] == ['movie', 'movie']
+    assert {row[0]: row[5] for row in functions.get_catalog_features()} == {1: 'movie', 2: 'movie'}
+    assert len(list(functions.get_catalog_rows())) == 2
+    assert list(functions.get_catalog_features(datetime.now() + timedelta(minutes=1))) == []
+
+
+def test_state(db):
+    functions.set_bot_state('key', 'first')
+    functions.set_bot_state('key', 'second')
+    assert functions.get_bot_state('key') == 'second'
+    assert functions.get_bot_state('missing') is None
+
+    id_ = functions.register_callback_value('genre', 'драма', 'Драма')
+    assert functions.register_callback_value('genre', 'драма', 'Драма') == id_
+    assert functions.get_callback_values('genre') == {id_: ('драма', 'Драма')}
+
+    functions.add_api_usage(date.today(), 'key', 'search', 2)
+    functions.add_api_usage(date.today(), 'key', 'search', 3)
+    assert functions.get_api_usage(date.today(), 'key') == {'search': 5}
+
+    functions.save_poster('url', 'digest', None)
+    functions.save_poster('url', 'digest', 'file')
+    assert functions.get_poster('url') == ('digest', 'file')
+
+    functions.save_seen_filter(5, b'current', None)
+    functions.save_seen_filter(5, b'next', b'current')
+    assert functions.get_seen_filter(5) == (b'next', b'current')
+
+
+def test_export(db):
+    functions.save_movies([make_movie(1), make_movie(2)], functions.save_byname_request(5, 'фильм', 2))
+    functions.save_random_request(5)
+
+    csv_file = io.BytesIO()
+    assert export_history(5, csv_file, 'csv') == 2
+    lines = gzip.decompress(csv_file.getvalue()).decode().splitlines()
+    assert len(lines) == 1 + 3
+
+    ndjson_file = io.BytesIO()
+    assert export_history(5, ndjson_file, 'ndjson') == 2
+    requests = [json.loads(line) for line in gzip.decompress(ndjson_file.getvalue()).decode().splitlines()]
+    assert sorted(len(request['movies']) for request in requests) == [0, 2]
+
+
+def test_retention(db, tmp_path):
+    for id_ in range(3):
+        functions.save_movies([make_movie(id_)], functions.save_byname_request(5, f'фильм {id_}', 1))
+
+    assert run_retention(max_requests=1, max_age_days=365, archive_dir=str(tmp_path)) == 2
+    assert Request.select().count() == 1
+    with gzip.open(next(tmp_path.iterdir()), 'rt', encoding='utf-8') as archive:
+        assert len(archive.read().splitlines()) == 2
+    assert run_retention(max_requests=1, max_age_days=365, archive_dir=str(tmp_path)) == 0
+
+
+def test_retention_archives_committed_batches_only(db, tmp_path, monkeypatch):
+    for id_ in range(2):
+        functions.save_movies([make_movie(id_)], functions.save_byname_request(5, f'фильм {id_}', 1))
+
+    def fail():
+        raise RuntimeError('delete failed')
+
+    monkeypatch.setattr(Request, 'delete', fail)
+    with pytest.raises(RuntimeError):
+        run_retention(max_requests=1, max_age_days=365, archive_dir=str(tmp_path))
+    assert Request.select().count() == 2
+    with gzip.open(next(tmp_path.iterdir()), 'rt', encoding='utf-8') as archive:
+        assert archive.read() == ''
@@ -0,0 +1,71 @@
+from threading import Lock, Timer, current_thread
+from typing import Callable, Hashable
+
+
+class Debouncer:
+    """
+    Runs only the latest of the calls submitted with the same key within the delay.
+
+    Every call is postponed by the delay, and a newer call with the same key cancels
+    the pending one, so the superseded calls never run.
+
+    Args:
+        delay (float): The delay in seconds.
+
+    Example:
+        debouncer = Debouncer(0.4)
+        debouncer.submit(user_id, lambda: search(query))
+    """
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.__timers: dict[Hashable, Timer] = {}
+        self.__lock = Lock()
+
+    def submit(self, key: Hashable, func: Callable[[], None]) -> None:
+        """
+        Schedules the call, cancelling the pending call with the same key.
+
+        Args:
+            key (Hashable): The key of the call (e.g. the user id).
+            func (Callable[[], None]): The function to call.
+
+        Returns:
+            None
+        """
+        timer = Timer(self.delay, self.__run, (key, func))
+        timer.daemon = True
+        with self.__lock:
+            pending = self.__timers.get(key)
+            if pending is not None:
+                pending.cancel()
+            self.__timers[key] = timer
+        timer.start()
+
+    def cancel_all(self) -> None:
+        """
+        Cancels all pending calls.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            for timer in self.__timers.values():
+                timer.cancel()
+            self.__timers.clear()
+
+    def __run(self, key: Hashable, func: Callable[[], None]) -> None:
+        """
+        Runs the call unless a newer call with the same key was submitted meanwhile.
+
+        Args:
+            key (Hashable): The key of the call.
+            func (Callable[[], None]): The function to call.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            if self.__timers.get(key) is not current_thread():
+                return
+            del self.__timers[key]
+        func()
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob(threading.Thread):
+    """
+    Runs a function in a background thread at a fixed interval.
+
+    Without the saved state the first run happens one interval after the start.
+    With it the time of the last run is kept between the restarts: the first run
+    happens one interval after the saved run, or at once if the job has never run,
+    so a bot restarted more often than the interval still runs the job.
+
+    Args:
+        name (str): The name of the job used in the logs.
+        interval (float): The interval between the runs in seconds.
+        func (Callable[[], object]): The function to run.
+        load_last_run (Optional[Callable[[], Optional[str]]]): Returns the saved time of the last run.
+        save_last_run (Optional[Callable[[str], None]]): Saves the time of the last run.
+
+    Example:
+        job = PeriodicJob('retention', 3600, prune_history)
+        job.start()
+        ...
+        job.stop()
+    """
+    def __init__(self, name: str, interval: float, func: Callable[[], object],
+                 load_last_run: Optional[Callable[[], Optional[str]]] = None,
+                 save_last_run: Optional[Callable[[str], None]] = None):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self.func = func
+        self.load_last_run = load_last_run
+        self.save_last_run = save_last_run
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        """
+        Runs the function until the job is stopped. Exceptions are logged and do not stop the job.
+
+        Returns:
+            None
+        """
+        delay = self.__first_delay()
+        while not self.stopped.wait(delay):
+            started = time.time()
+            try:
+                logger.info('Job %s finished: %s', self.name, self.func())
+            except Exception:
+                logger.exception('Job %s failed', self.name)
+            if self.save_last_run is not None:
+                try:
+                    self.save_last_run(str(started))
+                except Exception:
+                    logger.exception('Job %s could not save the time of its run', self.name)
+            delay = self.interval
+
+    def __first_delay(self) -> float:
+        """
+        Calculates the delay before the first run from the saved time of the last run.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        if self.load_last_run is None:
+            return self.interval
+        try:
+            last_run = self.load_last_run()
+        except Exception:
+            logger.exception('Job %s could not load the time of its last run', self.name)
+            return self.interval
+        if last_run is None:
+            return 0
+        return min(max(0.0, float(last_run) + self.interval - time.time()), self.interval)
+
+    def stop(self) -> None:
+        """
+        Stops the job after the current run.
+
+        Returns:
+            None
+        """
+        self.stopped.set()
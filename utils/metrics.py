@@ -0,0 +1,102 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Callable
+
+
+class Metrics:
+    """
+    Registry of the bot metrics exposed in the Prometheus text format.
+
+    Gauges are functions called when the metrics are collected,
+    counters are incremented by the code being measured.
+
+    Example:
+        metrics.gauge('api_quota_remaining', governor.remaining)
+        metrics.inc('api_calls_total')
+        metrics.serve(9100)
+    """
+    def __init__(self):
+        self.__gauges: dict[str, Callable[[], float]] = {}
+        self.__counters: dict[str, float] = {}
+        self.__lock = Lock()
+
+    def gauge(self, name: str, func: Callable[[], float]) -> None:
+        """
+        Registers a gauge.
+
+        Args:
+            name (str): The name of the metric, optionally with labels (e.g. 'quota{key="abc"}').
+            func (Callable[[], float]): The function returning the current value.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__gauges[name] = func
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """
+        Increments a counter.
+
+        Args:
+            name (str): The name of the metric, optionally with labels.
+            value (float): The value to add.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def collect(self) -> dict[str, float]:
+        """
+        Collects the current values of all metrics.
+
+        Returns:
+            dict[str, float]: The values keyed by the metric name.
+        """
+        with self.__lock:
+            gauges = dict(self.__gauges)
+            values = dict(self.__counters)
+        values.update((name, func()) for name, func in gauges.items())
+        return values
+
+    def render(self) -> str:
+        """
+        Renders the metrics in the Prometheus text format.
+
+        Returns:
+            str: The metrics, one per line.
+        """
+        return ''.join(f'{name} {value}\n' for name, value in sorted(self.collect().items()))
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        """
+        Serves the metrics over HTTP in a background thread.
+
+        Args:
+            port (int): The port to listen on.
+
+        Returns:
+            ThreadingHTTPServer: The running server.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('', port), Handler)
+        Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+        return server
+
+
+metrics = Metrics()
@@ -1,8 +1,15 @@
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from datetime import datetime
-from typing import ClassVar
+from html import escape
+from threading import Lock
+from typing import Callable, ClassVar, Optional
+import core.models
 from core.models import Movie as __Movie
 
+MESSAGE_LIMIT = 4096
+KEYBOARD_LIMIT = 100
+
 
 @dataclass(frozen=True)
 class Movie:
@@ -181,10 +188,221 @@ class RequestRandom(Request):
         return f'<b>Случайный фильм</b> - /random (<i>{date}</i>):'
 
 
+@dataclass(frozen=True)
+class HistoryPage:
+    """
+    Represents a page of the user's request history.
+
+    Args:
+        requests (list[Request]): The requests on the page, the newest first.
+        older (Optional[tuple[datetime, int]]): The (created_at, id) cursor to fetch the older page,
+            None if there are no older requests.
+        newer (Optional[tuple[datetime, int]]): The (created_at, id) cursor to fetch the newer page,
+            None if there are no newer requests.
+
+    Example:
+        page = HistoryPage(requests=[request], older=(datetime.now(), 42), newer=None)
+    """
+    requests: list[Request]
+    older: Optional[tuple[datetime, int]]
+    newer: Optional[tuple[datetime, int]]
+
+    @property
+    def movies(self) -> list[Movie]:
+        """
+        Returns the movies of all requests on the page in the order they are numbered.
+
+        Returns:
+            list[Movie]: The list of movies on the page.
+        """
+        return [movie for request in self.requests for movie in request.movies]
+
+    def to_html(self) -> str:
+        """
+        Converts the history page to an HTML format.
+
+        The movies are numbered through the whole page, so the numbers match
+        the buttons of the page keyboard.
+
+        Returns:
+            str: The HTML representation of the history page.
+
+        Example:
+            html_representation = page.to_html()
+        """
+        if not self.requests:
+            return 'История запросов пуста'
+        blocks = []
+        number = 0
+        for request in self.requests:
+            lines = [request.to_html().rstrip()]
+            for movie in request.movies:
+                number += 1
+                lines.append(f'{number}. {escape(movie.title)}')
+            blocks.append('\n'.join(lines))
+        return '\n\n'.join(blocks)
+
+
+def pack_history(requests: list[Request], limit: int = MESSAGE_LIMIT) -> list[HistoryPage]:
+    """
+    Packs the requests into as few history pages as fit into the messages.
+
+    The requests keep their order and are never split between the pages, unless a
+    single request does not fit into a message: then its movies are split, and every
+    part is shown under the heading of the request. A page has at most KEYBOARD_LIMIT
+    movies, the most buttons a message keyboard can have.
+
+    Args:
+        requests (list[Request]): The requests, the newest first.
+        limit (int): The maximum length of the text of a message in UTF-16 code units.
+
+    Returns:
+        list[HistoryPage]: The pages without the cursors, one per message.
+
+    Example:
+        for page in pack_history(get_history(user_id, amount=10)):
+            bot.send_message(chat_id, page.to_html(), parse_mode='HTML')
+    """
+    pages = []
+    current: list[Request] = []
+    for request in requests:
+        for part in __request_parts(request, limit):
+            candidate = HistoryPage(current + [part], older=None, newer=None)
+            if current and (__text_length(candidate.to_html()) > limit or len(candidate.movies) > KEYBOARD_LIMIT):
+                pages.append(HistoryPage(current, older=None, newer=None))
+                current = [part]
+            else:
+                current = candidate.requests
+    if current:
+        pages.append(HistoryPage(current, older=None, newer=None))
+    return pages
+
+
+def __request_parts(request: Request, limit: int) -> list[Request]:
+    """
+    Splits the movies of the request into the parts fitting into a message each.
+
+    Args:
+        request (Request): The request.
+        limit (int): The maximum length of the text of a message in UTF-16 code units.
+
+    Returns:
+        list[Request]: The request itself if it fits, the copies of it with the parts of the movies otherwise.
+    """
+    page = HistoryPage([request], older=None, newer=None)
+    if __text_length(page.to_html()) <= limit and len(request.movies) <= KEYBOARD_LIMIT:
+        return [request]
+    parts = []
+    movies: list[Movie] = []
+    for movie in request.movies:
+        part = replace(request, movies=movies + [movie])
+        if movies and (__text_length(HistoryPage([part], older=None, newer=None).to_html()) > limit
+                       or len(part.movies) > KEYBOARD_LIMIT):
+            parts.append(replace(request, movies=movies))
+            movies = [movie]
+        else:
+            movies = part.movies
+    parts.append(replace(request, movies=movies))
+    return parts
+
+
+def __text_length(text: str) -> int:
+    """
+    Returns the length of the text as Telegram counts it, in UTF-16 code units.
+
+    The HTML tags are counted too, so the length is never underestimated.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The length of the text.
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+class CaptionCache:
+    """
+    A bounded LRU cache of the rendered movie captions.
+
+    A caption is kept per movie id together with the hash of the movie data it was
+    rendered from. When the movie comes with different data (e.g. refreshed details),
+    the stale caption is replaced.
+
+    Args:
+        maxsize (int): The maximum number of cached captions.
+
+    Example:
+        caption_cache = CaptionCache(maxsize=2048)
+        html = caption_cache.get(movie, render)
+    """
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self.__captions: OrderedDict[str, tuple[int, str]] = OrderedDict()
+        self.__lock = Lock()
+
+    @staticmethod
+    def content_hash(movie: core.models.Movie) -> int:
+        """
+        Calculates the hash of the movie data shown in the caption.
+
+        Args:
+            movie (core.models.Movie): The movie object.
+
+        Returns:
+            int: The hash of the movie data.
+        """
+        return hash((movie.original_title, movie.alternative_title, movie.year, movie.rating_kp,
+                     movie.rating_imdb, tuple(movie.genres), movie.description))
+
+    def get(self, movie: core.models.Movie, render: Callable[[core.models.Movie], str]) -> str:
+        """
+        Returns the cached caption of the movie, rendering it on a miss.
+
+        Args:
+            movie (core.models.Movie): The movie object.
+            render (Callable[[core.models.Movie], str]): The function rendering the caption.
+
+        Returns:
+            str: The caption of the movie.
+        """
+        content_hash = self.content_hash(movie)
+        with self.__lock:
+            cached = self.__captions.get(movie.id)
+            if cached is not None and cached[0] == content_hash:
+                self.__captions.move_to_end(movie.id)
+                return cached[1]
+        caption = render(movie)
+        with self.__lock:
+            self.__captions[movie.id] = (content_hash, caption)
+            self.__captions.move_to_end(movie.id)
+            while len(self.__captions) > self.maxsize:
+                self.__captions.popitem(last=False)
+        return caption
+
+    def invalidate(self, id_kp: str) -> None:
+        """
+        Drops the cached caption of the movie.
+
+        Args:
+            id_kp (str): The ID of the movie in Kinopoisk database.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__captions.pop(id_kp, None)
+
+
+caption_cache = CaptionCache()
+
+
 def movie_to_html(movie: __Movie) -> str:
     """
     Converts a Movie object to an HTML format.
 
+    The rendered captions are cached, so a movie shown again is not rendered anew.
+
     Args:
         movie (__Movie): The movie object to be converted.
 
@@ -194,6 +412,19 @@ def movie_to_html(movie: __Movie) -> str:
     Example:
         html_representation = movie_to_html(movie)
     """
+    return caption_cache.get(movie, __render_movie)
+
+
+def __render_movie(movie: __Movie) -> str:
+    """
+    Renders the HTML caption of the movie.
+
+    Args:
+        movie (__Movie): The movie object to be rendered.
+
+    Returns:
+        str: The HTML representation of the movie.
+    """
     alt_title = f'({movie.alternative_title})' if movie.alternative_title else ''
     rating_kp = movie.rating_kp if movie.rating_kp else 'нет оценки'
     rating_imdb = movie.rating_imdb if movie.rating_imdb else 'нет оценки'
@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from peewee import DatabaseProxy
+from telebot import apihelper
+
+from core.api import MoviesApi
+from database.connection import is_sqlite
+
+logger = logging.getLogger(__name__)
+
+MASKED_PARAMS = ('photo',)
+# The times of the requests shown in the history and the keyset cursors of its pages.
+MASKED_PATTERNS = (
+    (re.compile(r'\b\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}\b'), '<time>'),
+    (re.compile(r'\b\d{20}\b'), '<cursor>'),
+)
+
+
+def read_recording(path: str) -> list[dict]:
+    """
+    Reads the entries of a recording.
+
+    Args:
+        path (str): The path of the NDJSON file.
+
+    Returns:
+        list[dict]: The entries in the order they were written.
+    """
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def database_path(path: str) -> str:
+    """
+    Returns the path of the database snapshot saved with the recording.
+
+    Args:
+        path (str): The path of the recording.
+
+    Returns:
+        str: The path of the SQLite file next to the recording.
+    """
+    return f'{os.path.splitext(path)[0]}.sqlite'
+
+
+def callback_buttons(params: dict) -> list[str]:
+    """
+    Returns the callback data of the inline buttons of an outbound Bot API call.
+
+    Args:
+        params (dict): The parameters of the call.
+
+    Returns:
+        list[str]: The callback data of the buttons row by row, empty if the call has no inline keyboard.
+    """
+    try:
+        markup = json.loads(params.get('reply_markup') or '{}')
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(markup, dict):
+        return []
+    return [button.get('callback_data', '') for row in markup.get('inline_keyboard', ()) for button in row]
+
+
+def call_signature(method: str, params: dict, files: list[str]) -> str:
+    """
+    Returns the comparable form of an outbound Bot API call.
+
+    The photos are masked, as the same poster may be sent as a URL, a file or a file ID,
+    and so are the times of the requests and the history cursors made from them.
+
+    Args:
+        method (str): The name of the Bot API method.
+        params (dict): The parameters of the call.
+        files (list[str]): The names of the parameters uploaded as files.
+
+    Returns:
+        str: The method and the parameters in JSON with the sorted keys.
+    """
+    params = {key: str(value) for key, value in params.items()}
+    for key, value in params.items():
+        for pattern, mask in MASKED_PATTERNS:
+            value = pattern.sub(mask, value)
+        params[key] = value
+    for key in [*files, *MASKED_PARAMS]:
+        if key in params or key in files:
+            params[key] = '<file>'
+    return json.dumps({'method': method, 'params': params}, ensure_ascii=False, sort_keys=True)
+
+
+class Recorder:
+    """
+    Writes the session of the bot to an NDJSON file to replay it later.
+
+    Every line is an entry with the time in seconds since the recording started and
+    the kind: 'update' with the raw incoming update, 'telegram' with an outbound Bot
+    API call and 'api' with a request to the movie database API and its response.
+    The API keys and the Bot token are not written. The SQLite database is saved next
+    to the file by ``save_database``, so the replay starts from the same data.
+
+    Args:
+        path (str): The path of the file, it is overwritten.
+
+    Example:
+        recorder = Recorder('session.ndjson')
+        recorder.install(movies_api)
+        recorder.save_database(database)
+        bot.infinity_polling()
+        recorder.close()
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.__file = open(path, 'w', encoding='utf-8')
+        self.__started_at = time.monotonic()
+        self.__session = requests.Session()
+        self.__lock = threading.Lock()
+
+    def install(self, movies_api: MoviesApi) -> None:
+        """
+        Starts recording the Bot API calls and the requests of the movie database API client.
+
+        Args:
+            movies_api (MoviesApi): The client, the clients it creates later are recorded too.
+
+        Returns:
+            None
+        """
+        apihelper.CUSTOM_REQUEST_SENDER = self.__send
+        movies_api.transport = self.wrap(movies_api.transport)
+
+    def wrap(self, transport: Callable[..., requests.Response]) -> Callable[..., requests.Response]:
+        """
+        Returns the transport writing the requests and the responses.
+
+        Args:
+            transport (Callable[..., requests.Response]): The transport with the signature of ``requests.get``.
+
+        Returns:
+            Callable[..., requests.Response]: The recording transport.
+        """
+        def recorded(url: str, params: Optional[dict] = None, **kwargs) -> requests.Response:
+            path = urlsplit(url).path
+            try:
+                response = transport(url, params=params, **kwargs)
+            except requests.RequestException:
+                self.write('api', path=path, params=params or {}, status=None, response=None)
+                raise
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            self.write('api', path=path, params=params or {}, status=response.status_code, response=body)
+            return response
+        return recorded
+
+    def save_database(self, database: DatabaseProxy) -> None:
+        """
+        Saves the copy of the database the replay starts from.
+
+        Args:
+            database (DatabaseProxy): The database, only SQLite is copied.
+
+        Returns:
+            None
+        """
+        if not is_sqlite(database):
+            logger.warning('The database is not SQLite and is not saved, replay the session with --database')
+            return
+        target = sqlite3.connect(database_path(self.path))
+        try:
+            database.connection().backup(target)
+        finally:
+            target.close()
+
+    def write(self, kind: str, **fields) -> None:
+        """
+        Writes an entry.
+
+        Args:
+            kind (str): The kind of the entry.
+            **fields: The fields of the entry, serializable to JSON.
+
+        Returns:
+            None
+        """
+        entry = {'at': round(time.monotonic() - self.__started_at, 6), 'kind': kind, **fields}
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self.__lock:
+            self.__file.write(line + '\n')
+            self.__file.flush()
+
+    def close(self) -> None:
+        """
+        Stops recording the Bot API calls and closes the file.
+
+        Returns:
+            None
+        """
+        if apihelper.CUSTOM_REQUEST_SENDER == self.__send:
+            apihelper.CUSTOM_REQUEST_SENDER = None
+        with self.__lock:
+            self.__file.close()
+
+    def __send(self, method: str, url: str, params: Optional[dict] = None, files: Optional[dict] = None,
+               **kwargs) -> requests.Response:
+        """
+        Makes the Bot API request, writing the received updates and the other calls.
+        """
+        response = self.__session.request(method, url, params=params, files=files, **kwargs)
+        name = url.rsplit('/', 1)[-1]
+        if name != 'getUpdates':
+            self.write('telegram', method=name, params=params or {}, files=sorted(files or ()))
+        elif response.ok:
+            for update in response.json().get('result', ()):
+                self.write('update', update=update)
+        return response
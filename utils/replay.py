@@ -0,0 +1,456 @@
+"""
+Replays a session recorded with RECORD_PATH through the real handlers against stub APIs.
+
+The updates are fed at the recorded pace divided by --speed (0 feeds them as fast as
+possible). The movie database API answers with the recorded responses and the Bot API
+calls are only collected, so nothing is sent to Telegram. The bot runs in a temporary
+directory with a copy of the database saved with the recording, of --database or with
+an empty SQLite database, whatever DATABASE_URL is. The callback data of a pressed button
+is replaced with the data of the same button sent by the replay, as the IDs and the
+history cursors in it depend on the data written during the session.
+
+The script fails if the outbound calls differ from the recorded ones, or if the
+latency of a handler or the throughput are worse than in --baseline by more than
+--tolerance. The baseline is written with --save-baseline, the throughput is only
+comparable between the replays at the same speed.
+
+Usage:
+    python -m utils.replay session.ndjson --speed 0 --baseline baseline.json
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import find_dotenv, load_dotenv
+
+from utils.recording import call_signature, callback_buttons, database_path, read_recording
+
+IGNORED_METHODS = ('getMe', 'getUpdates', 'setMyCommands', 'deleteMyCommands')
+LATENCY_FLOOR = 0.005
+
+
+def make_response(status: int, body: object) -> requests.Response:
+    """
+    Builds the HTTP response with the JSON body.
+
+    Args:
+        status (int): The status code.
+        body (object): The body serializable to JSON.
+
+    Returns:
+        requests.Response: The response.
+    """
+    response = requests.Response()
+    response.status_code = status
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps(body, ensure_ascii=False).encode()
+    return response
+
+
+class ReplayTransport:
+    """
+    Answers the requests of the movie database API with the recorded responses.
+
+    The responses to the same path and parameters are returned in the recorded order,
+    the last one is repeated once they run out. A request never recorded fails as
+    if the API was unreachable.
+
+    Args:
+        entries (list[dict]): The 'api' entries of the recording.
+    """
+    def __init__(self, entries: list[dict]):
+        self.misses: list[str] = []
+        self.__responses: dict[tuple[str, str], deque[dict]] = defaultdict(deque)
+        self.__lock = threading.Lock()
+        for entry in entries:
+            self.__responses[self.key(entry['path'], entry['params'])].append(entry)
+
+    @staticmethod
+    def key(path: str, params: Optional[dict]) -> tuple[str, str]:
+        """
+        Returns the key of the request.
+
+        Args:
+            path (str): The path of the request.
+            params (dict, optional): The query parameters.
+
+        Returns:
+            tuple[str, str]: The path and the parameters in JSON with the sorted keys.
+        """
+        return path, json.dumps(params or {}, sort_keys=True, default=str)
+
+    def __call__(self, url: str, params: Optional[dict] = None, **kwargs) -> requests.Response:
+        key = self.key(urlsplit(url).path, params)
+        with self.__lock:
+            responses = self.__responses.get(key)
+            if not responses:
+                self.misses.append(f'{key[0]} {key[1]}')
+                raise requests.ConnectionError(f'The request to {key[0]} was not recorded')
+            entry = responses.popleft() if len(responses) > 1 else responses[0]
+        if entry['status'] is None:
+            raise requests.ConnectionError(f'The request to {key[0]} failed when recorded')
+        return make_response(entry['status'], entry['response'])
+
+
+class ReplaySender:
+    """
+    Collects the Bot API calls instead of sending them and answers them with stub results.
+
+    It is used as ``apihelper.CUSTOM_REQUEST_SENDER``.
+    """
+    def __init__(self):
+        self.calls: list[tuple[str, dict, list[str]]] = []
+        self.__message_id = 0
+        self.__buttons: dict[str, list[list[str]]] = defaultdict(list)
+        self.__called = threading.Condition()
+
+    def __call__(self, method: str, url: str, params: Optional[dict] = None, files: Optional[dict] = None,
+                 **kwargs) -> requests.Response:
+        name = url.rsplit('/', 1)[-1]
+        params = dict(params or {})
+        with self.__called:
+            self.calls.append((name, params, sorted(files or ())))
+            if name not in IGNORED_METHODS:
+                self.__buttons[str(params.get('chat_id'))].append(callback_buttons(params))
+                self.__called.notify_all()
+            self.__message_id += 1
+            message_id = self.__message_id
+        return make_response(200, {'ok': True, 'result': self.result(name, params, message_id)})
+
+    def buttons(self, chat_id: str, index: int, timeout: float) -> Optional[list[str]]:
+        """
+        Waits for the call to the chat and returns the callback data of its buttons.
+
+        Args:
+            chat_id (str): The ID of the chat.
+            index (int): The number of the call to the chat from 0, the ignored methods are not counted.
+            timeout (float): The maximum time in seconds to wait for the call.
+
+        Returns:
+            Optional[list[str]]: The callback data of the buttons, None if the call is not made in time.
+        """
+        with self.__called:
+            if not self.__called.wait_for(lambda: len(self.__buttons[chat_id]) > index, timeout):
+                return None
+            return self.__buttons[chat_id][index]
+
+    @staticmethod
+    def result(method: str, params: dict, message_id: int) -> object:
+        """
+        Returns the stub result of the Bot API call.
+
+        Args:
+            method (str): The name of the method.
+            params (dict): The parameters of the call.
+            message_id (int): The ID of the message to return.
+
+        Returns:
+            object: The message for the methods sending or editing a message in a chat, True for the others.
+        """
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'replay', 'username': 'replay_bot'}
+        if not method.startswith(('send', 'edit')) or 'chat_id' not in params:
+            return True
+        message = {
+            'message_id': int(params.get('message_id', message_id)),
+            'date': int(time.time()),
+            'chat': {'id': int(params['chat_id']), 'type': 'private'},
+        }
+        if 'text' in params:
+            message['text'] = params['text']
+        if method in ('sendPhoto', 'editMessageMedia'):
+            file_id = f'replay-{message_id}'
+            message['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1, 'height': 1}]
+        return message
+
+
+def update_label(update: dict, callback_dispatcher) -> str:
+    """
+    Returns the name the latency of the update is reported under.
+
+    Args:
+        update (dict): The raw update.
+        callback_dispatcher (CallbackDispatcher): The dispatcher finding the handlers of the callback queries.
+
+    Returns:
+        str: The command, the name of the callback query handler or the kind of the update.
+    """
+    if 'message' in update:
+        text = update['message'].get('text') or ''
+        return text.split()[0].split('@')[0] if text.startswith('/') else 'message'
+    if 'callback_query' in update:
+        handler = callback_dispatcher.find(update['callback_query'].get('data') or '')
+        return handler.__name__ if handler is not None else 'callback_query'
+    return next((key for key in update if key != 'update_id'), 'update')
+
+
+def callback_origins(entries: list[dict]) -> dict[int, tuple[str, int, int]]:
+    """
+    Finds the recorded buttons the callback queries came from.
+
+    Args:
+        entries (list[dict]): The entries of the recording.
+
+    Returns:
+        dict[int, tuple[str, int, int]]: The chat, the number of the call to the chat and the number
+        of the button by the ID of the update with the callback query.
+    """
+    calls: dict[str, int] = defaultdict(int)
+    buttons: dict[tuple[str, str], tuple[int, int]] = {}
+    origins = {}
+    for entry in entries:
+        if entry['kind'] == 'telegram' and entry['method'] not in IGNORED_METHODS:
+            chat_id = str(entry['params'].get('chat_id'))
+            for position, data in enumerate(callback_buttons(entry['params'])):
+                buttons[chat_id, data] = calls[chat_id], position
+            calls[chat_id] += 1
+        elif entry['kind'] == 'update' and 'callback_query' in entry['update']:
+            query = entry['update']['callback_query']
+            chat_id = str(query.get('message', {}).get('chat', {}).get('id'))
+            origin = buttons.get((chat_id, query.get('data')))
+            if origin is not None:
+                origins[entry['update']['update_id']] = (chat_id, *origin)
+    return origins
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Returns the percentile of the values by the nearest rank.
+
+    Args:
+        values (list[float]): The values, not empty.
+        q (float): The percentile from 0 to 100.
+
+    Returns:
+        float: The percentile.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def compare_calls(recorded: list[dict], replayed: list[tuple[str, dict, list[str]]]) -> list[str]:
+    """
+    Compares the outbound calls of every chat in order.
+
+    Args:
+        recorded (list[dict]): The 'telegram' entries of the recording.
+        replayed (list[tuple[str, dict, list[str]]]): The method, the parameters and the file names of
+            the replayed calls.
+
+    Returns:
+        list[str]: The descriptions of the differences, empty if the calls are identical.
+    """
+    chats: dict[str, tuple[list[str], list[str]]] = defaultdict(lambda: ([], []))
+    for entry in recorded:
+        if entry['method'] not in IGNORED_METHODS:
+            chats[str(entry['params'].get('chat_id'))][0].append(
+                call_signature(entry['method'], entry['params'], entry['files']))
+    for method, params, files in replayed:
+        if method not in IGNORED_METHODS:
+            chats[str(params.get('chat_id'))][1].append(call_signature(method, params, files))
+
+    differences = []
+    for chat_id, (expected, actual) in chats.items():
+        for index in range(max(len(expected), len(actual))):
+            expected_call = expected[index] if index < len(expected) else None
+            actual_call = actual[index] if index < len(actual) else None
+            if expected_call != actual_call:
+                differences.append(f'chat {chat_id}, call {index + 1}:\n'
+                                   f'  recorded: {expected_call}\n  replayed: {actual_call}')
+                break
+    return differences
+
+
+def compare_baseline(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the latency of the handlers and the throughput with the baseline.
+
+    A latency under ``LATENCY_FLOOR`` seconds is never a regression, the timer noise is larger.
+
+    Args:
+        report (dict): The report of the replay.
+        baseline (dict): The report of the baseline replay.
+        tolerance (float): The allowed relative degradation, e.g. 0.2 for 20%.
+
+    Returns:
+        list[str]: The descriptions of the regressions.
+    """
+    regressions = []
+    for label, stats in report['latency'].items():
+        base = baseline['latency'].get(label)
+        if base is None:
+            continue
+        limit = max(base['p95'] * (1 + tolerance), LATENCY_FLOOR)
+        if stats['p95'] > limit:
+            regressions.append(f'{label}: p95 {stats["p95"] * 1000:.1f} ms, baseline {base["p95"] * 1000:.1f} ms')
+    if report['throughput'] < baseline['throughput'] / (1 + tolerance):
+        regressions.append(f'throughput {report["throughput"]:.1f}/s, baseline {baseline["throughput"]:.1f}/s')
+    return regressions
+
+
+def replay(entries: list[dict], speed: float, timeout: float) -> tuple[dict, list[str]]:
+    """
+    Feeds the recorded updates through the bot and measures the time until their handlers finish.
+
+    Must be called in the directory the bot runs in, it imports the bot.
+
+    Args:
+        entries (list[dict]): The entries of the recording.
+        speed (float): The speedup of the recorded pace, 0 to feed the updates without pauses.
+        timeout (float): The maximum time in seconds to wait for the handlers after the last update.
+
+    Returns:
+        tuple[dict, list[str]]: The report with the latency of every handler and the throughput,
+        and the differences of the outbound calls.
+    """
+    from telebot import apihelper
+    from telebot.types import Update
+
+    sender = ReplaySender()
+    apihelper.CUSTOM_REQUEST_SENDER = sender
+    transport = ReplayTransport([entry for entry in entries if entry['kind'] == 'api'])
+
+    import main
+    from loader import bot, callback_dispatcher, movies_api, poster_cache
+
+    movies_api.transport = transport
+    movies_api.hedge_executor = None
+    poster_cache.transport = lambda url, **kwargs: make_response(404, None)
+    # The snapshot would be written in the background into the directory removed after the replay.
+    coordinator = main.start(set_commands=False, dump_snapshot=False)
+
+    updates = [entry for entry in entries if entry['kind'] == 'update']
+    origins = callback_origins(entries)
+    labels = {entry['update']['update_id']: update_label(entry['update'], callback_dispatcher) for entry in updates}
+    started_at: dict[int, float] = {}
+    finished_at: dict[int, float] = {}
+    finished = threading.Condition()
+
+    def processed(update_id: int) -> None:
+        with finished:
+            finished_at[update_id] = time.perf_counter()
+            finished.notify_all()
+
+    bot.add_processed_listener(processed)
+    replay_started_at = time.perf_counter()
+    for entry in updates:
+        if speed:
+            delay = replay_started_at + (entry['at'] - updates[0]['at']) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        update = entry['update']
+        update_id = update['update_id']
+        origin = origins.get(update_id)
+        if origin is not None:
+            chat_id, index, position = origin
+            buttons = sender.buttons(chat_id, index, timeout)
+            if buttons is not None and position < len(buttons):
+                update = {**update, 'callback_query': {**update['callback_query'], 'data': buttons[position]}}
+        started_at[update_id] = time.perf_counter()
+        bot.process_new_updates([Update.de_json(update)])
+    with finished:
+        finished.wait_for(lambda: len(finished_at) >= len(started_at), timeout)
+    elapsed = max(finished_at.values(), default=replay_started_at) - replay_started_at
+    coordinator.shutdown()
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    for update_id, started in started_at.items():
+        if update_id in finished_at:
+            latencies[labels[update_id]].append(finished_at[update_id] - started)
+    report = {
+        'updates': len(updates),
+        'unfinished': len(started_at) - len(finished_at),
+        'throughput': len(finished_at) / elapsed if elapsed > 0 else 0.0,
+        'latency': {
+            label: {'count': len(values), 'p50': percentile(values, 50), 'p95': percentile(values, 95),
+                    'max': max(values)}
+            for label, values in sorted(latencies.items())
+        },
+    }
+    differences = compare_calls([entry for entry in entries if entry['kind'] == 'telegram'], sender.calls)
+    differences += [f'not recorded API request: {miss}' for miss in transport.misses]
+    return report, differences
+
+
+def render(report: dict) -> str:
+    """
+    Renders the report as a table.
+
+    Args:
+        report (dict): The report of the replay.
+
+    Returns:
+        str: The table.
+    """
+    lines = [f'{"handler":<24}{"count":>7}{"p50, ms":>10}{"p95, ms":>10}{"max, ms":>10}']
+    for label, stats in report['latency'].items():
+        lines.append(f'{label:<24}{stats["count"]:>7}{stats["p50"] * 1000:>10.1f}'
+                     f'{stats["p95"] * 1000:>10.1f}{stats["max"] * 1000:>10.1f}')
+    lines.append(f'{report["updates"]} updates, {report["unfinished"]} unfinished, '
+                 f'{report["throughput"]:.1f} updates/s')
+    return '\n'.join(lines)
+
+
+def main() -> int:
+    """
+    Runs the replay from the command line.
+
+    Returns:
+        int: The exit code, 1 if the outbound calls differ or the performance has regressed.
+    """
+    parser = argparse.ArgumentParser(description='Replays a recorded session of the bot.')
+    parser.add_argument('recording', help='the NDJSON file written with RECORD_PATH')
+    parser.add_argument('--speed', type=float, default=0, help='the speedup of the recorded pace, 0 for no pauses')
+    parser.add_argument('--baseline', help='the JSON report to compare the performance with')
+    parser.add_argument('--save-baseline', action='store_true', help='write the report to --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='the allowed relative degradation')
+    parser.add_argument('--database', help='the database to replay against, copied, '
+                                           'the one saved with the recording by default')
+    parser.add_argument('--timeout', type=float, default=60, help='the time to wait for the handlers, s')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    entries = read_recording(args.recording)
+    database = args.database
+    if database is None and os.path.exists(database_path(args.recording)):
+        database = database_path(args.recording)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    load_dotenv(find_dotenv(usecwd=True))
+    os.environ.setdefault('BOT_TOKEN', '0:replay')
+    os.environ.setdefault('API_KEYS', 'replay')
+    os.environ.setdefault('API_HOSTS', 'replay.invalid')
+    os.environ['DATABASE_URL'] = 'sqlite:///db.sqlite'
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    with tempfile.TemporaryDirectory(prefix='replay-', ignore_cleanup_errors=True) as directory:
+        if database:
+            shutil.copy(database, os.path.join(directory, 'db.sqlite'))
+        os.chdir(directory)
+        report, differences = replay(entries, args.speed, args.timeout)
+
+    print(render(report))
+    failures = list(differences)
+    if baseline_path and args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f'Baseline written to {baseline_path}')
+    elif baseline_path:
+        with open(baseline_path, encoding='utf-8') as file:
+            failures += compare_baseline(report, json.load(file), args.tolerance)
+    for failure in failures:
+        print(failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,50 @@
-from loader import bot
+import time
+from functools import wraps
+from typing import Callable, Optional, Union
+
+from telebot.apihelper import ApiTelegramException
+from telebot.types import Message, CallbackQuery
+
+from loader import bot, poster_cache
+from core.api import ApiUnavailable
 from core.models import Movie
+from keyboards.inline.similar import similar_keyboard
 from utils.presenters import movie_to_html
 
 
-def send_movie_message(chat_id: int, movie: Movie) -> None:
+def send_movie_messages(chat_id: int, movies: list[Movie], pause: float = 0.3) -> None:
     """
-    Sends a movie message to the specified chat.
+    Sends the movie messages of a page to the specified chat.
+
+    The posters of all movies are downloaded together, and the page waits for them
+    at most once for the poster wait of the cache, not once per movie.
+
+    Args:
+        chat_id (int): The ID of the chat to send the messages to.
+        movies (list[Movie]): The movies to send.
+        pause (float): The pause between the messages in seconds.
+
+    Returns:
+        None
+    """
+    poster_cache.prefetch(movie.poster_url for movie in movies)
+    deadline = time.monotonic() + poster_cache.wait
+    for movie in movies:
+        send_movie_message(chat_id, movie, wait=max(0.0, deadline - time.monotonic()))
+        time.sleep(pause)
+
+
+def send_movie_message(chat_id: int, movie: Movie, wait: Optional[float] = None) -> None:
+    """
+    Sends a movie message with the button to find the similar movies to the specified chat.
+
+    The poster is sent from the local poster cache. If Telegram fails to get the poster
+    by its URL, the placeholder is sent instead.
 
     Args:
         chat_id (int): The ID of the chat to send the message to.
         movie (Movie): The movie object to send.
+        wait (float, optional): The time to wait for the poster download, the wait of the cache if not specified.
 
     Returns:
         None
@@ -17,6 +52,42 @@ def send_movie_message(chat_id: int, movie: Movie) -> None:
     Example:
         send_movie_message(chat_id=123456, movie=Movie(id_kp=123, title="Movie Title"))
     """
-    no_poster = 'https://upload.wikimedia.org/wikipedia/commons/a/a1/Out_Of_Poster.jpg'
-    poster_url = movie.poster_url if movie.poster_url else no_poster
-    bot.send_photo(chat_id, poster_url, movie_to_html(movie), parse_mode='HTML')
+    caption = movie_to_html(movie)
+    poster = poster_cache.get(movie.poster_url, wait)
+    try:
+        message = bot.send_photo(chat_id, poster.photo, caption, parse_mode='HTML',
+                                 reply_markup=similar_keyboard(movie.id))
+    except ApiTelegramException:
+        if poster.photo != poster.url or poster.url == poster_cache.placeholder:
+            raise
+        poster = poster_cache.get(None)
+        message = bot.send_photo(chat_id, poster.photo, caption, parse_mode='HTML',
+                                 reply_markup=similar_keyboard(movie.id))
+    poster_cache.remember(poster, message.photo[-1].file_id)
+
+
+def report_api_errors(handler: Callable[[Union[Message, CallbackQuery]], None]) \
+        -> Callable[[Union[Message, CallbackQuery]], None]:
+    """
+    Decorates a handler to tell the user when the movie API can't answer instead of failing silently.
+
+    Args:
+        handler (Callable): The message or callback query handler.
+
+    Returns:
+        Callable: The decorated handler.
+
+    Example:
+        @bot.message_handler(commands=['random'])
+        @report_api_errors
+        def random(message: Message) -> None:
+            ...
+    """
+    @wraps(handler)
+    def wrapper(update: Union[Message, CallbackQuery]) -> None:
+        try:
+            handler(update)
+        except ApiUnavailable:
+            message = update.message if isinstance(update, CallbackQuery) else update
+            bot.send_message(message.chat.id, 'Сервис поиска фильмов сейчас недоступен. Попробуйте позже.')
+    return wrapper
@@ -1,16 +1,26 @@
+import hashlib
+import json
+
 from telebot.types import BotCommand
 from config_data.config import DEFAULT_COMMANDS
+from core.quota import key_fingerprint
+from database.functions import get_bot_state, set_bot_state
+
+COMMANDS_HASH = 'commands_hash'
 
 
-def set_default_commands(bot):
+def set_default_commands(bot) -> bool:
     """
-    Sets the default commands for the bot.
+    Sets the default commands for the bot if they have changed since they were set last time.
+
+    The hash of the commands and the bot is kept in the database, so the restarts
+    don't call the Telegram API when nothing has changed.
 
     Args:
         bot: The bot instance.
 
     Returns:
-        None
+        bool: True if the commands were sent to Telegram, False if they are up to date.
 
     Example:
         set_default_commands(bot)
@@ -18,6 +28,13 @@ def set_default_commands(bot):
     Note: Make sure to import the required modules and define the `DEFAULT_COMMANDS` list before calling this function.
 
     """
+    commands_hash = hashlib.sha256(
+        json.dumps([key_fingerprint(bot.token), DEFAULT_COMMANDS], ensure_ascii=False).encode()
+    ).hexdigest()
+    if get_bot_state(COMMANDS_HASH) == commands_hash:
+        return False
     bot.set_my_commands(
         [BotCommand(*i) for i in DEFAULT_COMMANDS]
     )
+    set_bot_state(COMMANDS_HASH, commands_hash)
+    return True
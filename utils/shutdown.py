@@ -0,0 +1,215 @@
+import logging
+import signal
+import threading
+import time
+from collections import Counter
+from typing import Callable
+
+from telebot import TeleBot
+from telebot.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+class DrainingTeleBot(TeleBot):
+    """
+    TeleBot keeping account of the handlers still running for every update.
+
+    It allows to wait for the running handlers to finish before the process exits,
+    and to tell the last update all handlers of which have finished, so the next
+    process starts polling right after it.
+
+    Example:
+        bot = DrainingTeleBot(token)
+        ...
+        bot.stop_polling()
+        bot.drain(timeout=20)
+        save(bot.processed_update_id())
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__in_flight: Counter[int] = Counter()
+        self.__finished = threading.Condition()
+        self.__current = threading.local()
+        self.__processed_listeners: list[Callable[[int], None]] = []
+
+    def add_processed_listener(self, listener: Callable[[int], None]) -> None:
+        """
+        Adds a function called with the ID of every update all handlers of which have finished.
+
+        Args:
+            listener (Callable[[int], None]): The function to call. It is called from the
+                thread of the last handler and must not block.
+
+        Returns:
+            None
+        """
+        self.__processed_listeners.append(listener)
+
+    def process_new_updates(self, updates: list[Update]) -> None:
+        """
+        Processes the updates one by one, remembering the update the handlers are started for.
+
+        Args:
+            updates (list[Update]): The updates.
+
+        Returns:
+            None
+        """
+        for update in updates:
+            self.__current.update_id = update.update_id
+            self.__current.started = 0
+            try:
+                super().process_new_updates([update])
+            finally:
+                self.__current.update_id = None
+            if not self.__current.started:
+                self.__processed(update.update_id)
+
+    def _exec_task(self, task, *args, **kwargs):
+        update_id = getattr(self.__current, 'update_id', None)
+        if update_id is None:
+            return super()._exec_task(task, *args, **kwargs)
+
+        def tracked(*task_args, **task_kwargs):
+            try:
+                task(*task_args, **task_kwargs)
+            finally:
+                with self.__finished:
+                    self.__in_flight[update_id] -= 1
+                    processed = not self.__in_flight[update_id]
+                    if processed:
+                        del self.__in_flight[update_id]
+                    self.__finished.notify_all()
+                if processed:
+                    self.__processed(update_id)
+
+        with self.__finished:
+            self.__in_flight[update_id] += 1
+        self.__current.started += 1
+        return super()._exec_task(tracked, *args, **kwargs)
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Waits for the running handlers to finish.
+
+        Args:
+            timeout (float): The maximum time to wait in seconds.
+
+        Returns:
+            bool: True if all handlers have finished, False if the timeout expired.
+        """
+        with self.__finished:
+            return self.__finished.wait_for(lambda: not self.__in_flight, timeout)
+
+    def processed_update_id(self) -> int:
+        """
+        Returns the last update all updates up to which have been processed.
+
+        Returns:
+            int: The ID of the update.
+        """
+        with self.__finished:
+            if self.__in_flight:
+                return min(self.__in_flight) - 1
+            return self.last_update_id
+
+    def __processed(self, update_id: int) -> None:
+        for listener in self.__processed_listeners:
+            listener(update_id)
+
+
+class ShutdownCoordinator:
+    """
+    Stops the process in an orderly manner on SIGTERM or SIGINT.
+
+    On the signal the stop callbacks are called to stop accepting the updates. Once
+    the main loop has returned, the shutdown steps run in order, sharing the deadline:
+    each step receives the time left and should not take longer.
+
+    Args:
+        deadline (float): The time in seconds the shutdown steps may take together.
+
+    Example:
+        coordinator = ShutdownCoordinator(25)
+        coordinator.on_stop(bot.stop_polling)
+        coordinator.add_step('drain', bot.drain)
+        coordinator.install()
+        bot.infinity_polling()
+        coordinator.shutdown()
+    """
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.requested = threading.Event()
+        self.__stop_callbacks: list[Callable[[], None]] = []
+        self.__steps: list[tuple[str, Callable[[float], object]]] = []
+
+    def on_stop(self, callback: Callable[[], None]) -> None:
+        """
+        Adds a function called on the signal to stop accepting the work. It must not block.
+
+        Args:
+            callback (Callable[[], None]): The function to call.
+
+        Returns:
+            None
+        """
+        self.__stop_callbacks.append(callback)
+
+    def add_step(self, name: str, step: Callable[[float], object]) -> None:
+        """
+        Adds a shutdown step.
+
+        Args:
+            name (str): The name of the step used in the logs.
+            step (Callable[[float], object]): The function called with the time left in seconds.
+
+        Returns:
+            None
+        """
+        self.__steps.append((name, step))
+
+    def install(self) -> None:
+        """
+        Installs the handlers of SIGTERM and SIGINT. Must be called from the main thread.
+
+        Returns:
+            None
+        """
+        signal.signal(signal.SIGTERM, self.__on_signal)
+        signal.signal(signal.SIGINT, self.__on_signal)
+
+    def request(self) -> None:
+        """
+        Requests the shutdown: calls the stop callbacks once.
+
+        Returns:
+            None
+        """
+        if self.requested.is_set():
+            return
+        self.requested.set()
+        for callback in self.__stop_callbacks:
+            callback()
+
+    def shutdown(self) -> None:
+        """
+        Runs the shutdown steps. A failed step is logged and does not stop the others.
+
+        Returns:
+            None
+        """
+        self.request()
+        until = time.monotonic() + self.deadline
+        for name, step in self.__steps:
+            started_at = time.monotonic()
+            try:
+                result = step(max(0.0, until - started_at))
+            except Exception:
+                logger.exception('Shutdown step %s failed', name)
+                continue
+            logger.info('Shutdown step %s finished in %.2f s: %s', name, time.monotonic() - started_at, result)
+
+    def __on_signal(self, signum, frame) -> None:
+        logger.info('Received %s, shutting down', signal.Signals(signum).name)
+        self.request()
@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator, Optional
+
+
+class StartupReport:
+    """
+    Measures the phases of the startup.
+
+    The phases may run in parallel threads, each is measured on its own.
+
+    Args:
+        started_at (float, optional): The perf_counter value the startup began at (default is now).
+
+    Example:
+        report = StartupReport()
+        with report.phase('database'):
+            initialize_db()
+        logger.info(report.render())
+    """
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.phases: dict[str, float] = {}
+        self.__lock = Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measures the phase run inside the context, the failed one too.
+
+        Args:
+            name (str): The name of the phase.
+
+        Returns:
+            Iterator[None]: The context manager.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.phases[name] = time.perf_counter() - started_at
+
+    def add(self, name: str, seconds: float) -> None:
+        """
+        Records a phase measured outside the report.
+
+        Args:
+            name (str): The name of the phase.
+            seconds (float): The duration of the phase in seconds.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.phases[name] = seconds
+
+    def total(self) -> float:
+        """
+        Returns the time since the startup began.
+
+        Returns:
+            float: The time in seconds.
+        """
+        return time.perf_counter() - self.started_at
+
+    def render(self) -> str:
+        """
+        Renders the report.
+
+        Returns:
+            str: The total time and the time of every phase.
+        """
+        with self.__lock:
+            phases = ', '.join(f'{name} {seconds:.3f} s' for name, seconds in self.phases.items())
+        return f'Started in {self.total():.3f} s: {phases}'
@@ -0,0 +1,177 @@
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import wait
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_id(update: dict) -> int:
+    """
+    Finds the ID of the user the raw update came from.
+
+    Args:
+        update (dict): The update as returned by the Bot API.
+
+    Returns:
+        int: The ID of the user, the ID of the chat for the channel posts, 0 if there is neither.
+    """
+    for key, value in update.items():
+        if key == 'update_id' or not isinstance(value, dict):
+            continue
+        sender = value.get('from') or value.get('user') or value.get('chat')
+        if sender is not None:
+            return sender['id']
+    return 0
+
+
+class Supervisor:
+    """
+    Runs the bot in several worker processes, each serving its own shard of the users.
+
+    The supervisor is the only process polling the Bot API. Every update is routed to
+    the worker chosen by the ID of its user, so the conversation state of a user never
+    leaves its worker. A worker that died is started again with the same queue, so the
+    updates routed to it meanwhile are not lost.
+
+    The workers are started with the 'spawn' method and must not rely on anything
+    initialized in the supervisor.
+
+    Args:
+        workers (int): The number of worker processes.
+        target (Callable[[int, multiprocessing.Queue], None]): The function run in a worker process with
+            the number of the shard and the queue of its updates; None in the queue means stop.
+        fetch_updates (Callable[[Optional[int]], list[dict]]): Long polls the Bot API for the raw updates
+            starting from the offset.
+        restart_delay (float): The minimum time in seconds between the restarts of a worker.
+        last_update_id (int): The ID of the last update processed before, the polling starts after it.
+        stop_timeout (float): The time in seconds the workers have to finish their updates on stop.
+
+    Example:
+        supervisor = Supervisor(4, run_worker, partial(apihelper.get_updates, token, timeout=25,
+                                                       long_polling_timeout=20))
+        supervisor.run()
+    """
+    def __init__(self,
+                 workers: int,
+                 target: Callable[[int, multiprocessing.Queue], None],
+                 fetch_updates: Callable[[Optional[int]], list[dict]],
+                 restart_delay: float = 5,
+                 last_update_id: int = 0,
+                 stop_timeout: float = 30):
+        self.workers = workers
+        self.target = target
+        self.fetch_updates = fetch_updates
+        self.restart_delay = restart_delay
+        self.last_update_id = last_update_id
+        self.stop_timeout = stop_timeout
+        self.stopped = threading.Event()
+        self.__context = multiprocessing.get_context('spawn')
+        self.__queues = [self.__context.Queue() for _ in range(workers)]
+        self.__processes: list[Optional[multiprocessing.Process]] = [None] * workers
+        self.__started_at = [0.0] * workers
+        self.__lock = threading.Lock()
+
+    def shard_of(self, update: dict) -> int:
+        """
+        Chooses the shard serving the update.
+
+        Args:
+            update (dict): The raw update.
+
+        Returns:
+            int: The number of the shard.
+        """
+        return update_user_id(update) % self.workers
+
+    def run(self) -> None:
+        """
+        Starts the workers and routes the updates to them until the supervisor is stopped.
+
+        Returns:
+            None
+        """
+        for shard in range(self.workers):
+            self.__start(shard)
+        threading.Thread(target=self.__watch, name='supervisor-watch', daemon=True).start()
+
+        while not self.stopped.is_set():
+            try:
+                updates = self.fetch_updates(self.last_update_id + 1)
+            except Exception:
+                logger.exception('Failed to get updates')
+                self.stopped.wait(3)
+                continue
+            for update in updates:
+                self.last_update_id = max(self.last_update_id, update['update_id'])
+                self.__queues[self.shard_of(update)].put(update)
+        self.__shutdown()
+
+    def stop(self) -> None:
+        """
+        Stops polling, the workers finish the updates already routed to them. It does not block.
+
+        Returns:
+            None
+        """
+        self.stopped.set()
+
+    def __start(self, shard: int) -> None:
+        """
+        Starts the worker process of the shard.
+
+        Args:
+            shard (int): The number of the shard.
+
+        Returns:
+            None
+        """
+        process = self.__context.Process(target=self.target,
+                                         args=(shard, self.__queues[shard]),
+                                         name=f'worker-{shard}')
+        process.start()
+        with self.__lock:
+            self.__processes[shard] = process
+            self.__started_at[shard] = time.monotonic()
+        logger.info('Worker %s started with pid %s', shard, process.pid)
+
+    def __watch(self) -> None:
+        """
+        Starts again the workers that died, no more often than the restart delay.
+
+        Returns:
+            None
+        """
+        while not self.stopped.is_set():
+            with self.__lock:
+                sentinels = {process.sentinel: shard for shard, process in enumerate(self.__processes)}
+            for sentinel in wait(list(sentinels), timeout=1):
+                shard = sentinels[sentinel]
+                if self.stopped.is_set():
+                    return
+                process = self.__processes[shard]
+                process.join()
+                logger.error('Worker %s exited with code %s', shard, process.exitcode)
+                self.stopped.wait(max(0.0, self.__started_at[shard] + self.restart_delay - time.monotonic()))
+                if not self.stopped.is_set():
+                    self.__start(shard)
+
+    def __shutdown(self) -> None:
+        """
+        Asks the workers to stop after their queued updates and waits for them,
+        terminating the ones not finished in time.
+
+        Returns:
+            None
+        """
+        for queue in self.__queues:
+            queue.put(None)
+        until = time.monotonic() + self.stop_timeout
+        for shard, process in enumerate(self.__processes):
+            process.join(max(0.0, until - time.monotonic()))
+            if process.is_alive():
+                logger.error('Worker %s did not stop in time, terminating', shard)
+                process.terminate()
+                process.join()